@@ -1,6 +1,13 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+from torch.nn.modules.utils import _pair
+import time
+import os
+import json
+import platform
+import threading
+import queue
 
 
 class spike_multiply_spike(torch.autograd.Function):
@@ -151,6 +158,8 @@ def add(x: torch.Tensor, spike: torch.Tensor):
 
     针对与脉冲这一特殊的数据类型，进行前反向传播加速并保持数值稳定的加法运算。
 
+    实际使用的实现由 :ref:`use_custom_function <use_custom_function-cn>` 选择。
+
     * :ref:`中文API <add-cn>`
 
     .. _add-en:
@@ -165,8 +174,12 @@ def add(x: torch.Tensor, spike: torch.Tensor):
 
     Add operation for an arbitrary tensor and a spike tensor, which is specially optimized for memory, speed, and
     numerical stability.
+
+    The implementation actually used is chosen by :ref:`use_custom_function <use_custom_function-en>`.
     '''
-    return add_spike.apply(x, spike)
+    if use_custom_function('add', x, spike):
+        return add_spike.apply(x, spike)
+    return add_naive(x, spike)
 
 
 def sub(x: torch.Tensor, spike: torch.Tensor):
@@ -184,6 +197,8 @@ def sub(x: torch.Tensor, spike: torch.Tensor):
 
     针对与脉冲这一特殊的数据类型，进行前反向传播加速并保持数值稳定的减法运算。
 
+    实际使用的实现由 :ref:`use_custom_function <use_custom_function-cn>` 选择。
+
     * :ref:`中文API <sub-cn>`
 
     .. _sub-en:
@@ -198,8 +213,14 @@ def sub(x: torch.Tensor, spike: torch.Tensor):
 
     Subtract operation for an arbitrary tensor and a spike tensor, which is specially optimized for memory, speed, and
     numerical stability.
+
+    The implementation actually used is chosen by :ref:`use_custom_function <use_custom_function-en>`.
     '''
-    return subtract_spike.apply(x, spike)
+    if use_custom_function('sub', x, spike):
+        return subtract_spike.apply(x, spike)
+    return sub_naive(x, spike)
+
+
 def mul(x: torch.Tensor, spike: torch.Tensor, spike_mul_spike=False):
     '''
     * :ref:`API in English <mul-en>`
@@ -218,6 +239,8 @@ def mul(x: torch.Tensor, spike: torch.Tensor, spike_mul_spike=False):
 
     针对与脉冲这一特殊的数据类型，进行前反向传播加速并保持数值稳定的乘法运算。
 
+    实际使用的实现由 :ref:`use_custom_function <use_custom_function-cn>` 选择。
+
     * :ref:`中文API <mul-cn>`
 
     .. _mul-en:
@@ -235,11 +258,15 @@ def mul(x: torch.Tensor, spike: torch.Tensor, spike_mul_spike=False):
 
     Multiplication operation for an arbitrary tensor and a spike tensor, which is specially optimized for memory, speed, and
     numerical stability.
+
+    The implementation actually used is chosen by :ref:`use_custom_function <use_custom_function-en>`.
     '''
     if spike_mul_spike:
-        return spike_multiply_spike.apply(x, spike)
-    else:
+        if use_custom_function('mul_spike', x, spike):
+            return spike_multiply_spike.apply(x, spike)
+    elif use_custom_function('mul', x, spike):
         return multiply_spike.apply(x, spike)
+    return mul_naive(x, spike)
 
 
 class soft_vlotage_transform_function(torch.autograd.Function):
@@ -283,6 +310,8 @@ def soft_voltage_transform(v: torch.Tensor, spike: torch.Tensor, v_threshold: fl
 
     该函数针对脉冲数据进行了前反向传播的加速，并能节省内存，且保持数值稳定。
 
+    实际使用的实现由 :ref:`use_custom_function <use_custom_function-cn>` 选择。
+
     * :ref:`中文API <soft_voltage_transform-cn>`
 
     .. _soft_voltage_transform-en:
@@ -300,8 +329,12 @@ def soft_voltage_transform(v: torch.Tensor, spike: torch.Tensor, v_threshold: fl
     will subtract ``v_threshold``: :math:`v = v - s \\cdot v_{threshold}`.
 
     This function is specially optimized for memory, speed, and numerical stability.
+
+    The implementation actually used is chosen by :ref:`use_custom_function <use_custom_function-en>`.
     '''
-    return soft_vlotage_transform_function.apply(v, spike, v_threshold)
+    if use_custom_function('soft_voltage_transform', v, spike):
+        return soft_vlotage_transform_function.apply(v, spike, v_threshold)
+    return soft_voltage_transform_naive(v, spike, v_threshold)
 
 
 class hard_voltage_transform_function(torch.autograd.Function):
@@ -352,6 +385,8 @@ def hard_voltage_transform(v: torch.Tensor, spike: torch.Tensor, v_reset: float)
 
     该函数针对脉冲数据进行了前反向传播的加速，并能节省内存，且保持数值稳定。
 
+    实际使用的实现由 :ref:`use_custom_function <use_custom_function-cn>` 选择。
+
     * :ref:`中文API <hard_voltage_transform-cn>`
 
     .. _hard_voltage_transform-en:
@@ -369,15 +404,1103 @@ def hard_voltage_transform(v: torch.Tensor, spike: torch.Tensor, v_reset: float)
     will be set to ``v_reset``.
 
     This function is specially optimized for memory, speed, and numerical stability.
+
+    The implementation actually used is chosen by :ref:`use_custom_function <use_custom_function-en>`.
+    '''
+    if use_custom_function('hard_voltage_transform', v, spike):
+        return hard_voltage_transform_function.apply(v, spike, v_reset)
+    return hard_voltage_transform_naive(v, spike, v_reset)
+
+
+def as_float_spike(spike: torch.Tensor, x: torch.Tensor):
+    if spike.dtype == torch.bool:
+        return spike.to(x)
+    return spike
+
+def add_naive(x: torch.Tensor, spike: torch.Tensor):
+    return x + as_float_spike(spike, x)
+
+def sub_naive(x: torch.Tensor, spike: torch.Tensor):
+    return x - as_float_spike(spike, x)
+
+def mul_naive(x: torch.Tensor, spike: torch.Tensor):
+    if x.dtype == torch.bool and spike.dtype == torch.bool:
+        return x.logical_and(spike)
+    return x * as_float_spike(spike, x)
+
+def soft_voltage_transform_naive(v: torch.Tensor, spike: torch.Tensor, v_threshold: float):
+    return v - as_float_spike(spike, v) * v_threshold
+
+def hard_voltage_transform_naive(v: torch.Tensor, spike: torch.Tensor, v_reset: float):
+    spike = as_float_spike(spike, v)
+    return v * (1. - spike) + v_reset * spike
+
+# 名字 -> (自定义的autograd.Function, 普通的tensor运算, x是否也是脉冲)
+spike_functions = {
+    'add': (add_spike.apply, add_naive, False),
+    'sub': (subtract_spike.apply, sub_naive, False),
+    'mul': (multiply_spike.apply, mul_naive, False),
+    'mul_spike': (spike_multiply_spike.apply, mul_naive, True),
+    'soft_voltage_transform': (lambda v, spike: soft_vlotage_transform_function.apply(v, spike, 1.),
+                               lambda v, spike: soft_voltage_transform_naive(v, spike, 1.), False),
+    'hard_voltage_transform': (lambda v, spike: hard_voltage_transform_function.apply(v, spike, 0.),
+                               lambda v, spike: hard_voltage_transform_naive(v, spike, 0.), False)
+}
+
+# 键 -> 是否使用自定义的autograd.Function。为None时表示尚未从磁盘加载
+dispatch_table = None
+# 遇到不在表中的键时是否在前向传播中立即测试并写入缓存文件。为False时使用自定义的autograd.Function，表只由
+# calibrate_dispatch()和缓存文件填充
+auto_calibrate = False
+# 保护dispatch_table和缓存文件，多个线程（例如ModelPipeline的工作线程）可能同时调用这些运算
+dispatch_lock = threading.RLock()
+dispatch_table_path = os.path.join(os.path.expanduser('~'), '.spikingjelly', 'accelerating_dispatch.json')
+
+def machine_id():
+    return f'{platform.node()}|{platform.machine()}|{platform.processor()}|torch-{torch.__version__}'
+
+def dispatch_key(name: str, device, dtype, spike_dtype, numel: int, requires_grad: bool):
+    # 元素数量按2的幂分桶，numel.bit_length() == b 表示 2 ** (b - 1) <= numel < 2 ** b
+    # use_custom_function在每次运算时直接构造同样的元组，这里只用于测试时
+    return name, torch.device(device).type, dtype, spike_dtype, numel.bit_length(), requires_grad
+
+def dispatch_key_to_str(key: tuple):
+    # 只在读写缓存文件时转换为字符串，例如 'mul|cuda|torch.float32|torch.bool|15|0'
+    name, device_type, dtype, spike_dtype, bucket, requires_grad = key
+    return f'{name}|{device_type}|{dtype}|{spike_dtype}|{bucket}|{int(requires_grad)}'
+
+def str_to_dispatch_key(key: str):
+    name, device_type, dtype, spike_dtype, bucket, requires_grad = key.split('|')
+    dtype = getattr(torch, dtype.split('.')[-1])
+    spike_dtype = getattr(torch, spike_dtype.split('.')[-1])
+    if not isinstance(dtype, torch.dtype) or not isinstance(spike_dtype, torch.dtype):
+        raise ValueError(f'invalid dispatch key {key}')
+    return name, device_type, dtype, spike_dtype, int(bucket), bool(int(requires_grad))
+
+def load_dispatch_table(path=None):
+    '''
+    :param path: 测试结果的缓存文件。为 ``None`` 时使用 ``dispatch_table_path``
+    :type path: str
+    :return: None
+
+    从缓存文件中加载 :ref:`use_custom_function <use_custom_function-cn>` 使用的测试结果。文件不存在、无法读取，或不是在当前机器
+    （主机名、CPU和PyTorch版本）上生成时，使用空表。
+    '''
+    global dispatch_table
+    if path is None:
+        path = dispatch_table_path
+    table = {}
+    try:
+        with open(path, 'r') as f:
+            cache = json.load(f)
+        if cache.get('machine') == machine_id():
+            table = {str_to_dispatch_key(key): use_custom for key, use_custom in cache['table'].items()}
+    except (OSError, ValueError, KeyError, AttributeError):
+        table = {}
+    with dispatch_lock:
+        dispatch_table = table
+
+def save_dispatch_table(path=None):
+    '''
+    :param path: 测试结果的缓存文件。为 ``None`` 时使用 ``dispatch_table_path``
+    :type path: str
+    :return: None
+
+    将 :ref:`use_custom_function <use_custom_function-cn>` 使用的测试结果保存到缓存文件。无法写入时忽略。
+    '''
+    if path is None:
+        path = dispatch_table_path
+    with dispatch_lock:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                table = {dispatch_key_to_str(key): use_custom for key, use_custom in dispatch_table.items()}
+                json.dump({'machine': machine_id(), 'table': table}, f, indent=2)
+        except OSError:
+            pass
+
+def time_spike_function(name: str, numel: int, firing_rate: float, device='cpu', dtype=torch.float,
+                        spike_dtype=torch.float, requires_grad=False, repeats=10):
+    '''
+    :param name: ``spike_functions`` 中的名字，例如 ``'mul'``
+    :type name: str
+    :param numel: 输入的元素数量
+    :type numel: int
+    :param firing_rate: 脉冲中1的比例
+    :type firing_rate: float
+    :param device: 运行的设备
+    :type device: str
+    :param dtype: ``x`` 的数据类型
+    :type dtype: torch.dtype
+    :param spike_dtype: ``spike`` 的数据类型
+    :type spike_dtype: torch.dtype
+    :param requires_grad: 是否同时测试反向传播
+    :type requires_grad: bool
+    :param repeats: 重复运行的次数
+    :type repeats: int
+    :return: 二元组 ``(custom_time, naive_time)``，自定义的 ``autograd.Function`` 和普通的tensor运算平均每次运行的耗时（秒）
+    :rtype: tuple
+    '''
+    custom_function, naive_function, x_is_spike = spike_functions[name]
+    if x_is_spike:
+        x = (torch.rand([numel], device=device) < firing_rate).to(dtype)
+    else:
+        x = torch.randn([numel], device=device, dtype=dtype)
+    spike = (torch.rand([numel], device=device) < firing_rate).to(spike_dtype)
+    inputs = []
+    if requires_grad:
+        for t in (x, spike):
+            if t.is_floating_point():
+                inputs.append(t.requires_grad_(True))
+
+    ret = []
+    for function in (custom_function, naive_function):
+        if inputs.__len__() > 0:
+            def f():
+                y = function(x, spike)
+                torch.autograd.grad(y, inputs, torch.ones_like(y))
+        else:
+            def f():
+                function(x, spike)
+        with torch.set_grad_enabled(inputs.__len__() > 0):
+            f()  # 预热
+            ret.append(measure_time(f, repeats, device))
+    return tuple(ret)
+
+def calibrate_spike_function(name: str, numel: int, device='cpu', dtype=torch.float, spike_dtype=torch.float,
+                             requires_grad=False, firing_rates=(0.01, 0.1, 0.5), repeats=10):
+    '''
+    :param name: 见 ``time_spike_function``
+    :param numel: 输入的元素数量，测试时使用同一分桶中最小的 ``2 ** (numel.bit_length() - 1)``
+    :param device: 见 ``time_spike_function``
+    :param dtype: 见 ``time_spike_function``
+    :param spike_dtype: 见 ``time_spike_function``
+    :param requires_grad: 见 ``time_spike_function``
+    :param firing_rates: 测试的脉冲发放率
+    :type firing_rates: tuple
+    :param repeats: 见 ``time_spike_function``
+    :return: 在 ``firing_rates`` 上的总耗时更少的是否是自定义的 ``autograd.Function``。结果同时被记录在 ``dispatch_table`` 中
+    :rtype: bool
+    '''
+    # 持有锁进行测试，使同时进行的测试不会互相影响耗时
+    with dispatch_lock:
+        if dispatch_table is None:
+            load_dispatch_table()
+        custom_time = 0.
+        naive_time = 0.
+        for firing_rate in firing_rates:
+            t = time_spike_function(name, 2 ** (numel.bit_length() - 1), firing_rate, device, dtype, spike_dtype,
+                                    requires_grad, repeats)
+            custom_time += t[0]
+            naive_time += t[1]
+        use_custom = custom_time < naive_time
+        dispatch_table[dispatch_key(name, device, dtype, spike_dtype, numel, requires_grad)] = use_custom
+        return use_custom
+
+def benchmark_spike_functions(names=None, sizes=(2 ** 10, 2 ** 14, 2 ** 18, 2 ** 22), firing_rates=(0.01, 0.1, 0.5),
+                              device='cpu', dtype=torch.float, spike_dtype=torch.float, requires_grad=(False, True),
+                              repeats=10, path=None, verbose=False):
+    '''
+    * :ref:`API in English <benchmark_spike_functions-en>`
+
+    .. _benchmark_spike_functions-cn:
+
+    :param names: 要测试的 ``spike_functions`` 中的名字。为 ``None`` 时测试全部
+    :type names: tuple
+    :param sizes: 输入的元素数量
+    :type sizes: tuple
+    :param firing_rates: 脉冲发放率
+    :type firing_rates: tuple
+    :param device: 运行的设备
+    :type device: str
+    :param dtype: ``x`` 的数据类型
+    :type dtype: torch.dtype
+    :param spike_dtype: ``spike`` 的数据类型
+    :type spike_dtype: torch.dtype
+    :param requires_grad: 是否测试反向传播
+    :type requires_grad: tuple
+    :param repeats: 重复运行的次数
+    :type repeats: int
+    :param path: 若不为 ``None``，将结果以JSON格式保存到此路径
+    :type path: str
+    :param verbose: 是否打印每条测试记录
+    :type verbose: bool
+    :return: 测试记录的list，每条记录是包含 ``op, size, firing_rate, requires_grad, custom_time, naive_time, speedup`` 的dict，
+        ``speedup`` 是自定义的 ``autograd.Function`` 相对普通的tensor运算的加速比
+    :rtype: list
+
+    对比 :ref:`use_custom_function <use_custom_function-cn>` 在两种实现之间的选择所依据的耗时。
+
+    * :ref:`中文API <benchmark_spike_functions-cn>`
+
+    .. _benchmark_spike_functions-en:
+
+    :param names: the names in ``spike_functions`` to benchmark. If ``None``, all of them are benchmarked
+    :type names: tuple
+    :param sizes: the numbers of elements of the inputs
+    :type sizes: tuple
+    :param firing_rates: the firing rates of the spikes
+    :type firing_rates: tuple
+    :param device: the device to run on
+    :type device: str
+    :param dtype: the dtype of ``x``
+    :type dtype: torch.dtype
+    :param spike_dtype: the dtype of ``spike``
+    :type spike_dtype: torch.dtype
+    :param requires_grad: whether to benchmark the backward as well
+    :type requires_grad: tuple
+    :param repeats: the number of repeats
+    :type repeats: int
+    :param path: if not ``None``, the records are saved to this path in JSON
+    :type path: str
+    :param verbose: whether to print every record
+    :type verbose: bool
+    :return: a list of records. Each record is a dict with ``op, size, firing_rate, requires_grad, custom_time,
+        naive_time, speedup``, where ``speedup`` is the speedup of the custom ``autograd.Function`` over the plain
+        tensor arithmetic
+    :rtype: list
+
+    Compare the time costs on which :ref:`use_custom_function <use_custom_function-en>` chooses between the two
+    implementations.
+    '''
+    if names is None:
+        names = tuple(spike_functions.keys())
+    records = []
+    for name in names:
+        for grad in requires_grad:
+            for size in sizes:
+                for firing_rate in firing_rates:
+                    custom_time, naive_time = time_spike_function(name, size, firing_rate, device, dtype, spike_dtype,
+                                                                  grad, repeats)
+                    records.append({
+                        'op': name,
+                        'size': size,
+                        'firing_rate': firing_rate,
+                        'requires_grad': grad,
+                        'custom_time': custom_time,
+                        'naive_time': naive_time,
+                        'speedup': naive_time / custom_time
+                    })
+                    if verbose:
+                        print(records[-1])
+    if path is not None:
+        with open(path, 'w') as f:
+            json.dump({'device': str(device), 'torch_version': torch.__version__, 'results': records}, f, indent=2)
+    return records
+
+def calibrate_dispatch(names=None, sizes=(2 ** 10, 2 ** 14, 2 ** 18, 2 ** 22), device='cpu', dtype=torch.float,
+                       spike_dtype=torch.float, requires_grad=(False, True), firing_rates=(0.01, 0.1, 0.5), repeats=10,
+                       path=None):
+    '''
+    * :ref:`API in English <calibrate_dispatch-en>`
+
+    .. _calibrate_dispatch-cn:
+
+    :param names: 要测试的 ``spike_functions`` 中的名字。为 ``None`` 时测试全部
+    :type names: tuple
+    :param sizes: 输入的元素数量。每个数量对应一个2的幂的分桶
+    :type sizes: tuple
+    :param device: 运行的设备
+    :type device: str
+    :param dtype: ``x`` 的数据类型
+    :type dtype: torch.dtype
+    :param spike_dtype: ``spike`` 的数据类型
+    :type spike_dtype: torch.dtype
+    :param requires_grad: 是否需要梯度
+    :type requires_grad: tuple
+    :param firing_rates: 测试的脉冲发放率，按总耗时选择更快的实现
+    :type firing_rates: tuple
+    :param repeats: 重复运行的次数
+    :type repeats: int
+    :param path: 缓存文件。为 ``None`` 时使用 ``dispatch_table_path``
+    :type path: str
+    :return: ``dispatch_table``
+    :rtype: dict
+
+    预先测试并填充 :ref:`use_custom_function <use_custom_function-cn>` 使用的表，然后保存到缓存文件中。
+
+    * :ref:`中文API <calibrate_dispatch-cn>`
+
+    .. _calibrate_dispatch-en:
+
+    :param names: the names in ``spike_functions`` to benchmark. If ``None``, all of them are benchmarked
+    :type names: tuple
+    :param sizes: the numbers of elements of the inputs. Each number stands for a power-of-2 bucket
+    :type sizes: tuple
+    :param device: the device to run on
+    :type device: str
+    :param dtype: the dtype of ``x``
+    :type dtype: torch.dtype
+    :param spike_dtype: the dtype of ``spike``
+    :type spike_dtype: torch.dtype
+    :param requires_grad: whether grad is required
+    :type requires_grad: tuple
+    :param firing_rates: the firing rates to benchmark. The faster implementation is chosen by the total time
+    :type firing_rates: tuple
+    :param repeats: the number of repeats
+    :type repeats: int
+    :param path: the cache file. If ``None``, ``dispatch_table_path`` is used
+    :type path: str
+    :return: ``dispatch_table``
+    :rtype: dict
+
+    Fill the table used by :ref:`use_custom_function <use_custom_function-en>` in advance, and save it to the cache
+    file.
+    '''
+    if names is None:
+        names = tuple(spike_functions.keys())
+    with dispatch_lock:
+        if dispatch_table is None:
+            load_dispatch_table(path)
+        for name in names:
+            for grad in requires_grad:
+                for size in sizes:
+                    calibrate_spike_function(name, size, device, dtype, spike_dtype, grad, firing_rates, repeats)
+        save_dispatch_table(path)
+        return dispatch_table
+
+def use_custom_function(name: str, x: torch.Tensor, spike: torch.Tensor):
+    '''
+    * :ref:`API in English <use_custom_function-en>`
+
+    .. _use_custom_function-cn:
+
+    :param name: ``spike_functions`` 中的名字，例如 ``'mul'``
+    :type name: str
+    :param x: 输入的tensor
+    :type x: torch.Tensor
+    :param spike: 输入的脉冲
+    :type spike: torch.Tensor
+    :return: 是否使用自定义的 ``autograd.Function``。若为 ``False``，则使用普通的tensor运算
+    :rtype: bool
+
+    ``add``、``sub``、``mul``、``soft_voltage_transform`` 和 ``hard_voltage_transform`` 都有两种实现：自定义的
+    ``autograd.Function``，以及结果和梯度都相同的普通的tensor运算。此函数根据在当前机器上的测试结果选择更快的实现：
+
+    ``x`` 和 ``spike`` 的形状不同时，使用支持广播的普通的tensor运算。
+
+    否则以 ``(name, 设备类型, x的数据类型, spike的数据类型, 元素数量所在的2的幂的分桶, 是否需要梯度)`` 为键查找
+    ``dispatch_table``。表在第一次使用时从 ``dispatch_table_path`` 加载，并且只由
+    :ref:`calibrate_dispatch <calibrate_dispatch-cn>` 显式地填充。键不在表中时，使用自定义的 ``autograd.Function``。
+
+    若设置 ``auto_calibrate = True``，键不在表中时会在前向传播中立即调用 ``calibrate_spike_function`` 测试，并将结果写入缓存文件。
+    每个新的键都会使这一次前向传播明显变慢，因此默认关闭。测试和写入由 ``dispatch_lock`` 保护，可以在多个线程中使用。
+
+    * :ref:`中文API <use_custom_function-cn>`
+
+    .. _use_custom_function-en:
+
+    :param name: the name in ``spike_functions``, e.g., ``'mul'``
+    :type name: str
+    :param x: the input tensor
+    :type x: torch.Tensor
+    :param spike: the input spikes
+    :type spike: torch.Tensor
+    :return: whether to use the custom ``autograd.Function``. If ``False``, the plain tensor arithmetic is used
+    :rtype: bool
+
+    ``add``, ``sub``, ``mul``, ``soft_voltage_transform`` and ``hard_voltage_transform`` have two implementations: the
+    custom ``autograd.Function``, and the plain tensor arithmetic with the same results and gradients. This function
+    chooses the faster one according to the benchmark on the current machine:
+
+    If the shapes of ``x`` and ``spike`` are different, the plain tensor arithmetic, which supports broadcasting, is
+    used.
+
+    Otherwise, ``dispatch_table`` is looked up with the key ``(name, device type, dtype of x, dtype of spike, the
+    power-of-2 bucket of the number of elements, whether grad is required)``. The table is loaded from
+    ``dispatch_table_path`` at the first use, and is filled only explicitly by
+    :ref:`calibrate_dispatch <calibrate_dispatch-en>`. If the key is not in the table, the custom ``autograd.Function``
+    is used.
+
+    If ``auto_calibrate = True`` is set, a key not in the table is benchmarked immediately inside the forward pass by
+    ``calibrate_spike_function``, and the result is written to the cache file. Every new key makes that forward pass
+    much slower, so this is disabled by default. Benchmarking and writing are guarded by ``dispatch_lock``, so it can
+    be used from multiple threads.
+    '''
+    if x.shape != spike.shape or x.numel() == 0:
+        return False
+    if dispatch_table is None:
+        with dispatch_lock:
+            if dispatch_table is None:
+                load_dispatch_table()
+    requires_grad = torch.is_grad_enabled() and (x.requires_grad or spike.requires_grad)
+    key = (name, x.device.type, x.dtype, spike.dtype, x.numel().bit_length(), requires_grad)
+    use_custom = dispatch_table.get(key)
+    if use_custom is None:
+        if not auto_calibrate:
+            return True
+        with dispatch_lock:
+            # 其他线程可能已经测试过这个键
+            use_custom = dispatch_table.get(key)
+            if use_custom is None:
+                use_custom = calibrate_spike_function(name, x.numel(), x.device, x.dtype, spike.dtype, requires_grad)
+                save_dispatch_table()
+    return use_custom
+
+
+def pack_spike(spike: torch.Tensor):
+    '''
+    * :ref:`API in English <pack_spike-en>`
+
+    .. _pack_spike-cn:
+
+    :param spike: 脉冲tensor。要求 ``spike`` 中的元素只能为 ``0`` 和 ``1``，或只为 ``False`` 和 ``True``
+    :type spike: torch.Tensor
+    :return: 一个元组，包含
+
+        - **packed** -- ``dtype = torch.uint8`` 的一维tensor，每个元素保存8个脉冲
+
+        - **shape** -- ``spike.shape``，用于 :ref:`unpack_spike <unpack_spike-cn>` 恢复脉冲
+    :rtype: (torch.Tensor, torch.Size)
+
+    将脉冲按位打包，每个字节保存8个脉冲。与 ``float32`` 相比，占用的内存（显存）和传输的数据量减少为 ``1/32``；与 ``bool`` 相比，减少为 ``1/8``。
+
+    示例代码：
+
+    .. code-block:: python
+
+        >>> spike = (torch.rand([2, 5]) > 0.5).float()
+        >>> packed, shape = pack_spike(spike)
+        >>> packed.dtype, packed.numel()
+        (torch.uint8, 2)
+        >>> (unpack_spike(packed, shape, torch.float) == spike).all()
+        tensor(True)
+
+    * :ref:`中文API <pack_spike-cn>`
+
+    .. _pack_spike-en:
+
+    :param spike: a spike tensor. The elements in ``spike`` must be ``0`` and ``1`` or ``False`` and ``True``
+    :type spike: torch.Tensor
+    :return: a tuple containing
+
+        - **packed** -- a 1-D tensor with ``dtype = torch.uint8``, whose every element stores 8 spikes
+
+        - **shape** -- ``spike.shape``, which is used by :ref:`unpack_spike <unpack_spike-en>` to restore spikes
+    :rtype: (torch.Tensor, torch.Size)
+
+    Pack spikes in bits, 8 spikes per byte. Compared with ``float32``, the memory and the amount of transferred data
+    decrease to ``1/32``; compared with ``bool``, they decrease to ``1/8``.
+
+    Examples:
+
+    .. code-block:: python
+
+        >>> spike = (torch.rand([2, 5]) > 0.5).float()
+        >>> packed, shape = pack_spike(spike)
+        >>> packed.dtype, packed.numel()
+        (torch.uint8, 2)
+        >>> (unpack_spike(packed, shape, torch.float) == spike).all()
+        tensor(True)
+    '''
+    if spike.dtype == torch.bool:
+        bits = spike.flatten()
+    else:
+        bits = spike.detach().flatten().bool()
+    pad = (- bits.numel()) % 8
+    if pad != 0:
+        bits = torch.cat((bits, bits.new_zeros(pad)))
+    weights = torch.tensor([128, 64, 32, 16, 8, 4, 2, 1], dtype=torch.uint8, device=spike.device)
+    packed = (bits.view(-1, 8).to(torch.uint8) * weights).sum(dim=1, dtype=torch.uint8)
+    return packed, spike.shape
+
+
+def unpack_spike(packed: torch.Tensor, shape: torch.Size, dtype=torch.bool):
+    '''
+    * :ref:`API in English <unpack_spike-en>`
+
+    .. _unpack_spike-cn:
+
+    :param packed: :ref:`pack_spike <pack_spike-cn>` 返回的 ``dtype = torch.uint8`` 的tensor
+    :type packed: torch.Tensor
+    :param shape: 打包前脉冲的形状
+    :type shape: torch.Size
+    :param dtype: 返回的脉冲的数据类型，默认为 ``torch.bool``
+    :type dtype: torch.dtype
+    :return: ``shape`` 形状的脉冲tensor
+    :rtype: torch.Tensor
+
+    将 :ref:`pack_spike <pack_spike-cn>` 打包的脉冲恢复。
+
+    * :ref:`中文API <unpack_spike-cn>`
+
+    .. _unpack_spike-en:
+
+    :param packed: the tensor with ``dtype = torch.uint8`` returned by :ref:`pack_spike <pack_spike-en>`
+    :type packed: torch.Tensor
+    :param shape: the shape of spikes before packing
+    :type shape: torch.Size
+    :param dtype: the data type of returned spikes. Default: ``torch.bool``
+    :type dtype: torch.dtype
+    :return: a spike tensor with ``shape``
+    :rtype: torch.Tensor
+
+    Restore spikes packed by :ref:`pack_spike <pack_spike-en>`.
+    '''
+    weights = torch.tensor([128, 64, 32, 16, 8, 4, 2, 1], dtype=torch.uint8, device=packed.device)
+    bits = packed.unsqueeze(1).bitwise_and(weights) != 0
+    bits = bits.flatten()[:torch.Size(shape).numel()].view(shape)
+    if dtype == torch.bool:
+        return bits
+    return bits.to(dtype)
+
+
+class spike_linear_function(torch.autograd.Function):
+    @staticmethod
+    def forward(ctx, spike: torch.Tensor, weight: torch.Tensor, bias: torch.Tensor, packed: bool):
+        # y = spike W^T + b，计算W的梯度需要spike，以bool或按位打包的形式保存，而不是保存float的spike
+        if ctx.needs_input_grad[1]:
+            if packed:
+                spike_saved, ctx.spike_shape = pack_spike(spike)
+            else:
+                spike_saved = spike.bool()
+        else:
+            spike_saved = None
+        ctx.packed = packed
+        ctx.spike_dtype = spike.dtype
+        ctx.save_for_backward(spike_saved, weight)
+        return F.linear(spike, weight, bias)
+
+    @staticmethod
+    def backward(ctx, grad_output: torch.Tensor):
+        spike_saved, weight = ctx.saved_tensors
+        grad_spike = None
+        grad_weight = None
+        grad_bias = None
+        if ctx.needs_input_grad[0]:
+            grad_spike = grad_output.matmul(weight)
+        if ctx.needs_input_grad[1]:
+            if ctx.packed:
+                spike = unpack_spike(spike_saved, ctx.spike_shape, ctx.spike_dtype)
+            else:
+                spike = spike_saved.to(ctx.spike_dtype)
+            grad_weight = grad_output.flatten(0, -2).t().mm(spike.flatten(0, -2))
+        if ctx.needs_input_grad[2]:
+            grad_bias = grad_output.flatten(0, -2).sum(0)
+        return grad_spike, grad_weight, grad_bias, None
+
+
+def spike_linear(spike: torch.Tensor, weight: torch.Tensor, bias=None, packed=False):
+    '''
+    * :ref:`API in English <spike_linear-en>`
+
+    .. _spike_linear-cn:
+
+    :param spike: ``shape = [*, in_features]`` 的脉冲tensor。要求 ``spike`` 中的元素只能为 ``0`` 和 ``1``
+    :type spike: torch.Tensor
+    :param weight: ``shape = [out_features, in_features]`` 的权重
+    :type weight: torch.Tensor
+    :param bias: ``shape = [out_features]`` 的偏置，可以为 ``None``
+    :type bias: torch.Tensor
+    :param packed: 为 ``True`` 时，反向传播所需的 ``spike`` 用 ``pack_spike`` 按位打包保存；否则以 ``bool`` 类型保存
+    :type packed: bool
+    :return: ``F.linear(spike, weight, bias)``
+    :rtype: torch.Tensor
+
+    针对脉冲输入的全连接运算。计算 ``weight`` 的梯度需要保存输入，该函数将脉冲输入保存为 ``bool`` （内存为 ``float32`` 的 ``1/4``）
+    或按位打包（内存为 ``float32`` 的 ``1/32``），在反向传播时再恢复。
+
+    * :ref:`中文API <spike_linear-cn>`
+
+    .. _spike_linear-en:
+
+    :param spike: a spike tensor with ``shape = [*, in_features]``. The elements in ``spike`` must be ``0`` and ``1``
+    :type spike: torch.Tensor
+    :param weight: the weight with ``shape = [out_features, in_features]``
+    :type weight: torch.Tensor
+    :param bias: the bias with ``shape = [out_features]``, which can be ``None``
+    :type bias: torch.Tensor
+    :param packed: if ``True``, ``spike`` needed by backward is saved in bits by ``pack_spike``; otherwise it is saved
+        as ``bool``
+    :type packed: bool
+    :return: ``F.linear(spike, weight, bias)``
+    :rtype: torch.Tensor
+
+    The fully connected operation for spike inputs. The input has to be saved for computing the gradient of ``weight``.
+    This function saves the spike input as ``bool`` (``1/4`` memory of ``float32``) or in bits (``1/32`` memory of
+    ``float32``), and restores it in backward.
+    '''
+    return spike_linear_function.apply(spike, weight, bias, packed)
+
+
+class spike_conv2d_function(torch.autograd.Function):
+    @staticmethod
+    def forward(ctx, spike: torch.Tensor, weight: torch.Tensor, bias: torch.Tensor, stride, padding, dilation, groups,
+                packed: bool):
+        if ctx.needs_input_grad[1]:
+            if packed:
+                spike_saved, _ = pack_spike(spike)
+            else:
+                spike_saved = spike.bool()
+        else:
+            spike_saved = None
+        ctx.packed = packed
+        ctx.spike_shape = spike.shape
+        ctx.spike_dtype = spike.dtype
+        ctx.conv_args = (stride, padding, dilation, groups)
+        ctx.save_for_backward(spike_saved, weight)
+        return F.conv2d(spike, weight, bias, stride, padding, dilation, groups)
+
+    @staticmethod
+    def backward(ctx, grad_output: torch.Tensor):
+        spike_saved, weight = ctx.saved_tensors
+        grad_spike = None
+        grad_weight = None
+        grad_bias = None
+        if ctx.needs_input_grad[0]:
+            grad_spike = torch.nn.grad.conv2d_input(ctx.spike_shape, weight, grad_output, *ctx.conv_args)
+        if ctx.needs_input_grad[1]:
+            if ctx.packed:
+                spike = unpack_spike(spike_saved, ctx.spike_shape, ctx.spike_dtype)
+            else:
+                spike = spike_saved.to(ctx.spike_dtype)
+            grad_weight = torch.nn.grad.conv2d_weight(spike, weight.shape, grad_output, *ctx.conv_args)
+        if ctx.needs_input_grad[2]:
+            grad_bias = grad_output.sum(dim=(0, 2, 3))
+        return grad_spike, grad_weight, grad_bias, None, None, None, None, None
+
+
+def spike_conv2d(spike: torch.Tensor, weight: torch.Tensor, bias=None, stride=1, padding=0, dilation=1, groups=1,
+                 packed=False):
+    '''
+    * :ref:`API in English <spike_conv2d-en>`
+
+    .. _spike_conv2d-cn:
+
+    :param spike: ``shape = [N, C_in, H, W]`` 的脉冲tensor。要求 ``spike`` 中的元素只能为 ``0`` 和 ``1``
+    :type spike: torch.Tensor
+    :param weight: 卷积核
+    :type weight: torch.Tensor
+    :param bias: 偏置，可以为 ``None``
+    :type bias: torch.Tensor
+    :param stride: 与 ``F.conv2d`` 相同
+    :param padding: 与 ``F.conv2d`` 相同
+    :param dilation: 与 ``F.conv2d`` 相同
+    :param groups: 与 ``F.conv2d`` 相同
+    :param packed: 为 ``True`` 时，反向传播所需的 ``spike`` 用 ``pack_spike`` 按位打包保存；否则以 ``bool`` 类型保存
+    :type packed: bool
+    :return: ``F.conv2d(spike, weight, bias, stride, padding, dilation, groups)``
+    :rtype: torch.Tensor
+
+    针对脉冲输入的二维卷积运算。与 :ref:`spike_linear <spike_linear-cn>` 类似，脉冲输入以 ``bool`` 或按位打包的形式保存。
+
+    * :ref:`中文API <spike_conv2d-cn>`
+
+    .. _spike_conv2d-en:
+
+    :param spike: a spike tensor with ``shape = [N, C_in, H, W]``. The elements in ``spike`` must be ``0`` and ``1``
+    :type spike: torch.Tensor
+    :param weight: the convolution kernel
+    :type weight: torch.Tensor
+    :param bias: the bias, which can be ``None``
+    :type bias: torch.Tensor
+    :param stride: same as ``F.conv2d``
+    :param padding: same as ``F.conv2d``
+    :param dilation: same as ``F.conv2d``
+    :param groups: same as ``F.conv2d``
+    :param packed: if ``True``, ``spike`` needed by backward is saved in bits by ``pack_spike``; otherwise it is saved
+        as ``bool``
+    :type packed: bool
+    :return: ``F.conv2d(spike, weight, bias, stride, padding, dilation, groups)``
+    :rtype: torch.Tensor
+
+    The 2D convolution for spike inputs. Similar to :ref:`spike_linear <spike_linear-en>`, the spike input is saved as
+    ``bool`` or in bits.
+    '''
+    return spike_conv2d_function.apply(spike, weight, bias, stride, padding, dilation, groups, packed)
+
+
+def sparse_spike_linear(spike: torch.Tensor, weight: torch.Tensor, bias=None, weight_t=None):
+    '''
+    * :ref:`API in English <sparse_spike_linear-en>`
+
+    .. _sparse_spike_linear-cn:
+
+    :param spike: ``shape=[*, in_features]`` 的脉冲，元素只能为 ``0`` 和 ``1``，或只为 ``False`` 和 ``True``
+    :type spike: torch.Tensor
+    :param weight: ``shape=[out_features, in_features]`` 的权重
+    :type weight: torch.Tensor
+    :param bias: ``shape=[out_features]`` 的偏置，或 ``None``
+    :type bias: torch.Tensor
+    :param weight_t: 若不为 ``None``，则是预先计算的 ``weight.t().contiguous()``，可以避免每次调用时的转置
+    :type weight_t: torch.Tensor
+    :return: ``F.linear(spike, weight, bias)``
+    :rtype: torch.Tensor
+
+    不进行稠密的矩阵乘法，而是找出所有的脉冲，用 ``index_select`` 取出对应的权重的列，再用 ``index_add_`` 累加到各个样本的输出上。
+    计算量与脉冲的数量成正比，因此在发放率很低时比稠密的矩阵乘法更快。只对权重和偏置可微，不计算输入的梯度。
+
+    * :ref:`中文API <sparse_spike_linear-cn>`
+
+    .. _sparse_spike_linear-en:
+
+    :param spike: spikes with ``shape=[*, in_features]``, whose elements must be ``0`` and ``1`` or ``False`` and ``True``
+    :type spike: torch.Tensor
+    :param weight: the weight with ``shape=[out_features, in_features]``
+    :type weight: torch.Tensor
+    :param bias: the bias with ``shape=[out_features]``, or ``None``
+    :type bias: torch.Tensor
+    :param weight_t: if not ``None``, it is ``weight.t().contiguous()`` computed in advance, which avoids transposing at
+        every call
+    :type weight_t: torch.Tensor
+    :return: ``F.linear(spike, weight, bias)``
+    :rtype: torch.Tensor
+
+    Instead of the dense matrix multiplication, all spikes are found, the corresponding columns of the weight are
+    picked by ``index_select``, and then accumulated to the outputs of every sample by ``index_add_``. The computation is
+    proportional to the number of spikes, so it is faster than the dense matrix multiplication at low firing rates. It is
+    only differentiable with respect to the weight and the bias, and the gradient of the input is not computed.
+    '''
+    if weight_t is None:
+        weight_t = weight.t()
+    x = spike.reshape(-1, spike.shape[-1])
+    sample_index, feature_index = x.nonzero(as_tuple=True)
+    y = torch.zeros([x.shape[0], weight.shape[0]], dtype=weight.dtype, device=weight.device)
+    y.index_add_(0, sample_index, weight_t.index_select(0, feature_index))
+    if bias is not None:
+        y += bias
+    return y.view(list(spike.shape[:-1]) + [weight.shape[0]])
+
+
+def sparse_spike_conv2d(spike: torch.Tensor, weight: torch.Tensor, bias=None, stride=1, padding=0, dilation=1):
+    '''
+    * :ref:`API in English <sparse_spike_conv2d-en>`
+
+    .. _sparse_spike_conv2d-cn:
+
+    :param spike: ``shape=[N, C, H, W]`` 的脉冲，元素只能为 ``0`` 和 ``1``，或只为 ``False`` 和 ``True``
+    :type spike: torch.Tensor
+    :param weight: ``shape=[C_out, C, kH, kW]`` 的卷积核，只支持 ``groups=1``
+    :type weight: torch.Tensor
+    :param bias: ``shape=[C_out]`` 的偏置，或 ``None``
+    :type bias: torch.Tensor
+    :return: ``F.conv2d(spike, weight, bias, stride, padding, dilation)``
+    :rtype: torch.Tensor
+
+    用 ``F.unfold`` 将输入展开为 ``[N * L, C * kH * kW]`` 的矩阵后，使用 :ref:`sparse_spike_linear <sparse_spike_linear-cn>`
+    计算卷积。只对卷积核和偏置可微，不计算输入的梯度。
+
+    * :ref:`中文API <sparse_spike_conv2d-cn>`
+
+    .. _sparse_spike_conv2d-en:
+
+    :param spike: spikes with ``shape=[N, C, H, W]``, whose elements must be ``0`` and ``1`` or ``False`` and ``True``
+    :type spike: torch.Tensor
+    :param weight: the kernel with ``shape=[C_out, C, kH, kW]``. Only ``groups=1`` is supported
+    :type weight: torch.Tensor
+    :param bias: the bias with ``shape=[C_out]``, or ``None``
+    :type bias: torch.Tensor
+    :return: ``F.conv2d(spike, weight, bias, stride, padding, dilation)``
+    :rtype: torch.Tensor
+
+    The input is unfolded to a ``[N * L, C * kH * kW]`` matrix by ``F.unfold``, and then the convolution is computed by
+    :ref:`sparse_spike_linear <sparse_spike_linear-en>`. It is only differentiable with respect to the kernel and the
+    bias, and the gradient of the input is not computed.
+    '''
+    stride = _pair(stride)
+    padding = _pair(padding)
+    dilation = _pair(dilation)
+    out_h = (spike.shape[2] + 2 * padding[0] - dilation[0] * (weight.shape[2] - 1) - 1) // stride[0] + 1
+    out_w = (spike.shape[3] + 2 * padding[1] - dilation[1] * (weight.shape[3] - 1) - 1) // stride[1] + 1
+    if spike.dtype == torch.bool:
+        spike = spike.to(weight.dtype)
+    cols = F.unfold(spike, weight.shape[2:], dilation, padding, stride)  # [N, C * kH * kW, L]
+    y = sparse_spike_linear(cols.transpose(1, 2), weight.view(weight.shape[0], -1), None)  # [N, L, C_out]
+    y = y.transpose(1, 2).reshape(spike.shape[0], weight.shape[0], out_h, out_w)
+    if bias is not None:
+        y = y + bias.view(1, -1, 1, 1)
+    return y
+
+
+def measure_time(f, repeats=10, device='cpu'):
+    '''
+    :param f: 无参数的函数
+    :type f: callable
+    :param repeats: 重复运行的次数
+    :type repeats: int
+    :param device: ``f`` 运行的设备。若为CUDA设备，则在计时前后进行同步
+    :type device: str or torch.device
+    :return: ``f`` 平均每次运行的耗时（秒）
+    :rtype: float
+    '''
+    cuda = torch.device(device).type == 'cuda'
+    if cuda:
+        torch.cuda.synchronize()
+    t_start = time.perf_counter()
+    for _ in range(repeats):
+        f()
+    if cuda:
+        torch.cuda.synchronize()
+    return (time.perf_counter() - t_start) / repeats
+
+
+def calibrate_sparse_threshold(dense_function, sparse_function, shape, densities=(0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2),
+                               repeats=5, device='cpu', dtype=torch.float):
+    '''
+    * :ref:`API in English <calibrate_sparse_threshold-en>`
+
+    .. _calibrate_sparse_threshold-cn:
+
+    :param dense_function: 以脉冲为输入的稠密计算，例如 ``lambda x: F.linear(x, weight, bias)``
+    :type dense_function: callable
+    :param sparse_function: 与 ``dense_function`` 等价的稀疏计算，例如
+        ``lambda x: sparse_spike_linear(x, weight, bias)``
+    :type sparse_function: callable
+    :param shape: 测试用的输入的形状
+    :type shape: tuple
+    :param densities: 测试的脉冲密度（发放率）
+    :type densities: tuple
+    :param repeats: 每项测试的重复次数
+    :type repeats: int
+    :param device: 测试的设备
+    :type device: str or torch.device
+    :param dtype: 输入的数据类型
+    :type dtype: torch.dtype
+    :return: 稀疏计算比稠密计算更快的最大密度。若在最小的密度下稀疏计算也更慢，则返回 ``0.``
+    :rtype: float
+
+    在当前机器上运行微型基准测试，从低到高依次比较两种计算在不同脉冲密度下的耗时，用于确定切换到稀疏计算的阈值。
+
+    * :ref:`中文API <calibrate_sparse_threshold-cn>`
+
+    .. _calibrate_sparse_threshold-en:
+
+    :param dense_function: the dense computation with spike input, e.g., ``lambda x: F.linear(x, weight, bias)``
+    :type dense_function: callable
+    :param sparse_function: the sparse computation equivalent to ``dense_function``, e.g.,
+        ``lambda x: sparse_spike_linear(x, weight, bias)``
+    :type sparse_function: callable
+    :param shape: the shape of inputs for testing
+    :type shape: tuple
+    :param densities: the spike densities (firing rates) for testing
+    :type densities: tuple
+    :param repeats: the number of repeats of every test
+    :type repeats: int
+    :param device: the device for testing
+    :type device: str or torch.device
+    :param dtype: the dtype of inputs
+    :type dtype: torch.dtype
+    :return: the maximum density at which the sparse computation is faster than the dense one. ``0.`` if the sparse
+        computation is slower even at the minimum density
+    :rtype: float
+
+    Run a microbenchmark on the current machine, which compares the time of the two computations at different spike
+    densities from low to high, to decide the threshold of switching to the sparse computation.
+    '''
+    threshold = 0.
+    with torch.no_grad():
+        for density in sorted(densities):
+            spike = (torch.rand(shape, device=device) < density).to(dtype)
+            # 预热
+            dense_function(spike)
+            sparse_function(spike)
+            if measure_time(lambda: sparse_function(spike), repeats, device) < \
+                    measure_time(lambda: dense_function(spike), repeats, device):
+                threshold = density
+            else:
+                break
+    return threshold
+
+
+def benchmark_spike_packing(shape=(64, 128, 32, 32), firing_rates=(0.01, 0.05, 0.1, 0.2), device='cpu', repeats=10):
+    '''
+    * :ref:`API in English <benchmark_spike_packing-en>`
+
+    .. _benchmark_spike_packing-cn:
+
+    :param shape: 测试用的脉冲tensor的形状
+    :type shape: tuple
+    :param firing_rates: 测试的发放率
+    :type firing_rates: tuple
+    :param device: 数据传输的目标设备。若不为 ``'cpu'``，还会测试从CPU传输到 ``device`` 的耗时
+    :type device: str
+    :param repeats: 每项测试的重复次数，取平均耗时
+    :type repeats: int
+    :return: 列表，每个元素是一个发放率对应的测试结果字典
+    :rtype: list
+
+    测试 :ref:`pack_spike <pack_spike-cn>` 在不同发放率下节省的内存和传输数据量，以及打包、解包和传输的耗时（单位为秒），并打印结果。
+
+    * :ref:`中文API <benchmark_spike_packing-cn>`
+
+    .. _benchmark_spike_packing-en:
+
+    :param shape: the shape of the spike tensor for testing
+    :type shape: tuple
+    :param firing_rates: firing rates for testing
+    :type firing_rates: tuple
+    :param device: the target device of data transfer. If not ``'cpu'``, the time of transferring from CPU to ``device``
+        will also be tested
+    :type device: str
+    :param repeats: the number of repeats of every test. The average time is reported
+    :type repeats: int
+    :return: a list, whose every element is a dictionary of results at one firing rate
+    :rtype: list
+
+    Benchmark the memory and the amount of transferred data saved by :ref:`pack_spike <pack_spike-en>` at different firing
+    rates, as well as the time (in seconds) of packing, unpacking and transferring, and print the results.
     '''
-    return hard_voltage_transform_function.apply(v, spike, v_reset)
+    def timeit(f):
+        f()  # 预热
+        return measure_time(f, repeats, device)
+
+    results = []
+    for fr in firing_rates:
+        spike = (torch.rand(shape) < fr).float()
+        packed, spike_shape = pack_spike(spike)
+        ret = {
+            'firing_rate': fr,
+            'float32_bytes': spike.numel() * spike.element_size(),
+            'bool_bytes': spike.numel(),
+            'packed_bytes': packed.numel(),
+            'pack_time': timeit(lambda: pack_spike(spike)),
+            'unpack_time': timeit(lambda: unpack_spike(packed, spike_shape, torch.float))
+        }
+        if device != 'cpu':
+            ret['float32_transfer_time'] = timeit(lambda: spike.to(device))
+            ret['packed_transfer_time'] = timeit(lambda: unpack_spike(packed.to(device), spike_shape, torch.float))
+        results.append(ret)
+        print(', '.join(f'{k}={v}' for k, v in ret.items()))
+    return results
+
+
+def stash_state(state):
+    '''
+    * :ref:`API in English <stash_state-en>`
+
+    .. _stash_state-cn:
+
+    :param state: 有状态的模块在重置前的状态变量
+    :type state: float or torch.Tensor or None
+    :return: 若 ``state`` 是不需要梯度的tensor，则返回 ``state``，可以在重置后通过 :ref:`reuse_state <reuse_state-cn>` 重新使用
+        它的内存；否则返回 ``None``
+    :rtype: torch.Tensor or None
+
+    需要梯度的状态变量可能被计算图保存，原地修改会导致反向传播出错，因此不会被重新使用。
+
+    * :ref:`中文API <stash_state-cn>`
+
+    .. _stash_state-en:
 
+    :param state: the stateful variable of a stateful module before reset
+    :type state: float or torch.Tensor or None
+    :return: ``state`` if it is a tensor that does not require grad, whose memory can be reused by
+        :ref:`reuse_state <reuse_state-en>` after reset; otherwise ``None``
+    :rtype: torch.Tensor or None
+
+    A state that requires grad may be saved by the computation graph and modifying it in-place would break the backward,
+    so it is never reused.
+    '''
+    if isinstance(state, torch.Tensor) and not state.requires_grad:
+        return state
+    return None
+
+
+def zero_buffers(buffers: list):
+    '''
+    :param buffers: tensor的列表
+    :type buffers: list
+    :return: None
+
+    将 ``buffers`` 中的所有tensor原地置0。PyTorch提供 ``torch._foreach_zero_`` 时一起置0，否则逐个置0。
+    '''
+    if hasattr(torch, '_foreach_zero_'):
+        torch._foreach_zero_(buffers)
+    else:
+        for buffer in buffers:
+            buffer.zero_()
+
+
+def reuse_state(buffer, shape, device, dtype, fill_value=0.):
+    '''
+    * :ref:`API in English <reuse_state-en>`
+
+    .. _reuse_state-cn:
+
+    :param buffer: :ref:`stash_state <stash_state-cn>` 返回的tensor
+    :type buffer: torch.Tensor or None
+    :param shape: 新的状态变量所需的形状
+    :type shape: torch.Size
+    :param device: 新的状态变量所需的设备
+    :type device: torch.device
+    :param dtype: 新的状态变量所需的数据类型
+    :type dtype: torch.dtype
+    :param fill_value: 状态变量的初始值。为 ``None`` 表示 ``buffer`` 已经被填充过，不需要再填充
+    :type fill_value: float or torch.Tensor or None
+    :return: 若 ``buffer`` 的形状、设备和数据类型都与所需的一致，则用 ``fill_value`` 原地填充并返回 ``buffer``；否则返回 ``None``，
+        调用者应退回到重新分配内存的方式
+    :rtype: torch.Tensor or None
+
+    与 ``torch.full(shape, fill_value)`` 相比，不会分配新的内存。只有在输入的形状或设备改变时，才需要重新分配。
+
+    * :ref:`中文API <reuse_state-cn>`
+
+    .. _reuse_state-en:
+
+    :param buffer: the tensor returned by :ref:`stash_state <stash_state-en>`
+    :type buffer: torch.Tensor or None
+    :param shape: the shape required by the new state
+    :type shape: torch.Size
+    :param device: the device required by the new state
+    :type device: torch.device
+    :param dtype: the dtype required by the new state
+    :type dtype: torch.dtype
+    :param fill_value: the initial value of the state. ``None`` means that ``buffer`` has been filled and does not need
+        to be filled again
+    :type fill_value: float or torch.Tensor or None
+    :return: if the shape, device and dtype of ``buffer`` are all the same as required, ``buffer`` filled with
+        ``fill_value`` in-place; otherwise ``None`` and the caller should fall back to allocating a new state
+    :rtype: torch.Tensor or None
+
+    Compared with ``torch.full(shape, fill_value)``, no memory is allocated. Reallocation is only needed when the shape or
+    the device of the input changes.
+    '''
+    if buffer is None or buffer.shape != shape or buffer.device != device or buffer.dtype != dtype:
+        return None
+    if fill_value is None:
+        return buffer
+    elif isinstance(fill_value, torch.Tensor):
+        return buffer.copy_(fill_value.expand_as(buffer))
+    elif fill_value == 0.:
+        return buffer.zero_()
+    else:
+        return buffer.fill_(fill_value)
+
+
+class PipelineAborted(Exception):
+    '''
+    流水线中的其他工作线程出错时，用于让阻塞在队列上的工作线程退出。
+    '''
+    pass
+
+def pipeline_put(q: queue.Queue, item, abort: threading.Event):
+    while True:
+        if abort.is_set():
+            raise PipelineAborted
+        try:
+            q.put(item, timeout=0.05)
+            return
+        except queue.Full:
+            pass
+
+def pipeline_get(q: queue.Queue, abort: threading.Event):
+    while True:
+        if abort.is_set():
+            raise PipelineAborted
+        try:
+            return q.get(timeout=0.05)
+        except queue.Empty:
+            pass
 
 class ModelPipeline(nn.Module):
-    def __init__(self):
+    def __init__(self, queue_size=2):
         '''
-        一个基于流水线多GPU串行并行的基类，使用者只需要继承 ``ModelPipeline``，然后调\
-        用 ``append(nn_module, gpu_id)``，就可以将 ``nn_module`` 添加到流水线中，并且 ``nn_module`` 会被运行在 ``gpu_id`` 上。\
+        :param queue_size: 相邻两个模块之间的队列最多能缓存的数据的数量
+        :type queue_size: int
+
+        一个基于流水线的模型并行的基类，使用者只需要继承 ``ModelPipeline``，然后调\
+        用 ``append(nn_module, device)``，就可以将 ``nn_module`` 添加到流水线中，并且 ``nn_module`` 会被运行在 ``device`` 上。\
+        ``device`` 可以是任意设备，包括CPU，例如 ``'cpu'``、``'cuda:1'``。\
         在调用模型进行计算时， ``forward(x, split_sizes)`` 中的 ``split_sizes`` 指的是输入数据 ``x`` 会在维度0上被拆分成\
         每 ``split_size`` 一组，得到 ``[x[0], x[1], ...]``，这些数据会被串行的送入 ``module_list`` 中保存的各个模块进行计算。
 
@@ -400,35 +1523,135 @@ class ModelPipeline(nn.Module):
 
                 step=6                 |m0|    |m1|    |m2|    |m3| x0, x1, x2
 
-        不使用流水线，则任何时刻只有一个GPU在运行，而其他GPU则在等待这个GPU的数据；而使用流水线，例如上面计算过程中的 ``step=3`` 到\
-        ``step=4``，尽管在代码的写法为顺序执行：
+        每个模块运行在各自的工作线程中，相邻的模块之间用容量为 ``queue_size`` 的队列连接：第i个模块从队列中取出上一个模块的输出，\
+        计算后放入送往下一个模块的队列，队列已满时等待下一个模块取走数据。因此，例如上面计算过程中的 ``step=3`` 到 ``step=4``，\
+        ``m1, m2, m3`` 是同时运行的。这不依赖CUDA的异步执行，因为PyTorch的运算在执行时会释放GIL，所以各个模块都在CPU上时也能\
+        同时运行。没有选择工作进程，是因为计算图无法跨进程传递，而 ``forward`` 的输出需要能够反向传播。
 
-        .. code-block:: python
+        ``forward`` 的反向传播由PyTorch的autograd引擎完成，在CPU上是串行的。训练时可以使用 ``train_step``，它将每一份数据的反向传播\
+        也放到各个模块的工作线程中，按GPipe或1F1B的顺序流水线式的运行。
 
-            x0 = m1(x0)
-            x1 = m2(x1)
-            x2 = m3(x2)
+        每个模块的计算时间（不包括在队列上等待的时间）被记录在 ``busy_time`` 中，每次运行流水线的总时间被记录在 ``wall_time`` 中，\
+        ``utilization()`` 给出每个模块的利用率。利用率明显较低的模块在等待其他模块，可以据此调整每个模块包含的层。
 
-        但由于PyTorch优秀的特性，上面的3行代码实际上是并行执行的，因为这3个在CUDA上的计算使用各自的数据，互不影响。
-        用于解决显存不足的模型流水线。将一个模型分散到各个GPU上，流水线式的进行训练。
-
-        运行时建议先取一个很小的batch_size，然后观察各个GPU的显存占用，并调整每个module_list中包含的模型比例。
+        运行时建议先取一个很小的batch_size，然后观察各个设备的内存占用和各个模块的利用率，并调整每个module_list中包含的模型比例。
         '''
         super().__init__()
         self.module_list = nn.ModuleList()
-        self.gpu_list = []
-
-    def append(self, nn_module, gpu_id):
+        self.device_list = []
+        self.gpu_list = []  # 兼容旧的代码，与device_list对应的 'cuda:X' 形式的字符串
+        self.pack_list = []
+        self.queue_size = queue_size
+        self.busy_time = []
+        self.wall_time = 0.
+
+    def append(self, nn_module, device, pack_spike_output=False):
         '''
         :param nn_module: 新添加的module
-        :param gpu_id:  该模型所在的GPU，不需要带“cuda:”的前缀。例如“2”
+        :param device: 该模型所在的设备，例如 ``'cpu'``、``'cuda:2'``。为了兼容旧的代码，不带前缀的GPU序号，例如 ``'2'`` 或 ``2``，\
+            被视为 ``'cuda:2'``
+        :param pack_spike_output: ``nn_module`` 的输出是否为脉冲。若为 ``True``，在不需要计算梯度时，``nn_module`` 的输出会先用
+            ``pack_spike`` 按位打包，再传输到下一个module所在的设备上解包，使设备之间传输的数据量减少为 ``1/32``
         :return: None
 
-        将nn_module添加到流水线中，nn_module会运行在设备gpu_id上。添加的nn_module会按照它们的添加顺序运行。例如首先添加了\
+        将nn_module添加到流水线中，nn_module会运行在设备device上。添加的nn_module会按照它们的添加顺序运行。例如首先添加了\
         fc1，又添加了fc2，则实际运行是按照input_data->fc1->fc2->output_data的顺序运行。
+
+        ``device_list`` 中保存 ``torch.device``，``gpu_list`` 中保存与之对应的字符串，例如 ``'cuda:2'``、``'cpu'``，与旧的代码相同。
+
+        CPU上的各个模块共享进程的算子内（intra-op）线程池。``torch.set_num_threads`` 作用于整个进程，无法给每个工作线程分别设置，\
+        因此若需要限制线程数，应在运行流水线之前调用一次。
+        '''
+        if isinstance(device, int) or (isinstance(device, str) and device.isdigit()):
+            device = 'cuda:' + str(device)
+        device = torch.device(device)
+        self.module_list.append(nn_module.to(device))
+        self.device_list.append(device)
+        self.gpu_list.append(str(device))
+        self.pack_list.append(pack_spike_output)
+        self.busy_time.append(0.)
+
+    def stage_forward(self, i, x):
+        '''
+        :param i: 模块在流水线中的序号
+        :param x: 输入数据，或上一个模块输出的打包后的脉冲 ``(packed, shape, dtype)``
+        :return: 第i个模块的输出。若第i个模块的输出需要打包，则返回 ``(packed, shape, dtype)``
+
+        将x传输到第i个模块所在的设备上，并送入第i个模块进行计算。
+        '''
+        if isinstance(x, tuple):
+            x = unpack_spike(x[0].to(self.device_list[i]), x[1], x[2])
+        else:
+            x = x.to(self.device_list[i])
+        y = self.module_list[i](x)
+        if self.pack_list[i] and i < self.device_list.__len__() - 1 and not y.requires_grad:
+            # 打包的脉冲无法反向传播，因此只在不需要计算梯度时打包
+            return pack_spike(y) + (y.dtype, )
+        return y
+
+    def add_busy_time(self, i, t_start):
+        '''
+        :param i: 模块在流水线中的序号
+        :param t_start: 第i个模块开始计算的时刻，由 ``time.perf_counter()`` 得到
+        :return: None
+
+        将第i个模块从 ``t_start`` 到现在的计算时间累加到 ``busy_time[i]``。CUDA上的运算是异步的，因此先同步第i个模块所在的设备。
+        '''
+        if self.device_list[i].type == 'cuda':
+            torch.cuda.synchronize(self.device_list[i])
+        self.busy_time[i] += time.perf_counter() - t_start
+
+    def utilization(self):
+        '''
+        :return: 每个模块的利用率，即 ``busy_time[i] / wall_time``
+        :rtype: list
+
+        自上次调用 ``reset_utilization()`` 以来，每个模块用于计算的时间占流水线运行总时间的比例。
         '''
-        self.module_list.append(nn_module.to('cuda:' + gpu_id))
-        self.gpu_list.append('cuda:' + gpu_id)
+        if self.wall_time == 0.:
+            return [0.] * self.busy_time.__len__()
+        return [t / self.wall_time for t in self.busy_time]
+
+    def reset_utilization(self):
+        '''
+        :return: None
+
+        将 ``busy_time`` 和 ``wall_time`` 置0。
+        '''
+        self.busy_time = [0.] * self.device_list.__len__()
+        self.wall_time = 0.
+
+    def run_stages(self, worker, grad_enabled):
+        '''
+        :param worker: 以模块的序号i和 ``threading.Event`` 类型的 ``abort`` 为参数的函数，即第i个工作线程运行的内容
+        :param grad_enabled: 工作线程中是否启用梯度。梯度模式是线程局部的，不会从调用者的线程继承
+        :return: None
+
+        为每个模块启动一个工作线程，等待它们全部结束，并将运行时间累加到 ``wall_time``。任何一个工作线程出错时，``abort`` 会被设置，\
+        其他阻塞在队列上的工作线程随之退出，错误在调用者的线程中重新抛出。
+        '''
+        abort = threading.Event()
+        errors = []
+
+        def run(i):
+            try:
+                with torch.set_grad_enabled(grad_enabled):
+                    worker(i, abort)
+            except PipelineAborted:
+                pass
+            except BaseException as e:
+                errors.append(e)
+                abort.set()
+
+        threads = [threading.Thread(target=run, args=(i, ), daemon=True) for i in range(self.device_list.__len__())]
+        t_start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.wall_time += time.perf_counter() - t_start
+        if errors.__len__() > 0:
+            raise errors[0]
 
     def constant_forward(self, x, T, reduce=True):
         '''
@@ -438,62 +1661,36 @@ class ModelPipeline(nn.Module):
         :return: T个输出的和或T个输出
 
         让本模型以恒定输入x运行T次，这常见于使用频率编码的SNN。这种方式比forward(x, split_sizes)的运行速度要快很多。
-        '''
 
-        pipeline = []  # pipeline[i]中保存要送入到m[i]的数据
-        for i in range(self.gpu_list.__len__()):
-            pipeline.append(None)
-
-        pipeline[0] = x.to(self.gpu_list[0])
-
-        # 跑满pipeline
-        # 假设m中有5个模型，m[0] m[1] m[2] m[3] m[4]，则代码执行顺序为
-        #
-        # p[ 1 ] = m[ 0 ](p[ 0 ])
-        #
-        # p[ 2 ] = m[ 1 ](p[ 1 ])
-        # p[ 1 ] = m[ 0 ](p[ 0 ])
-        #
-        # p[ 3 ] = m[ 2 ](p[ 2 ])
-        # p[ 2 ] = m[ 1 ](p[ 1 ])
-        # p[ 1 ] = m[ 0 ](p[ 0 ])
-        #
-        # p[ 4 ] = m[ 3 ](p[ 3 ])
-        # p[ 3 ] = m[ 2 ](p[ 2 ])
-        # p[ 2 ] = m[ 1 ](p[ 1 ])
-        # p[ 1 ] = m[ 0 ](p[ 0 ])
-
-        for i in range(0, self.gpu_list.__len__()):
-            for j in range(i, 0, -1):
-                if j - 1 == 0:
-                    pipeline[j] = self.module_list[j - 1](pipeline[j - 1])
-                else:
-                    pipeline[j] = self.module_list[j - 1](pipeline[j - 1].to(self.gpu_list[j - 1]))
-
-        t = 0  # 记录从流水线输出的总数量
-        while True:
-            for i in range(self.gpu_list.__len__(), 0, -1):
-                if i == self.gpu_list.__len__():
-                    # 获取输出
-                    if t == 0:
-                        if reduce:
-                            ret = self.module_list[i - 1](pipeline[i - 1].to(self.gpu_list[i - 1]))
-                        else:
-                            ret = []
-                            ret.append(self.module_list[i - 1](pipeline[i - 1].to(self.gpu_list[i - 1])))
+        各个时刻的数据依次流过流水线：第0个模块在第t个时刻的输出放入队列后，就可以开始计算第t+1个时刻，同时第1个模块计算第t个时刻。\
+        每个模块按时刻的顺序各运行T次，因此有状态的模块（例如神经元）的状态与逐个时刻串行运行时相同。
+        '''
+        num_stages = self.device_list.__len__()
+        x = x.to(self.device_list[0])
+        queues = [queue.Queue(self.queue_size) for _ in range(num_stages - 1)]  # queues[i]中保存第i个模块的输出
+        outputs = []
+
+        def worker(i, abort):
+            ret = None
+            for t in range(T):
+                x_t = x if i == 0 else pipeline_get(queues[i - 1], abort)
+                t_start = time.perf_counter()
+                y = self.stage_forward(i, x_t)
+                if i == num_stages - 1:
+                    if reduce:
+                        ret = y if ret is None else ret + y
                     else:
-                        if reduce:
-                            ret += self.module_list[i - 1](pipeline[i - 1].to(self.gpu_list[i - 1]))
-                        else:
-                            ret.append(self.module_list[i - 1](pipeline[i - 1].to(self.gpu_list[i - 1])))
-                    t += 1
-                    if t == T:
-                        if reduce == False:
-                            return torch.cat(ret, dim=0)
-                        return ret
-
-                else:
-                    pipeline[i] = self.module_list[i - 1](pipeline[i - 1].to(self.gpu_list[i - 1]))
+                        outputs.append(y)
+                self.add_busy_time(i, t_start)
+                if i < num_stages - 1:
+                    pipeline_put(queues[i], y, abort)
+            if reduce and i == num_stages - 1:
+                outputs.append(ret)
+
+        self.run_stages(worker, torch.is_grad_enabled())
+        if reduce:
+            return outputs[0]
+        return torch.cat(outputs, dim=0)
 
     def forward(self, x, split_sizes):
         '''
@@ -504,18 +1701,108 @@ class ModelPipeline(nn.Module):
         '''
 
         assert x.shape[0] % split_sizes == 0, print('x.shape[0]不能被split_sizes整除！')
-        x = list(x.split(split_sizes, dim=0))
-        x_pos = []  # x_pos[i]记录x[i]应该通过哪个module
-
-        for i in range(x.__len__()):
-            x_pos.append(i + 1 - x.__len__())
-
-        while True:
-            for i in range(x_pos.__len__() - 1, -1, -1):
-                if 0 <= x_pos[i] <= self.gpu_list.__len__() - 1:
-                    x[i] = self.module_list[x_pos[i]](x[i].to(self.gpu_list[x_pos[i]]))
-                x_pos[i] += 1
-            if x_pos[0] == self.gpu_list.__len__():
-                break
+        x = x.split(split_sizes, dim=0)
+        num_stages = self.device_list.__len__()
+        queues = [queue.Queue(self.queue_size) for _ in range(num_stages - 1)]  # queues[i]中保存第i个模块的输出
+        outputs = []
+
+        def worker(i, abort):
+            for m in range(x.__len__()):
+                x_m = x[m] if i == 0 else pipeline_get(queues[i - 1], abort)
+                t_start = time.perf_counter()
+                y = self.stage_forward(i, x_m)
+                self.add_busy_time(i, t_start)
+                if i == num_stages - 1:
+                    outputs.append(y)
+                else:
+                    pipeline_put(queues[i], y, abort)
+
+        self.run_stages(worker, torch.is_grad_enabled())
+        return torch.cat(outputs, dim=0)
+
+    def train_step(self, x, target, loss_function, split_sizes, schedule='1f1b', reset_function=None):
+        '''
+        :param x: 输入数据
+        :param target: 标签，与 ``x`` 一样在维度0上被拆分
+        :param loss_function: 损失函数，以最后一个模块的输出和标签为参数，返回对这一份数据取平均的损失
+        :param split_sizes: 输入数据x会在维度0上被拆分成每split_size一组，得到[x0, x1, ...]
+        :param schedule: ``'gpipe'`` 或 ``'1f1b'``，每个模块运行前向和反向传播的顺序
+        :param reset_function: 若不为 ``None``，每个模块对每一份数据前向传播后，调用 ``reset_function(module)``，例如
+            ``functional.reset_net``。各份数据是不同的样本，因此含有状态的模块需要在它们之间重置
+        :return: 整个batch的损失，即各份数据的损失按其大小的加权平均
+        :rtype: torch.Tensor
+
+        完成一次前向和反向传播，梯度累加到各个模块参数的 ``grad`` 中，之后由使用者调用优化器的 ``step()``。
 
-        return torch.cat(x, dim=0)
+        每个模块在各自的工作线程中，对每一份数据运行前向传播，将不带计算图的输出传给下一个模块；反向传播时从下一个模块取得输出的\
+        梯度，对自己的计算图反向传播，再将输入的梯度传给上一个模块。``schedule`` 决定了第i个模块（共S个）对M份数据的运行顺序：
+
+        * ``'gpipe'``：先完成全部M份数据的前向传播，再完成它们的反向传播。每个模块需要同时保存M份数据的计算图
+
+        * ``'1f1b'``：先完成 ``S - i - 1`` 份数据的前向传播，之后每完成一份数据的前向传播，就完成最早的一份数据的反向传播。每个\
+          模块最多同时保存 ``S - i`` 份数据的计算图，占用的内存更少，而流水线的空闲时间与 ``'gpipe'`` 相同
+
+        两种顺序得到的梯度相同。
+        '''
+        assert x.shape[0] % split_sizes == 0, print('x.shape[0]不能被split_sizes整除！')
+        assert schedule in ('gpipe', '1f1b')
+        batch_size = x.shape[0]
+        x = x.split(split_sizes, dim=0)
+        target = target.split(split_sizes, dim=0)
+        num_micro_batches = x.__len__()
+        num_stages = self.device_list.__len__()
+        forward_queues = [queue.Queue(self.queue_size) for _ in range(num_stages - 1)]  # 第i个模块的输出
+        backward_queues = [queue.Queue(self.queue_size) for _ in range(num_stages - 1)]  # 第i个模块的输出的梯度
+        losses = []
+
+        def worker(i, abort):
+            device = self.device_list[i]
+            module = self.module_list[i]
+            stash = []  # 已完成前向传播、尚未反向传播的 (输入, 输出)
+
+            def forward_step(m):
+                if i == 0:
+                    x_m = x[m].to(device)
+                else:
+                    x_m = pipeline_get(forward_queues[i - 1], abort).to(device)
+                    if x_m.is_floating_point():
+                        x_m.requires_grad_(True)
+                t_start = time.perf_counter()
+                y = module(x_m)
+                if reset_function is not None:
+                    reset_function(module)
+                if i == num_stages - 1:
+                    y = loss_function(y, target[m].to(device)) * (x[m].shape[0] / batch_size)
+                    losses.append(y.detach())
+                self.add_busy_time(i, t_start)
+                if i < num_stages - 1:
+                    pipeline_put(forward_queues[i], y.detach(), abort)
+                stash.append((x_m, y))
+
+            def backward_step():
+                x_m, y = stash.pop(0)
+                if i == num_stages - 1:
+                    grad_y = torch.ones_like(y)
+                else:
+                    grad_y = pipeline_get(backward_queues[i], abort)
+                t_start = time.perf_counter()
+                if grad_y is not None and y.requires_grad:
+                    torch.autograd.backward(y, grad_y.to(device))
+                self.add_busy_time(i, t_start)
+                if i > 0:
+                    pipeline_put(backward_queues[i - 1], x_m.grad, abort)
+
+            if schedule == 'gpipe':
+                num_warmup = num_micro_batches
+            else:
+                num_warmup = min(num_stages - i - 1, num_micro_batches)
+            for m in range(num_warmup):
+                forward_step(m)
+            for m in range(num_warmup, num_micro_batches):
+                forward_step(m)
+                backward_step()
+            for _ in range(num_warmup):
+                backward_step()
+
+        self.run_stages(worker, True)
+        return torch.stack(losses).sum()
@@ -185,12 +185,13 @@ def main(log_dir=None):
     # ANN2SNN标准转化，直接调用可以对模型进行转化并对SNN进行仿真测试
     # ANN2SNN standard conversion, direct calling of the function can transform the model and simulate the SNN.
     utils.pytorch_ann2snn(model_name=model_name,
-                              norm_data=norm_tensor,
+                              norm_tensor=norm_tensor,
                               test_data_loader=test_data_loader,
                               device=device,
                               T=T,
                               log_dir=log_dir,
-                              config=config
+                              config=config,
+                              quantize=True
                               )
 
 if __name__ == '__main__':
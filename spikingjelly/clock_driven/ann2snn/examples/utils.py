@@ -342,7 +342,7 @@ def save_model(net, log_dir, file_name):
 
 
 def pytorch_ann2snn(model_name, norm_tensor, test_data_loader, device, T, log_dir, config,
-                        load_state_dict=False, ann=None):
+                        load_state_dict=False, ann=None, quantize=False):
     '''
     * :ref:`API in English <pytorch_conversion-en>`
 
@@ -357,6 +357,8 @@ def pytorch_ann2snn(model_name, norm_tensor, test_data_loader, device, T, log_di
     :param config: 用于转换的配置
     :param load_state_dict: 如果希望使用state dict加载的模型，将此参数设置为 ``True`` 
     :param ann: 用于加载state dict的模型，使用的模块均为Pytorch内置模块
+    :param quantize: 若为 ``True``，将转换后的SNN进一步转换为 ``ann2snn.quantization.QuantizedSNN``，并用
+        ``simulation.compare_quantized_snn`` 比较整数推理与浮点数SNN的结果
     :return: ``None``
 
     对加载的模型（或模型参数）进行模型转化并且对转化后SNN进行仿真，输出仿真结果
@@ -375,6 +377,8 @@ def pytorch_ann2snn(model_name, norm_tensor, test_data_loader, device, T, log_di
     :param config: conversion config
     :param load_state_dict: set ``True`` if one want to load saved 'state dict'
     :param ann: ANN used to load state dict. Its modules should be Pytorch modules.
+    :param quantize: if ``True``, the converted SNN is further converted to ``ann2snn.quantization.QuantizedSNN``, and
+        ``simulation.compare_quantized_snn`` compares the integer inference with the floating-point SNN
     :return: ``None``
 
     Convert the loaded model (or model loaded from parameters) and simulate the converted SNN.
@@ -448,6 +452,23 @@ def pytorch_ann2snn(model_name, norm_tensor, test_data_loader, device, T, log_di
                                                                                 np.abs(ann_acc * 100 - snn_acc * 100)
                                                                                 ))
 
+    if quantize:
+        import copy
+        import spikingjelly.clock_driven.ann2snn.quantization as quantization
+
+        # 转换为CPU上的整数推理网络，并与浮点数SNN比较
+        # Convert to the integer inference network on CPU, and compare it with the floating-point SNN
+        input_scale = quantization.calibrate_input_scale(test_data_loader, bits=8)
+        quantized_snn = quantization.QuantizedSNN(copy.deepcopy(snn).cpu(), input_scale, weight_bits=8, input_bits=8)
+        print('Print Quantized SNN model Structure:')
+        print(quantized_snn)
+        sim.compare_quantized_snn(snn=snn,
+                                  quantized_snn=quantized_snn,
+                                  device=device,
+                                  data_loader=test_data_loader,
+                                  T=T,
+                                  poisson=config['simulation']['encoder']['possion'])
+
 
 def onnx_ann2snn(model_name, ann,device,norm_tensor, loss_function, T, log_dir, config, test_data_loader, z_score=None):
     import spikingjelly.clock_driven.ann2snn.onnx.parser as parser
@@ -1,6 +1,7 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+from spikingjelly.clock_driven import accelerating
 
 
 class MaxPool2d(nn.Module):
@@ -81,10 +82,22 @@ class MaxPool2d(nn.Module):
         self.momentum = momentum
 
         self.v = 0
+        self.v_buffer = None
 
     def forward(self, dv: torch.Tensor):
+        if self.v_buffer is not None:
+            # 重新使用reset()之前的v
+            if not isinstance(self.v, torch.Tensor):
+                v = accelerating.reuse_state(self.v_buffer, dv.shape, dv.device, dv.dtype)
+                if v is not None:
+                    self.v = v
+            self.v_buffer = None
         if self.momentum is not None:
-            self.v = self.v * self.momentum + (1 - self.momentum) * dv
+            if not torch.is_grad_enabled() and isinstance(self.v, torch.Tensor) and not self.v.requires_grad \
+                    and self.v.shape == dv.shape:
+                self.v.mul_(self.momentum).add_((1 - self.momentum) * dv)
+            else:
+                self.v = self.v * self.momentum + (1 - self.momentum) * dv
         else:
             self.v += dv
         (dv_out, ind) = F.max_pool2d(self.v, self.kernel_size, self.stride,
@@ -100,6 +113,7 @@ class MaxPool2d(nn.Module):
         '''
         :return: None
 
-        重置神经元为初始状态
+        重置神经元为初始状态。若输入的形状和设备不变，重置前的 ``v`` 的内存会在下一次前向传播时被重新使用
         '''
+        self.v_buffer = accelerating.stash_state(self.v)
         self.v = 0
\ No newline at end of file
@@ -0,0 +1,357 @@
+import onnx
+import onnx.helper as helper
+from io import BytesIO
+import numpy as np
+import torch
+import torch.nn as nn
+import copy
+import inspect
+import spikingjelly.clock_driven.neuron as neuron
+import spikingjelly.clock_driven.layer as layer
+import spikingjelly.clock_driven.functional as functional
+from spikingjelly.clock_driven.ann2snn.onnx.converter import add_value_info_for_constants
+
+class StepNode(nn.Module):
+    def __init__(self, node: neuron.BaseNode, multi_step=False):
+        '''
+        :param node: 被替换的神经元，支持 ``IFNode``、``LIFNode``、``PLIFNode`` 及它们的多步版本
+        :type node: neuron.BaseNode
+        :param multi_step: ``node`` 是否是多步神经元。若为 ``True``，输入和输出的 ``shape = [1, *]``
+        :type multi_step: bool
+
+        导出ONNX时代替 ``node`` 的模块。它只使用ONNX支持的基本运算，电压 ``self.v`` 由
+        :ref:`StepFunction <StepFunction.__init__-cn>` 在每一步前设置，并在这一步后读取，从而成为计算图的输入和输出。
+        ``tau``、``v_threshold`` 和 ``v_reset`` 可以是能够广播到电压形状的tensor，它们作为常量被导出；电压的初始值
+        ``self.v_init`` 此时也是tensor。
+        '''
+        super().__init__()
+        if not node.surrogate_function.spiking:
+            raise NotImplementedError('Only neurons whose surrogate_function.spiking is True can be exported')
+        if isinstance(node, neuron.LIFNode):
+            self.charge_type = 'lif'
+            self.tau = node.tau
+        elif isinstance(node, neuron.PLIFNode):
+            self.charge_type = 'plif'
+            with torch.no_grad():
+                self.w = (node.clamp_function(node.w) if node.clamp else node.w).detach().clone()
+        elif isinstance(node, neuron.IFNode):
+            self.charge_type = 'if'
+        else:
+            raise NotImplementedError(f'{node.__class__.__name__} can not be exported')
+        self.multi_step = multi_step
+        self.v_threshold = node.v_threshold
+        self.v_reset = node.v_reset
+        if node.v_reset is None:
+            self.v_init = 0.
+        elif isinstance(node.v_reset, torch.Tensor):
+            self.v_init = node.v_reset.detach().clone()
+        else:
+            self.v_init = float(node.v_reset)
+        self.v = None
+        self.shape = None
+
+    def extra_repr(self):
+        return f'charge_type={self.charge_type}, v_threshold={self.v_threshold}, v_reset={self.v_reset}, ' \
+               f'multi_step={self.multi_step}'
+
+    def hyperparameters(self):
+        # 导出为常量的超参数，名字 -> 值
+        ret = {'v_threshold': self.v_threshold, 'v_reset': self.v_reset}
+        if self.charge_type == 'lif':
+            ret['tau'] = self.tau
+        elif self.charge_type == 'plif':
+            ret['w'] = self.w
+        return ret
+
+    def check_hyperparameters(self):
+        '''
+        :return: None
+
+        检查tensor形式的超参数能否导出。超参数作为常量导出，而batch大小是动态的，因此超参数需要能够广播到电压的形状
+        ``self.shape``，并且不能含有大于1的batch维度（例如用于超参数扫描的逐样本的超参数），否则抛出 ``ValueError``。
+        '''
+        for name, value in self.hyperparameters().items():
+            if not isinstance(value, torch.Tensor) or value.dim() == 0:
+                continue
+            try:
+                broadcast_shape = torch.broadcast_shapes(value.shape, self.shape)
+            except RuntimeError:
+                broadcast_shape = None
+            if broadcast_shape != self.shape:
+                raise ValueError(f'The tensor {name} with shape {list(value.shape)} can not be broadcast to the voltage '
+                                 f'shape {list(self.shape)}, and can not be exported')
+            if value.dim() == self.shape.__len__() and value.shape[0] != 1:
+                raise ValueError(f'The tensor {name} with shape {list(value.shape)} has a batch dimension, e.g., '
+                                 f'per-sample hyperparameters, which can not be exported with a dynamic batch size')
+
+    def neuronal_charge(self, v: torch.Tensor, dv: torch.Tensor):
+        if self.charge_type == 'lif':
+            if self.v_reset is None:
+                return v + (dv - v) / self.tau
+            return v + (dv - (v - self.v_reset)) / self.tau
+        elif self.charge_type == 'plif':
+            if self.v_reset is None:
+                return v + (dv - v) * self.w
+            return v + (dv - (v - self.v_reset)) * self.w
+        else:
+            return v + dv
+
+    def forward(self, dv: torch.Tensor):
+        if self.multi_step:
+            dv = dv[0]
+        self.shape = dv.shape
+        v = torch.zeros_like(dv) + self.v_init if self.v is None else self.v
+        h = self.neuronal_charge(v, dv)
+        spike_bool = (h - self.v_threshold) >= 0
+        spike = spike_bool.to(h.dtype)
+        if self.v_reset is None:
+            self.v = h - spike * self.v_threshold
+        elif isinstance(self.v_reset, torch.Tensor):
+            self.v = h * (1 - spike) + self.v_reset * spike
+        else:
+            self.v = h.masked_fill(spike_bool, self.v_reset)
+        if self.multi_step:
+            return spike.unsqueeze(0)
+        return spike
+
+class StepFunction(nn.Module):
+    def __init__(self, net: nn.Module, multi_step=False):
+        '''
+        * :ref:`API in English <StepFunction.__init__-en>`
+
+        .. _StepFunction.__init__-cn:
+
+        :param net: 由 ``clock_driven.neuron`` 中的神经元和无状态的层组成的网络
+        :type net: nn.Module
+        :param multi_step: ``net`` 是否是多步网络，即输入 ``shape = [T, N, *]``。若为 ``True``，每一步以 ``T = 1`` 调用 ``net``
+        :type multi_step: bool
+
+        将 ``net`` 的一个时间步表示为无状态的函数 ``(v_0, v_1, ..., x_t) -> (v_0', v_1', ..., y_t)``。``net`` 被复制，其中的神经元被
+        替换为 :ref:`StepNode <StepNode.__init__-cn>`，``self.nodes`` 是它们的列表。``net`` 中除神经元之外的有状态模块（含有
+        ``reset()`` 的模块）不被支持，处于 ``eval`` 模式的 ``layer.Dropout`` 除外。
+
+        * :ref:`中文API <StepFunction.__init__-cn>`
+
+        .. _StepFunction.__init__-en:
+
+        :param net: a network composed of neurons in ``clock_driven.neuron`` and stateless layers
+        :type net: nn.Module
+        :param multi_step: whether ``net`` is a multi-step network, whose input ``shape = [T, N, *]``. If ``True``, ``net``
+            is called with ``T = 1`` at every step
+        :type multi_step: bool
+
+        Represent one time-step of ``net`` as a stateless function ``(v_0, v_1, ..., x_t) -> (v_0', v_1', ..., y_t)``.
+        ``net`` is copied, and its neurons are replaced by :ref:`StepNode <StepNode.__init__-en>`, whose list is
+        ``self.nodes``. Stateful modules in ``net`` other than neurons (modules that have ``reset()``) are not supported,
+        except ``layer.Dropout`` in ``eval`` mode.
+        '''
+        super().__init__()
+        self.net = copy.deepcopy(net).cpu().eval()
+        self.multi_step = multi_step
+        self.nodes = []
+        for parent in list(self.net.modules()):
+            for name, m in list(parent._modules.items()):
+                if isinstance(m, neuron.BaseNode):
+                    step_node = StepNode(m, isinstance(m, (neuron.MultiStepIFNode, neuron.MultiStepLIFNode,
+                                                           neuron.MultiStepPLIFNode)))
+                    setattr(parent, name, step_node)
+                    self.nodes.append(step_node)
+        for m in self.net.modules():
+            if hasattr(m, 'reset') and not isinstance(m, layer.Dropout):
+                raise NotImplementedError(f'The stateful module {m.__class__.__name__} can not be exported')
+
+    def forward(self, *args):
+        for i in range(self.nodes.__len__()):
+            self.nodes[i].v = args[i]
+        x = args[-1]
+        if self.multi_step:
+            y = self.net(x.unsqueeze(0))[0]
+        else:
+            y = self.net(x)
+        return tuple(node.v for node in self.nodes) + (y, )
+
+def export_onnx(net: nn.Module, x_seq: torch.Tensor, path=None, multi_step=False, opset_version=11):
+    '''
+    * :ref:`API in English <export_onnx-en>`
+
+    .. _export_onnx-cn:
+
+    :param net: 由 ``IFNode``、``LIFNode``、``PLIFNode`` （及它们的多步版本）和无状态的层组成的网络，``net(x)`` 返回一个tensor
+    :type net: nn.Module
+    :param x_seq: ``shape = [T, N, *]`` 的示例输入，用于确定每一步的输入形状和各个神经元的电压形状
+    :type x_seq: torch.Tensor
+    :param path: 保存ONNX模型的路径。为 ``None`` 时不保存
+    :type path: str
+    :param multi_step: ``net`` 是否是多步网络，见 :ref:`StepFunction <StepFunction.__init__-cn>`
+    :type multi_step: bool
+    :param opset_version: ONNX的opset版本，不低于9
+    :type opset_version: int
+    :return: ONNX模型，输入为 ``x_seq``，输出为 ``y_seq``，``T`` 和 ``N`` 是动态的维度
+    :rtype: onnx.ModelProto
+
+    将 ``net`` 导出为在时间维度上循环的ONNX模型。一个时间步被 :ref:`StepFunction <StepFunction.__init__-cn>` 表示为无状态的函数，
+    通过 ``torch.onnx.export`` 导出后作为 ``Scan`` 的循环体，所有神经元的电压是 ``Scan`` 的循环状态。电压的初始值在图内根据
+    ``x_seq`` 的batch大小由 ``ConstantOfShape`` 生成，因此每个神经元的电压的第0维需要是batch维度。tensor形式的 ``tau``、
+    ``v_threshold`` 和 ``v_reset`` 需要能够广播到电压的形状且不含batch维度，逐样本的超参数会引发 ``ValueError``。导出的模型可以用
+    :ref:`verify_onnx_export <verify_onnx_export-cn>` 与PyTorch的结果比较。
+
+    * :ref:`中文API <export_onnx-cn>`
+
+    .. _export_onnx-en:
+
+    :param net: a network composed of ``IFNode``, ``LIFNode``, ``PLIFNode`` (and their multi-step versions) and stateless
+        layers, whose ``net(x)`` returns a tensor
+    :type net: nn.Module
+    :param x_seq: an example input with ``shape = [T, N, *]``, which is used to determine the shape of the input at
+        every step and the shapes of the voltages of neurons
+    :type x_seq: torch.Tensor
+    :param path: the path to save the ONNX model. If ``None``, the model will not be saved
+    :type path: str
+    :param multi_step: whether ``net`` is a multi-step network, see :ref:`StepFunction <StepFunction.__init__-en>`
+    :type multi_step: bool
+    :param opset_version: the opset version of ONNX, which is not lower than 9
+    :type opset_version: int
+    :return: the ONNX model, whose input is ``x_seq`` and output is ``y_seq``, and ``T`` and ``N`` are dynamic dimensions
+    :rtype: onnx.ModelProto
+
+    Export ``net`` to an ONNX model that loops over the time dimension. One time-step is represented as a stateless
+    function by :ref:`StepFunction <StepFunction.__init__-en>`, which is exported by ``torch.onnx.export`` and used as
+    the body of ``Scan``, and the voltages of all neurons are the loop-carried states of ``Scan``. The initial voltages
+    are generated by ``ConstantOfShape`` in the graph according to the batch size of ``x_seq``, so dimension 0 of the
+    voltage of every neuron should be the batch dimension. Tensor ``tau``, ``v_threshold`` and ``v_reset`` should be
+    broadcastable to the shape of the voltage without a batch dimension, and per-sample hyperparameters raise
+    ``ValueError``. The exported model can be compared with PyTorch by
+    :ref:`verify_onnx_export <verify_onnx_export-en>`.
+    '''
+    step_function = StepFunction(net, multi_step)
+    x = x_seq[0].detach().cpu()
+    with torch.no_grad():
+        y = step_function(*([None] * step_function.nodes.__len__()), x)[-1]
+    for node in step_function.nodes:
+        node.check_hyperparameters()
+    v_init = [torch.zeros(node.shape, dtype=x.dtype) + node.v_init for node in step_function.nodes]
+    v_names = [f'v{i}' for i in range(v_init.__len__())]
+    v_next_names = [f'v{i}_next' for i in range(v_init.__len__())]
+    dynamic_axes = {name: {0: 'batch_size'} for name in v_names + v_next_names + ['x', 'y']}
+    export_kwargs = {}
+    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+        # 新版本的PyTorch默认使用dynamo导出，它依赖onnxscript，并会改变导出的循环体
+        export_kwargs['dynamo'] = False
+    f = BytesIO()
+    with torch.no_grad():
+        torch.onnx.export(step_function, tuple(v_init) + (x, ), f, input_names=v_names + ['x'],
+                          output_names=v_next_names + ['y'], dynamic_axes=dynamic_axes, opset_version=opset_version,
+                          keep_initializers_as_inputs=False, **export_kwargs)
+    step_model = onnx.load_from_string(f.getvalue())
+    body = step_model.graph
+    body.name = 'step'
+    if body.input.__len__() != v_init.__len__() + 1:
+        raise RuntimeError('Some voltages are not used by the exported step function')
+
+    nodes = [
+        helper.make_node('Shape', ['x_seq'], ['x_seq_shape']),
+        helper.make_node('Constant', [], ['batch_index'],
+                         value=helper.make_tensor('batch_index', onnx.TensorProto.INT64, [1], [1])),
+        helper.make_node('Gather', ['x_seq_shape', 'batch_index'], ['batch_size'], axis=0)
+    ]
+    init_names = []
+    for i in range(v_init.__len__()):
+        shape = list(v_init[i].shape[1:])
+        nodes.append(helper.make_node('Constant', [], [f'scan_v{i}_shape_tail'],
+                                      value=helper.make_tensor(f'scan_v{i}_shape_tail', onnx.TensorProto.INT64,
+                                                               [shape.__len__()], shape)))
+        nodes.append(helper.make_node('Concat', ['batch_size', f'scan_v{i}_shape_tail'], [f'scan_v{i}_shape'], axis=0))
+        node_v_init = step_function.nodes[i].v_init
+        if isinstance(node_v_init, torch.Tensor):
+            # 逐神经元的初始值：以0填充后加上广播到 [1, *] 的常量
+            nodes.append(helper.make_node('ConstantOfShape', [f'scan_v{i}_shape'], [f'scan_v{i}_zeros'],
+                                          value=helper.make_tensor(f'scan_v{i}_value', onnx.TensorProto.FLOAT, [1],
+                                                                   [0.])))
+            value = (torch.zeros([1] + shape) + node_v_init).float()
+            nodes.append(helper.make_node('Constant', [], [f'scan_v{i}_reset'],
+                                          value=helper.make_tensor(f'scan_v{i}_reset', onnx.TensorProto.FLOAT,
+                                                                   list(value.shape), value.flatten().tolist())))
+            nodes.append(helper.make_node('Add', [f'scan_v{i}_zeros', f'scan_v{i}_reset'], [f'scan_v{i}_init']))
+        else:
+            nodes.append(helper.make_node('ConstantOfShape', [f'scan_v{i}_shape'], [f'scan_v{i}_init'],
+                                          value=helper.make_tensor(f'scan_v{i}_value', onnx.TensorProto.FLOAT, [1],
+                                                                   [node_v_init])))
+        init_names.append(f'scan_v{i}_init')
+    nodes.append(helper.make_node('Scan', init_names + ['x_seq'],
+                                  [f'scan_v{i}_final' for i in range(v_init.__len__())] + ['y_seq'],
+                                  body=body, num_scan_inputs=1))
+
+    graph = helper.make_graph(
+        nodes, 'spikingjelly_scan',
+        [helper.make_tensor_value_info('x_seq', onnx.TensorProto.FLOAT, ['T', 'batch_size'] + list(x.shape[1:]))],
+        [helper.make_tensor_value_info('y_seq', onnx.TensorProto.FLOAT, ['T', 'batch_size'] + list(y.shape[1:]))]
+    )
+    model = helper.make_model(graph, opset_imports=step_model.opset_import, producer_name='spikingjelly')
+    model.ir_version = step_model.ir_version
+    add_value_info_for_constants(model)
+    onnx.checker.check_model(model)
+    if path is not None:
+        onnx.save(model, path)
+    return model
+
+def verify_onnx_export(net: nn.Module, model, x_seq: torch.Tensor, multi_step=False, eps=1e-5):
+    '''
+    * :ref:`API in English <verify_onnx_export-en>`
+
+    .. _verify_onnx_export-cn:
+
+    :param net: 被导出的网络
+    :type net: nn.Module
+    :param model: :ref:`export_onnx <export_onnx-cn>` 导出的ONNX模型或其路径
+    :type model: onnx.ModelProto or str
+    :param x_seq: ``shape = [T, N, *]`` 的输入，``T`` 和 ``N`` 可以与导出时不同
+    :type x_seq: torch.Tensor
+    :param multi_step: ``net`` 是否是多步网络
+    :type multi_step: bool
+    :param eps: 最大误差
+    :type eps: float
+    :return: ONNX Runtime与PyTorch的输出的最大误差
+    :rtype: float
+
+    在CPU上分别用PyTorch和ONNX Runtime运行 ``net`` 和 ``model``，检查两者的输出 ``y_seq`` 是否一致。“一致”被定义为，两者的误差不超过
+    eps。运行的是 ``net`` 的副本，因此 ``net`` 的状态不会被改变。
+
+    * :ref:`中文API <verify_onnx_export-cn>`
+
+    .. _verify_onnx_export-en:
+
+    :param net: the exported network
+    :type net: nn.Module
+    :param model: the ONNX model exported by :ref:`export_onnx <export_onnx-en>`, or its path
+    :type model: onnx.ModelProto or str
+    :param x_seq: the input with ``shape = [T, N, *]``, where ``T`` and ``N`` can be different from those in exporting
+    :type x_seq: torch.Tensor
+    :param multi_step: whether ``net`` is a multi-step network
+    :type multi_step: bool
+    :param eps: the maximum error
+    :type eps: float
+    :return: the maximum error between the outputs of ONNX Runtime and PyTorch
+    :rtype: float
+
+    Run ``net`` and ``model`` by PyTorch and ONNX Runtime on CPU respectively, and check whether their outputs
+    ``y_seq`` are the same. "The same" is defined as the error is not greater than eps. A copy of ``net`` is run, so the
+    state of ``net`` is not changed.
+    '''
+    x_seq = x_seq.detach().cpu().float()
+    net_c = copy.deepcopy(net).cpu().eval()
+    functional.reset_net(net_c)
+    with torch.no_grad():
+        if multi_step:
+            y_seq = net_c(x_seq)
+        else:
+            y_seq = torch.stack([net_c(x_seq[t]) for t in range(x_seq.shape[0])])
+    functional.reset_net(net_c)
+
+    import onnxruntime as ort
+    if isinstance(model, str):
+        model = onnx.load(model)
+    session = ort.InferenceSession(model.SerializeToString(), providers=['CPUExecutionProvider'])
+    onnx_y_seq = session.run(['y_seq'], {'x_seq': x_seq.numpy()})[0]
+    max_error = np.abs(onnx_y_seq - y_seq.float().numpy()).max().item()
+    assert max_error <= eps, f'The output of ONNX Runtime is different from PyTorch, max_error={max_error}!'
+    return max_error
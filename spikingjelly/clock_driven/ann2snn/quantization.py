@@ -0,0 +1,545 @@
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torch.nn.modules.utils import _pair
+import spikingjelly.clock_driven.neuron as neuron
+import spikingjelly.clock_driven.accelerating as accelerating
+import spikingjelly.clock_driven.ann2snn.modules as modules
+
+def quantize_tensor(x: torch.Tensor, scale: float, bits=8):
+    '''
+    :param x: 浮点数tensor
+    :type x: torch.Tensor
+    :param scale: 量化的步长，``x`` 近似为 ``x_q * scale``
+    :type scale: float
+    :param bits: 量化的位数，不超过8
+    :type bits: int
+    :return: 对称量化后的 ``torch.int8`` tensor ``x_q``
+    :rtype: torch.Tensor
+    '''
+    q_max = 2 ** (bits - 1) - 1
+    return torch.clamp(torch.round(x / scale), -q_max, q_max).to(torch.int8)
+
+def tensor_scale(x: torch.Tensor, bits=8):
+    '''
+    :param x: 浮点数tensor
+    :type x: torch.Tensor
+    :param bits: 量化的位数
+    :type bits: int
+    :return: 使 ``x`` 的最大绝对值被量化为 ``2 ** (bits - 1) - 1`` 的步长
+    :rtype: float
+    '''
+    x_max = x.abs().max().item()
+    if x_max == 0.:
+        return 1.
+    return x_max / (2 ** (bits - 1) - 1)
+
+def calibrate_input_scale(data_loader, bits=8, num_batches=1):
+    '''
+    :param data_loader: 数据加载器，每个batch为 ``(x, label)``
+    :param bits: 量化的位数
+    :type bits: int
+    :param num_batches: 用于校准的batch数量
+    :type num_batches: int
+    :return: 输入的量化步长，使前 ``num_batches`` 个batch中输入的最大绝对值被量化为 ``2 ** (bits - 1) - 1``
+    :rtype: float
+    '''
+    x_max = 0.
+    for batch, (x, label) in enumerate(data_loader):
+        if batch >= num_batches:
+            break
+        x_max = max(x_max, x.abs().max().item())
+    if x_max == 0.:
+        return 1.
+    return x_max / (2 ** (bits - 1) - 1)
+
+def int_unfold(x: torch.Tensor, kernel_size, stride, padding, dilation, pad_value=0):
+    # 整数tensor的im2col，F.unfold不支持整数。返回 shape = [N, C, OH, OW, kH, kW] 的tensor
+    kernel_size = _pair(kernel_size)
+    stride = _pair(stride)
+    padding = _pair(padding)
+    dilation = _pair(dilation)
+    if padding[0] > 0 or padding[1] > 0:
+        x = F.pad(x, [padding[1], padding[1], padding[0], padding[0]], value=pad_value)
+    x = x.unfold(2, (kernel_size[0] - 1) * dilation[0] + 1, stride[0])
+    x = x.unfold(3, (kernel_size[1] - 1) * dilation[1] + 1, stride[1])
+    return x[..., ::dilation[0], ::dilation[1]]
+
+class QuantizedLinear(nn.Module):
+    def __init__(self, linear: nn.Linear, input_scale: float, weight_bits=8, spike_input=False):
+        '''
+        * :ref:`API in English <QuantizedLinear.__init__-en>`
+
+        .. _QuantizedLinear.__init__-cn:
+
+        :param linear: 浮点数的全连接层
+        :type linear: nn.Linear
+        :param input_scale: 整数输入的步长，输入 ``x_q`` 表示的实数值为 ``x_q * input_scale``
+        :type input_scale: float
+        :param weight_bits: 权重量化的位数，不超过8
+        :type weight_bits: int
+        :param spike_input: 输入是否为只含 ``0`` 和 ``1`` 的脉冲
+        :type spike_input: bool
+
+        权重被对称量化为 ``torch.int8``，偏置被量化为与累加结果相同步长的 ``torch.int32``。转换时预先计算转置后的 ``torch.int32``
+        权重，前向传播时整数输入与整数权重相乘并以 ``torch.int32`` 累加，输出 ``y_q`` 表示的实数值为 ``y_q * output_scale``。
+        ``spike_input = True`` 时，使用与 :ref:`accelerating.sparse_spike_linear <sparse_spike_linear-cn>` 相同的方式，只取出
+        发放脉冲的输入对应的权重并累加，突触运算只有整数加法，计算量与脉冲的数量成正比。
+
+        * :ref:`中文API <QuantizedLinear.__init__-cn>`
+
+        .. _QuantizedLinear.__init__-en:
+
+        :param linear: the floating-point linear layer
+        :type linear: nn.Linear
+        :param input_scale: the step of the integer input, and the input ``x_q`` represents the real value
+            ``x_q * input_scale``
+        :type input_scale: float
+        :param weight_bits: the number of bits of the quantized weight, which is not larger than 8
+        :type weight_bits: int
+        :param spike_input: whether the input is spikes only containing ``0`` and ``1``
+        :type spike_input: bool
+
+        The weight is quantized symmetrically to ``torch.int8``, and the bias is quantized to ``torch.int32`` with the same
+        step as the accumulation. The transposed ``torch.int32`` weight is computed in advance at conversion. In forward,
+        the integer input is multiplied with the integer weight and accumulated in ``torch.int32``, and the output ``y_q``
+        represents the real value ``y_q * output_scale``. When ``spike_input = True``, only the weights of the inputs that
+        fire spikes are picked and accumulated in the same way as
+        :ref:`accelerating.sparse_spike_linear <sparse_spike_linear-en>`, so synaptic operations are only integer
+        additions, and the computation is proportional to the number of spikes.
+        '''
+        super().__init__()
+        weight = linear.weight.detach()
+        self.weight_scale = tensor_scale(weight, weight_bits)
+        self.input_scale = input_scale
+        self.output_scale = input_scale * self.weight_scale
+        self.spike_input = spike_input
+        self.register_buffer('weight', quantize_tensor(weight, self.weight_scale, weight_bits))
+        # shape = [in_features, out_features]，由weight得到，不保存在state_dict中
+        self.register_buffer('weight_t', None, persistent=False)
+        self.update_weight_t()
+        if linear.bias is None:
+            self.bias = None
+        else:
+            self.register_buffer('bias', torch.round(linear.bias.detach() / self.output_scale).to(torch.int32))
+
+    def update_weight_t(self):
+        self.weight_t = self.weight.to(torch.int32).t().contiguous()
+
+    def _load_from_state_dict(self, *args, **kwargs):
+        super()._load_from_state_dict(*args, **kwargs)
+        self.update_weight_t()
+
+    def extra_repr(self) -> str:
+        return f'in_features={self.weight.shape[1]}, out_features={self.weight.shape[0]}, ' \
+               f'bias={self.bias is not None}, output_scale={self.output_scale}, spike_input={self.spike_input}'
+
+    def forward(self, x: torch.Tensor):
+        if self.spike_input:
+            return accelerating.sparse_spike_linear(x, self.weight_t.t(), self.bias, self.weight_t)
+        y = torch.matmul(x.to(torch.int32), self.weight_t)
+        if self.bias is not None:
+            y += self.bias
+        return y
+
+class QuantizedConv2d(nn.Module):
+    def __init__(self, conv: nn.Conv2d, input_scale: float, weight_bits=8, spike_input=False):
+        '''
+        * :ref:`API in English <QuantizedConv2d.__init__-en>`
+
+        .. _QuantizedConv2d.__init__-cn:
+
+        :param conv: 浮点数的卷积层，``groups`` 必须为1，``padding_mode`` 必须为 ``'zeros'``
+        :type conv: nn.Conv2d
+        :param input_scale: 见 :ref:`QuantizedLinear <QuantizedLinear.__init__-cn>`
+        :type input_scale: float
+        :param weight_bits: 见 :ref:`QuantizedLinear <QuantizedLinear.__init__-cn>`
+        :type weight_bits: int
+        :param spike_input: 见 :ref:`QuantizedLinear <QuantizedLinear.__init__-cn>`
+        :type spike_input: bool
+
+        整数卷积层。PyTorch的卷积不支持整数，因此使用整数的im2col和整数矩阵乘法实现，``spike_input = True`` 时只累加脉冲对应的权重，
+        量化方式与 :ref:`QuantizedLinear <QuantizedLinear.__init__-cn>` 相同。
+
+        * :ref:`中文API <QuantizedConv2d.__init__-cn>`
+
+        .. _QuantizedConv2d.__init__-en:
+
+        :param conv: the floating-point convolutional layer, whose ``groups`` must be 1 and ``padding_mode`` must be
+            ``'zeros'``
+        :type conv: nn.Conv2d
+        :param input_scale: see :ref:`QuantizedLinear <QuantizedLinear.__init__-en>`
+        :type input_scale: float
+        :param weight_bits: see :ref:`QuantizedLinear <QuantizedLinear.__init__-en>`
+        :type weight_bits: int
+        :param spike_input: see :ref:`QuantizedLinear <QuantizedLinear.__init__-en>`
+        :type spike_input: bool
+
+        The integer convolutional layer. The convolution of PyTorch does not support integers, so it is implemented by
+        the integer im2col and the integer matrix multiplication, and only the weights of spikes are accumulated when
+        ``spike_input = True``. The quantization is the same as that of
+        :ref:`QuantizedLinear <QuantizedLinear.__init__-en>`.
+        '''
+        super().__init__()
+        if conv.groups != 1 or conv.padding_mode != 'zeros':
+            raise NotImplementedError('QuantizedConv2d only supports groups=1 and padding_mode=\'zeros\'')
+        self.stride = conv.stride
+        self.padding = conv.padding
+        self.dilation = conv.dilation
+        weight = conv.weight.detach()
+        self.weight_scale = tensor_scale(weight, weight_bits)
+        self.input_scale = input_scale
+        self.output_scale = input_scale * self.weight_scale
+        self.spike_input = spike_input
+        self.register_buffer('weight', quantize_tensor(weight, self.weight_scale, weight_bits))
+        # shape = [C * kH * kW, C_out]，由weight得到，不保存在state_dict中
+        self.register_buffer('weight_t', None, persistent=False)
+        self.update_weight_t()
+        if conv.bias is None:
+            self.bias = None
+        else:
+            self.register_buffer('bias', torch.round(conv.bias.detach() / self.output_scale).to(torch.int32))
+
+    def update_weight_t(self):
+        self.weight_t = self.weight.to(torch.int32).view(self.weight.shape[0], -1).t().contiguous()
+
+    def _load_from_state_dict(self, *args, **kwargs):
+        super()._load_from_state_dict(*args, **kwargs)
+        self.update_weight_t()
+
+    def extra_repr(self) -> str:
+        return f'{self.weight.shape[1]}, {self.weight.shape[0]}, kernel_size={tuple(self.weight.shape[2:])}, ' \
+               f'stride={self.stride}, padding={self.padding}, dilation={self.dilation}, ' \
+               f'bias={self.bias is not None}, output_scale={self.output_scale}, spike_input={self.spike_input}'
+
+    def forward(self, x: torch.Tensor):
+        # x.shape = [N, C, H, W]
+        cols = int_unfold(x, self.weight.shape[2:], self.stride, self.padding, self.dilation)
+        N, C, OH, OW, KH, KW = cols.shape
+        cols = cols.permute(0, 2, 3, 1, 4, 5).reshape(N * OH * OW, C * KH * KW)
+        if self.spike_input:
+            y = accelerating.sparse_spike_linear(cols, self.weight_t.t(), self.bias, self.weight_t)
+        else:
+            y = torch.mm(cols.to(torch.int32), self.weight_t)
+            if self.bias is not None:
+                y += self.bias
+        return y.view(N, OH, OW, -1).permute(0, 3, 1, 2)
+
+class QuantizedAvgPool2d(nn.Module):
+    def __init__(self, pool: nn.AvgPool2d, input_scale: float):
+        '''
+        :param pool: 浮点数的平均池化层，``ceil_mode`` 必须为 ``False``，有padding时 ``count_include_pad`` 必须为 ``True``
+        :type pool: nn.AvgPool2d
+        :param input_scale: 见 :ref:`QuantizedLinear <QuantizedLinear.__init__-cn>`
+        :type input_scale: float
+
+        整数的求和池化。平均池化的除法被并入输出的步长 ``output_scale = input_scale / (kH * kW)`` 中。
+        '''
+        super().__init__()
+        if pool.ceil_mode or (not pool.count_include_pad and _pair(pool.padding) != (0, 0)) \
+                or pool.divisor_override is not None:
+            raise NotImplementedError('QuantizedAvgPool2d does not support ceil_mode, divisor_override, '
+                                      'or count_include_pad=False with padding')
+        self.kernel_size = _pair(pool.kernel_size)
+        self.stride = _pair(pool.stride if pool.stride is not None else pool.kernel_size)
+        self.padding = _pair(pool.padding)
+        self.input_scale = input_scale
+        self.output_scale = input_scale / (self.kernel_size[0] * self.kernel_size[1])
+
+    def extra_repr(self) -> str:
+        return f'kernel_size={self.kernel_size}, stride={self.stride}, padding={self.padding}, ' \
+               f'output_scale={self.output_scale}'
+
+    def forward(self, x: torch.Tensor):
+        return int_unfold(x.to(torch.int32), self.kernel_size, self.stride, self.padding, 1).sum(dim=(4, 5),
+                                                                                                  dtype=torch.int32)
+
+class QuantizedMaxPool2d(nn.Module):
+    def __init__(self, pool: nn.MaxPool2d):
+        '''
+        :param pool: 浮点数的最大池化层，``ceil_mode`` 和 ``return_indices`` 必须为 ``False``
+        :type pool: nn.MaxPool2d
+
+        整数的最大池化，输出的步长与输入相同。
+        '''
+        super().__init__()
+        if pool.ceil_mode or pool.return_indices:
+            raise NotImplementedError('QuantizedMaxPool2d does not support ceil_mode or return_indices')
+        self.kernel_size = _pair(pool.kernel_size)
+        self.stride = _pair(pool.stride if pool.stride is not None else pool.kernel_size)
+        self.padding = _pair(pool.padding)
+        self.dilation = _pair(pool.dilation)
+
+    def extra_repr(self) -> str:
+        return f'kernel_size={self.kernel_size}, stride={self.stride}, padding={self.padding}, dilation={self.dilation}'
+
+    def forward(self, x: torch.Tensor):
+        cols = int_unfold(x, self.kernel_size, self.stride, self.padding, self.dilation, torch.iinfo(x.dtype).min)
+        return cols.flatten(4).max(dim=4)[0]
+
+class QuantizedGatedMaxPool2d(nn.Module):
+    def __init__(self, pool: modules.MaxPool2d):
+        '''
+        :param pool: :ref:`ann2snn.modules.MaxPool2d <MaxPool2d.__init__-cn>`，输入必须是脉冲
+
+        以浮点数运行门控的最大池化，并将输出的脉冲转换回整数。它的状态由 ``pool`` 保存，``functional.reset_net`` 会重置 ``pool``。
+        '''
+        super().__init__()
+        self.pool = pool
+
+    def forward(self, spike: torch.Tensor):
+        return self.pool(spike.float()).to(spike.dtype)
+
+class QuantizedIFNode(nn.Module):
+    def __init__(self, node: neuron.BaseNode, input_scale: float, v_dtype=torch.int32):
+        '''
+        * :ref:`API in English <QuantizedIFNode.__init__-en>`
+
+        .. _QuantizedIFNode.__init__-cn:
+
+        :param node: 浮点数的神经元，``v_threshold`` 和 ``v_reset`` 必须是标量
+        :type node: neuron.IFNode
+        :param input_scale: 整数输入电流的步长
+        :type input_scale: float
+        :param v_dtype: 膜电位的整数类型，例如 ``torch.int16`` 或 ``torch.int32``
+        :type v_dtype: torch.dtype
+
+        整数的IF神经元。整数膜电位 ``v`` 表示 ``(V - V_reset) / input_scale``，阈值被转换为整数
+        ``round((V_threshold - V_reset) / input_scale)``，充电只需要整数加法。充电在 ``torch.int64`` 中计算，并饱和到 ``v_dtype``
+        的范围内。输出的脉冲为 ``torch.int8``。
+
+        * :ref:`中文API <QuantizedIFNode.__init__-cn>`
+
+        .. _QuantizedIFNode.__init__-en:
+
+        :param node: the floating-point neuron, whose ``v_threshold`` and ``v_reset`` must be scalars
+        :type node: neuron.IFNode
+        :param input_scale: the step of the integer input current
+        :type input_scale: float
+        :param v_dtype: the integer dtype of the membrane potential, e.g., ``torch.int16`` or ``torch.int32``
+        :type v_dtype: torch.dtype
+
+        The integer IF neuron. The integer membrane potential ``v`` represents ``(V - V_reset) / input_scale``, and the
+        threshold is converted to the integer ``round((V_threshold - V_reset) / input_scale)``. Charging only needs
+        integer additions. Charging is computed in ``torch.int64`` and saturated to the range of ``v_dtype``. The output
+        spikes are ``torch.int8``.
+        '''
+        super().__init__()
+        if isinstance(node.v_threshold, torch.Tensor) and node.v_threshold.numel() != 1 \
+                or isinstance(node.v_reset, torch.Tensor) and node.v_reset.numel() != 1:
+            raise ValueError('Only neurons with scalar v_threshold and v_reset can be quantized')
+        self.v_dtype = v_dtype
+        self.input_scale = input_scale
+        self.hard_reset = node.v_reset is not None
+        v_reset = float(node.v_reset) if self.hard_reset else 0.
+        self.v_threshold = round(self.gain() * (float(node.v_threshold) - v_reset) / input_scale)
+        if self.v_threshold > torch.iinfo(v_dtype).max:
+            raise ValueError(f'The integer threshold {self.v_threshold} overflows {v_dtype}')
+        self.v = 0
+
+    def gain(self):
+        # 整数膜电位相对于 (V - V_reset) / input_scale 的倍数
+        return 1.
+
+    def extra_repr(self) -> str:
+        return f'v_threshold={self.v_threshold}, hard_reset={self.hard_reset}, v_dtype={self.v_dtype}'
+
+    def neuronal_charge(self, dv: torch.Tensor):
+        if isinstance(self.v, torch.Tensor):
+            return self.v.to(torch.int64) + dv
+        else:
+            return dv.to(torch.int64)
+
+    def forward(self, dv: torch.Tensor):
+        v = self.neuronal_charge(dv)
+        spike = v >= self.v_threshold
+        if self.hard_reset:
+            v.masked_fill_(spike, 0)
+        else:
+            v -= spike * self.v_threshold
+        info = torch.iinfo(self.v_dtype)
+        self.v = v.clamp_(info.min, info.max).to(self.v_dtype)
+        return spike.to(torch.int8)
+
+    def reset(self):
+        self.v = 0
+
+class QuantizedLIFNode(QuantizedIFNode):
+    decay_bits = 16
+
+    def __init__(self, node: neuron.LIFNode, input_scale: float, v_dtype=torch.int32):
+        '''
+        * :ref:`API in English <QuantizedLIFNode.__init__-en>`
+
+        .. _QuantizedLIFNode.__init__-cn:
+
+        :param node: 浮点数的LIF神经元，``tau``、``v_threshold`` 和 ``v_reset`` 必须是标量
+        :type node: neuron.LIFNode
+        :param input_scale: 见 :ref:`QuantizedIFNode <QuantizedIFNode.__init__-cn>`
+        :type input_scale: float
+        :param v_dtype: 见 :ref:`QuantizedIFNode <QuantizedIFNode.__init__-cn>`
+        :type v_dtype: torch.dtype
+
+        整数的LIF神经元。整数膜电位 ``v`` 表示 ``tau * (V - V_reset) / input_scale``，从而充电
+        :math:`v_t = v_{t-1}(1 - \\frac{1}{\\tau}) + x_t` 不需要除法。衰减 :math:`1 - \\frac{1}{\\tau}` 用16位定点数表示，乘法后通过
+        右移舍入。
+
+        * :ref:`中文API <QuantizedLIFNode.__init__-cn>`
+
+        .. _QuantizedLIFNode.__init__-en:
+
+        :param node: the floating-point LIF neuron, whose ``tau``, ``v_threshold`` and ``v_reset`` must be scalars
+        :type node: neuron.LIFNode
+        :param input_scale: see :ref:`QuantizedIFNode <QuantizedIFNode.__init__-en>`
+        :type input_scale: float
+        :param v_dtype: see :ref:`QuantizedIFNode <QuantizedIFNode.__init__-en>`
+        :type v_dtype: torch.dtype
+
+        The integer LIF neuron. The integer membrane potential ``v`` represents ``tau * (V - V_reset) / input_scale``,
+        so that the charge :math:`v_t = v_{t-1}(1 - \\frac{1}{\\tau}) + x_t` does not need division. The decay
+        :math:`1 - \\frac{1}{\\tau}` is represented by a 16-bit fixed-point number, and the product is rounded by a right
+        shift.
+        '''
+        if isinstance(node.tau, torch.Tensor) and node.tau.numel() != 1:
+            raise ValueError('Only LIF neurons with scalar tau can be quantized')
+        self.tau = float(node.tau)
+        super().__init__(node, input_scale, v_dtype)
+        self.decay = round((1. - 1. / self.tau) * 2 ** self.decay_bits)
+
+    def gain(self):
+        return self.tau
+
+    def extra_repr(self) -> str:
+        return super().extra_repr() + f', tau={self.tau}'
+
+    def neuronal_charge(self, dv: torch.Tensor):
+        if isinstance(self.v, torch.Tensor):
+            return ((self.v.to(torch.int64) * self.decay + 2 ** (self.decay_bits - 1)) >> self.decay_bits) + dv
+        else:
+            return dv.to(torch.int64)
+
+# 被整体转换的模块。它们可能含有子模块，例如神经元的 ``surrogate_function``，转换时不再遍历这些子模块
+quantizable_types = (nn.Linear, nn.Conv2d, nn.AvgPool2d, nn.MaxPool2d, modules.MaxPool2d, nn.Flatten, nn.Dropout,
+                     nn.Identity, neuron.BaseNode)
+
+def quantizable_modules(net: nn.Module):
+    '''
+    :param net: 顺序结构的网络
+    :type net: nn.Module
+    :return: 按顺序逐个返回 ``net`` 中需要转换的模块的生成器
+
+    深度优先地遍历 ``net``。属于 ``quantizable_types`` 的模块和叶子模块被返回，其他模块则继续遍历它们的子模块。
+    '''
+    if isinstance(net, quantizable_types) or next(net.children(), None) is None:
+        yield net
+    else:
+        for m in net.children():
+            yield from quantizable_modules(m)
+
+class QuantizedSNN(nn.Module):
+    def __init__(self, snn: nn.Module, input_scale: float, weight_bits=8, v_dtype=torch.int32, input_bits=8):
+        '''
+        * :ref:`API in English <QuantizedSNN.__init__-en>`
+
+        .. _QuantizedSNN.__init__-cn:
+
+        :param snn: 顺序结构的SNN，例如 :ref:`PyTorch_Converter <SNN.__init__-cn>` 转换得到的SNN。按深度优先的顺序依次转换
+            ``snn`` 中的模块，被转换的模块（例如神经元）的子模块不再被遍历
+        :type snn: nn.Module
+        :param input_scale: 输入的量化步长，可以由 ``calibrate_input_scale`` 得到
+        :type input_scale: float
+        :param weight_bits: 权重量化的位数，不超过8
+        :type weight_bits: int
+        :param v_dtype: 膜电位的整数类型，例如 ``torch.int16`` 或 ``torch.int32``
+        :type v_dtype: torch.dtype
+        :param input_bits: 输入量化的位数，不超过8，应与得到 ``input_scale`` 时使用的 ``bits`` 相同
+        :type input_bits: int
+
+        用于CPU部署的整数推理网络。输入被量化为 ``torch.int8``，``Linear`` 和 ``Conv2d`` 的权重被量化为 ``torch.int8`` 并以
+        ``torch.int32`` 累加，输入为神经元输出的脉冲时只累加脉冲对应的权重，``IFNode`` 和 ``LIFNode`` 使用整数阈值和 ``v_dtype`` 的膜电位，神经元之间传递 ``torch.int8`` 的脉冲。
+        每层输出的步长在转换时确定，只有网络的最后输出被转换回浮点数 ``y_q * output_scale``。支持的模块为 ``Linear``、
+        ``Conv2d``、``AvgPool2d``、``MaxPool2d``、:ref:`ann2snn.modules.MaxPool2d <MaxPool2d.__init__-cn>`、``Flatten``、
+        ``IFNode`` 和 ``LIFNode``，``Dropout`` 和 ``Identity`` 被忽略。与浮点数网络一样，每次调用仿真一个时间步，并使用
+        ``functional.reset_net`` 重置。与浮点数网络的精度比较见 ``simulation.compare_quantized_snn``。
+
+        * :ref:`中文API <QuantizedSNN.__init__-cn>`
+
+        .. _QuantizedSNN.__init__-en:
+
+        :param snn: an SNN with a sequential structure, e.g., the SNN converted by
+            :ref:`PyTorch_Converter <SNN.__init__-en>`. The modules in ``snn`` are converted in depth-first order, and
+            the children of converted modules (e.g., neurons) are not traversed
+        :type snn: nn.Module
+        :param input_scale: the quantization step of the input, which can be got by
+            ``calibrate_input_scale``
+        :type input_scale: float
+        :param weight_bits: the number of bits of the quantized weight, which is not larger than 8
+        :type weight_bits: int
+        :param v_dtype: the integer dtype of the membrane potential, e.g., ``torch.int16`` or ``torch.int32``
+        :type v_dtype: torch.dtype
+        :param input_bits: the number of bits of the quantized input, which is not larger than 8 and should be the same
+            as the ``bits`` used to get ``input_scale``
+        :type input_bits: int
+
+        The integer inference network for deploying on CPU. The input is quantized to ``torch.int8``. The weights of
+        ``Linear`` and ``Conv2d`` are quantized to ``torch.int8`` and accumulated in ``torch.int32``, and only the weights
+        of spikes are accumulated when their inputs are spikes from neurons. ``IFNode`` and
+        ``LIFNode`` use integer thresholds and membrane potentials of ``v_dtype``, and ``torch.int8`` spikes are passed
+        between neurons. The step of the output of every layer is determined in conversion, and only the final output
+        of the network is converted back to floating-point ``y_q * output_scale``. The supported modules are ``Linear``,
+        ``Conv2d``, ``AvgPool2d``, ``MaxPool2d``, :ref:`ann2snn.modules.MaxPool2d <MaxPool2d.__init__-en>`, ``Flatten``,
+        ``IFNode`` and ``LIFNode``, while ``Dropout`` and ``Identity`` are ignored. The same as the floating-point
+        network, every call simulates one time-step, and ``functional.reset_net`` resets it. Refer to
+        ``simulation.compare_quantized_snn`` for comparing the accuracy with the floating-point network.
+        '''
+        super().__init__()
+        if not 2 <= weight_bits <= 8:
+            raise ValueError(f'weight_bits should be in [2, 8], but got {weight_bits}')
+        if not 2 <= input_bits <= 8:
+            raise ValueError(f'input_bits should be in [2, 8], but got {input_bits}')
+        self.input_scale = input_scale
+        self.weight_bits = weight_bits
+        self.input_bits = input_bits
+        scale = input_scale
+        spiking = False  # 当前模块的输入是否为脉冲
+        module_list = []
+        for m in quantizable_modules(snn):
+            if isinstance(m, nn.Linear):
+                m = QuantizedLinear(m, scale, weight_bits, spiking)
+                scale = m.output_scale
+                spiking = False
+            elif isinstance(m, nn.Conv2d):
+                m = QuantizedConv2d(m, scale, weight_bits, spiking)
+                scale = m.output_scale
+                spiking = False
+            elif isinstance(m, nn.AvgPool2d):
+                m = QuantizedAvgPool2d(m, scale)
+                scale = m.output_scale
+                spiking = False
+            elif isinstance(m, nn.MaxPool2d):
+                m = QuantizedMaxPool2d(m)
+            elif isinstance(m, modules.MaxPool2d):
+                if scale != 1.:
+                    raise NotImplementedError('ann2snn.modules.MaxPool2d can only be quantized after neurons')
+                m = QuantizedGatedMaxPool2d(m)
+            elif isinstance(m, nn.Flatten):
+                pass
+            elif isinstance(m, neuron.LIFNode):
+                m = QuantizedLIFNode(m, scale, v_dtype)
+                scale = 1.
+                spiking = True
+            elif isinstance(m, neuron.IFNode):
+                m = QuantizedIFNode(m, scale, v_dtype)
+                scale = 1.
+                spiking = True
+            elif isinstance(m, (nn.Dropout, nn.Identity)):
+                continue
+            else:
+                raise NotImplementedError(f'{m.__class__.__name__} can not be quantized')
+            module_list.append(m)
+        self.network = nn.Sequential(*module_list)
+        self.output_scale = scale
+
+    def forward(self, x: torch.Tensor):
+        x = quantize_tensor(x, self.input_scale, self.input_bits)
+        return self.network(x).float() * self.output_scale
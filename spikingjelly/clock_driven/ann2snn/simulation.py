@@ -7,6 +7,7 @@ import spikingjelly.clock_driven.functional as functional
 import matplotlib.pyplot as plt
 import numpy as np
 import tqdm
+import time
 def simulate_snn(snn, device, data_loader, T, poisson=False, online_draw=False,fig_name='default',ann_baseline=0,save_acc_list=False,log_dir=None): # TODO ugly
     '''
     * :ref:`API in English <simulate_snn-en>`
@@ -99,6 +100,223 @@ def simulate_snn(snn, device, data_loader, T, poisson=False, online_draw=False,f
         plt.close()
     return acc
 
+def benchmark_inference_path(snn, device, data_loader, T, poisson=False, max_batches=None, seed=0):
+    '''
+    * :ref:`API in English <benchmark_inference_path-en>`
+
+    .. _benchmark_inference_path-cn:
+
+    :param snn: SNN模型
+    :param device: 运行的设备
+    :param data_loader: 测试数据加载器
+    :param T: 仿真时长
+    :param poisson: 当设置为 ``True`` ，输入采用泊松编码器；否则，采用恒定输入并持续T时间步
+    :param max_batches: 最多测试的batch数量。为 ``None`` 时测试 ``data_loader`` 中的全部数据
+    :param seed: 每种方式开始遍历 ``data_loader`` 前设置的随机种子，使两种方式的数据顺序和泊松编码相同
+    :type seed: int
+    :return: 测试结果字典，包括两种方式的耗时（单位为秒）、每秒仿真的时间步数、加速比，以及两种方式的输出是否一致
+    :rtype: dict
+
+    以与 :ref:`simulate_snn <simulate_snn-cn>` 相同的方式运行SNN，分别测试神经元使用原有的放电过程（``fast_inference = False``）和
+    :ref:`BaseNode.inference_spiking <BaseNode.inference_spiking-cn>` 时的耗时，并打印结果。每种方式都在固定的随机种子下重新遍历
+    ``data_loader`` 并逐个batch地编码输入，因此两种方式使用相同的输入，而内存中只保存一个batch的输入。只有网络的运行被计时，
+    数据加载和编码不计入耗时。调用者的随机数生成器的状态不会被改变。
+
+    * :ref:`中文API <benchmark_inference_path-cn>`
+
+    .. _benchmark_inference_path-en:
+
+    :param snn: SNN model
+    :param device: running device
+    :param data_loader: testing data loader
+    :param T: simulating steps
+    :param poisson: when ``True``, use poisson encoder; otherwise, use constant input over T steps
+    :param max_batches: the maximum number of tested batches. If ``None``, all data in ``data_loader`` will be tested
+    :param seed: the random seed set before each path iterates over ``data_loader``, which makes the order of data and
+        the poisson encoding the same for the two paths
+    :type seed: int
+    :return: a dictionary of results, including the time (in seconds) of the two paths, the simulated time-steps per
+        second, the speedup, and whether the outputs of the two paths are the same
+    :rtype: dict
+
+    Run the SNN in the same way as :ref:`simulate_snn <simulate_snn-en>`, benchmark the time when neurons use the former
+    fire process (``fast_inference = False``) and :ref:`BaseNode.inference_spiking <BaseNode.inference_spiking-en>`
+    respectively, and print the results. Each path iterates over ``data_loader`` again with the fixed random seed and
+    encodes inputs batch by batch, so the two paths use the same inputs while only the inputs of one batch are kept in
+    memory. Only running the network is timed, and loading and encoding data are not counted. The states of the
+    random number generators of the caller are not changed.
+    '''
+    nodes = [m for m in snn.modules() if isinstance(m, neuron.BaseNode)]
+    fast_inference = [m.fast_inference for m in nodes]
+    cuda = str(device).startswith('cuda')
+    rng_devices = [torch.device(device).index or 0] if cuda else []
+
+    def run(state, max_batches):
+        for m in nodes:
+            m.fast_inference = state
+        outputs = []
+        elapsed = 0.
+        steps = 0
+        with torch.random.fork_rng(devices=rng_devices):
+            torch.manual_seed(seed)
+            encoder = encoding.PoissonEncoder()
+            for batch, (img, label) in enumerate(data_loader):
+                if max_batches is not None and batch >= max_batches:
+                    break
+                img = img.to(device)
+                if poisson:
+                    x_seq = [encoder(img).float() for t in range(T)]
+                else:
+                    x_seq = [img] * T
+                if cuda:
+                    torch.cuda.synchronize(device)
+                t_start = time.perf_counter()
+                functional.reset_net(snn)
+                out_spikes_counter = 0
+                for x in x_seq:
+                    out = snn(x)
+                    if isinstance(out, tuple) or isinstance(out, list):
+                        out = out[0]
+                    out_spikes_counter += out
+                if cuda:
+                    torch.cuda.synchronize(device)
+                elapsed += time.perf_counter() - t_start
+                outputs.append(out_spikes_counter)
+                steps += T
+        return elapsed, outputs, steps
+
+    with torch.no_grad():
+        snn.eval()
+        run(True, 1)  # 预热
+        origin_time, origin_outputs, steps = run(False, max_batches)
+        fast_time, fast_outputs, _ = run(True, max_batches)
+    functional.reset_net(snn)
+    for i in range(nodes.__len__()):
+        nodes[i].fast_inference = fast_inference[i]
+
+    ret = {
+        'origin_time': origin_time,
+        'fast_time': fast_time,
+        'origin_steps_per_second': steps / origin_time,
+        'fast_steps_per_second': steps / fast_time,
+        'speedup': origin_time / fast_time,
+        'same_outputs': origin_outputs.__len__() == fast_outputs.__len__()
+                        and all(torch.equal(a, b) for a, b in zip(origin_outputs, fast_outputs))
+    }
+    print(', '.join(f'{k}={v}' for k, v in ret.items()))
+    return ret
+
+def compare_quantized_snn(snn, quantized_snn, device, data_loader, T, poisson=False, max_batches=None):
+    '''
+    * :ref:`API in English <compare_quantized_snn-en>`
+
+    .. _compare_quantized_snn-cn:
+
+    :param snn: 浮点数的SNN模型
+    :param quantized_snn: 由 ``snn`` 得到的 ``ann2snn.quantization.QuantizedSNN``，在CPU上运行
+    :param device: ``snn`` 运行的设备
+    :param data_loader: 测试数据加载器
+    :param T: 仿真时长
+    :param poisson: 当设置为 ``True`` ，输入采用泊松编码器；否则，采用恒定输入并持续T时间步
+    :param max_batches: 最多测试的batch数量。为 ``None`` 时测试 ``data_loader`` 中的全部数据
+    :return: 测试结果字典。``'float_acc'`` 和 ``'quantized_acc'`` 是两个网络在仿真 ``1, 2, ..., T`` 步时的准确率的列表，
+        ``'agreement'`` 是两个网络预测的类别相同的样本比例的列表，``'float_time'`` 和 ``'quantized_time'`` 是两个网络前向传播的
+        总耗时（单位为秒），``'speedup'`` 是两者之比
+    :rtype: dict
+
+    以与 :ref:`simulate_snn <simulate_snn-cn>` 相同的方式，使用相同的输入仿真浮点数的SNN和整数推理的SNN，比较两者的准确率随仿真时长的
+    变化和前向传播的耗时，并打印仿真 ``T`` 步时的结果。计时前两个网络先各运行一步进行预热，输入拷贝到CPU的时间不计入整数推理的耗时。
+    ``device`` 为CPU时，耗时的比较才反映整数推理在CPU上的加速。
+
+    * :ref:`中文API <compare_quantized_snn-cn>`
+
+    .. _compare_quantized_snn-en:
+
+    :param snn: the floating-point SNN model
+    :param quantized_snn: the ``ann2snn.quantization.QuantizedSNN`` got from ``snn``, which runs on CPU
+    :param device: the running device of ``snn``
+    :param data_loader: testing data loader
+    :param T: simulating steps
+    :param poisson: when ``True``, use poisson encoder; otherwise, use constant input over T steps
+    :param max_batches: the maximum number of tested batches. If ``None``, all data in ``data_loader`` will be tested
+    :return: a dictionary of results. ``'float_acc'`` and ``'quantized_acc'`` are the lists of the accuracy of the two
+        networks after simulating ``1, 2, ..., T`` steps, ``'agreement'`` is the list of the ratio of samples where
+        the two networks predict the same class, ``'float_time'`` and ``'quantized_time'`` are the total time (in
+        seconds) of the forward passes of the two networks, and ``'speedup'`` is their ratio
+    :rtype: dict
+
+    Simulate the floating-point SNN and the integer SNN with the same inputs in the same way as
+    :ref:`simulate_snn <simulate_snn-en>`, compare how their accuracy changes with the simulating steps and the time
+    of their forward passes, and print the results after simulating ``T`` steps. Before timing, both networks run one
+    step to warm up, and the time of copying inputs to CPU is not counted in the integer inference. The comparison of
+    time reflects the speedup of integer inference on CPU only when ``device`` is CPU.
+    '''
+    if poisson:
+        encoder = encoding.PoissonEncoder()
+    float_correct = [0] * T
+    quantized_correct = [0] * T
+    agreement = [0] * T
+    total = 0
+    float_time = 0.
+    quantized_time = 0.
+    cuda = str(device).startswith('cuda')
+    with torch.no_grad():
+        snn.eval()
+        quantized_snn.eval()
+        for batch, (img, label) in enumerate(data_loader):
+            if max_batches is not None and batch >= max_batches:
+                break
+            functional.reset_net(snn)
+            functional.reset_net(quantized_snn)
+            img = img.to(device)
+            label = label.to(device)
+            if batch == 0:
+                # 预热
+                snn(img)
+                quantized_snn(img.cpu())
+                functional.reset_net(snn)
+                functional.reset_net(quantized_snn)
+            float_counter = 0
+            quantized_counter = 0
+            for t in range(T):
+                encoded = encoder(img).float() if poisson else img
+                encoded_cpu = encoded.cpu()
+                if cuda:
+                    torch.cuda.synchronize(device)
+                t_start = time.perf_counter()
+                out = snn(encoded)
+                if cuda:
+                    torch.cuda.synchronize(device)
+                float_time += time.perf_counter() - t_start
+                if isinstance(out, tuple) or isinstance(out, list):
+                    out = out[0]
+                float_counter += out
+                t_start = time.perf_counter()
+                quantized_out = quantized_snn(encoded_cpu)
+                quantized_time += time.perf_counter() - t_start
+                quantized_counter += quantized_out.to(device)
+                float_predict = float_counter.max(1)[1]
+                quantized_predict = quantized_counter.max(1)[1]
+                float_correct[t] += (float_predict == label).sum().item()
+                quantized_correct[t] += (quantized_predict == label).sum().item()
+                agreement[t] += (float_predict == quantized_predict).sum().item()
+            total += label.numel()
+    functional.reset_net(snn)
+    functional.reset_net(quantized_snn)
+
+    ret = {
+        'float_acc': [c / total for c in float_correct],
+        'quantized_acc': [c / total for c in quantized_correct],
+        'agreement': [c / total for c in agreement],
+        'float_time': float_time,
+        'quantized_time': quantized_time,
+        'speedup': float_time / quantized_time
+    }
+    print(f'T={T}, float_acc={ret["float_acc"][-1]}, quantized_acc={ret["quantized_acc"][-1]}, '
+          f'agreement={ret["agreement"][-1]}, float_time={float_time}, quantized_time={quantized_time}, '
+          f'speedup={ret["speedup"]}')
+    return ret
+
 import copy
 import torch.utils.data
 import threading
@@ -3,6 +3,9 @@ import torch.nn as nn
 import torch.nn.functional as F
 import math
 class BaseEncoder(nn.Module):
+    # 编码器的状态变量，由functional.get_state和functional.set_state读写
+    state_names = ()
+
     def __init__(self):
         '''
         所有编码器的基类。编码器将输入数据（例如图像）编码为脉冲数据。
@@ -39,6 +42,8 @@ class BaseEncoder(nn.Module):
         pass
 
 class PeriodicEncoder(BaseEncoder):
+    state_names = ('index', )
+
     def __init__(self, out_spike):
         '''
         :param out_spike: shape=[T, *]，PeriodicEncoder会不断的输出out_spike[0], out_spike[1], ..., out_spike[T-1],
@@ -95,6 +100,8 @@ class PeriodicEncoder(BaseEncoder):
 
 
 class LatencyEncoder(BaseEncoder):
+    state_names = ('spike_time', 'out_spike', 'index')
+
     def __init__(self, max_spike_time, function_type='linear', device='cpu'):
         '''
         :param max_spike_time: 最晚（最大）脉冲发放时间
@@ -224,6 +231,8 @@ class PoissonEncoder(BaseEncoder):
 
 
 class GaussianTuningCurveEncoder(BaseEncoder):
+    state_names = ('spike_time', 'out_spike', 'index')
+
     def __init__(self, x_min, x_max, tuning_curve_num, max_spike_time, device='cpu'):
         '''
         :param x_min: float，或者是shape=[M]的tensor，表示M个特征的最小值
@@ -323,6 +332,8 @@ class GaussianTuningCurveEncoder(BaseEncoder):
         self.index = 0
 
 class IntervalEncoder(BaseEncoder):
+    state_names = ('t', )
+
     def __init__(self, T_in, shape, device='cpu'):
         '''
         :param T_in: 脉冲发放的间隔
@@ -1,35 +1,158 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from spikingjelly.clock_driven import neuron, accelerating
+import torch.utils.checkpoint
+from spikingjelly.clock_driven import neuron, accelerating, layer
+import os
+import math
+import inspect
+import copy
+
+def module_tree(net: nn.Module):
+    '''
+    :param net: 任何属于 ``nn.Module`` 子类的网络
+    :return: ``net`` 及其所有子模块和子模块的名字组成的元组
+    :rtype: tuple
 
-def reset_net(net: nn.Module):
+    :ref:`stateful_modules <stateful_modules-cn>` 用于判断缓存是否失效的结构指纹。只遍历 ``_modules``，不生成完整的模块名，也不
+    检查模块的属性，因此比重新遍历网络快得多。元组持有所有模块的引用，因此模块的 ``id`` 不会被其他对象重新使用，比较时按 ``is``
+    判断即可。
+    '''
+    fingerprint = [net]
+    stack = [net]
+    while stack:
+        m = stack.pop()
+        for name, child in m._modules.items():
+            if child is not None:
+                fingerprint.append(name)
+                fingerprint.append(child)
+                stack.append(child)
+    return tuple(fingerprint)
+
+def stateful_modules(net: nn.Module):
+    '''
+    * :ref:`API in English <stateful_modules-en>`
+
+    .. _stateful_modules-cn:
+
+    :param net: 任何属于 ``nn.Module`` 子类的网络
+    :return: 二元组 ``(reset_modules, monitor_modules)``。``reset_modules`` 是 ``net`` 中所有含有 ``reset()`` 函数的模块的
+        ``(name, module)`` 的列表，``monitor_modules`` 是所有含有 ``set_monitor()`` 函数的模块的 ``(name, module)`` 的列表
+    :rtype: tuple
+
+    遍历一次 ``net`` 并将结果缓存在 ``net.stateful_modules_cache`` 中，之后网络的结构不变时直接返回缓存，不再检查每个模块。
+    :ref:`reset_net <reset_net-cn>` 和 :ref:`set_monitor <set_monitor-cn>` 使用此函数。
+
+    缓存中同时保存 ``net`` 及其所有子模块和它们的名字组成的元组作为结构指纹。每次调用时重新计算这一指纹，添加、删除、替换或重命名
+    任何子模块后指纹改变，缓存随之失效。也可以调用 :ref:`clear_stateful_modules_cache <clear_stateful_modules_cache-cn>` 显式地删除缓存。
+
+    * :ref:`中文API <stateful_modules-cn>`
+
+    .. _stateful_modules-en:
+
+    :param net: Any network inherits from ``nn.Module``
+    :return: a tuple ``(reset_modules, monitor_modules)``. ``reset_modules`` is the list of ``(name, module)`` of all
+        modules in ``net`` that have ``reset()``, and ``monitor_modules`` is the list of ``(name, module)`` of all modules
+        that have ``set_monitor()``
+    :rtype: tuple
+
+    Walk through ``net`` once and cache the results in ``net.stateful_modules_cache``. Later calls return the cache
+    without checking every module if the structure of the network does not change. It is used by :ref:`reset_net <reset_net-en>` and
+    :ref:`set_monitor <set_monitor-en>`.
+
+    The tuple of ``net``, all its submodules and their names is also saved in the cache as a structural fingerprint. It
+    is computed again at every call, and it changes after any submodule is added, deleted, replaced or renamed, which
+    invalidates the cache.
+    The cache can also be deleted explicitly by
+    :ref:`clear_stateful_modules_cache <clear_stateful_modules_cache-en>`.
+    '''
+    fingerprint = module_tree(net)
+    cache = net.__dict__.get('stateful_modules_cache')
+    if cache is not None and cache[0] == fingerprint:
+        return cache[1], cache[2]
+
+    reset_modules = []
+    monitor_modules = []
+    for name, m in net.named_modules():
+        if hasattr(m, 'reset'):
+            reset_modules.append((name, m))
+        if hasattr(m, 'set_monitor'):
+            monitor_modules.append((name, m))
+    net.__dict__['stateful_modules_cache'] = (fingerprint, reset_modules, monitor_modules)
+    return reset_modules, monitor_modules
+
+def clear_stateful_modules_cache(net: nn.Module):
+    '''
+    * :ref:`API in English <clear_stateful_modules_cache-en>`
+
+    .. _clear_stateful_modules_cache-cn:
+
+    :param net: 任何属于 ``nn.Module`` 子类的网络
+    :return: None
+
+    删除 :ref:`stateful_modules <stateful_modules-cn>` 为 ``net`` 及其子模块建立的缓存。
+
+    * :ref:`中文API <clear_stateful_modules_cache-cn>`
+
+    .. _clear_stateful_modules_cache-en:
+
+    :param net: Any network inherits from ``nn.Module``
+    :return: None
+
+    Delete the caches built by :ref:`stateful_modules <stateful_modules-en>` for ``net`` and its submodules.
+    '''
+    for m in net.modules():
+        m.__dict__.pop('stateful_modules_cache', None)
+
+def reset_net(net: nn.Module, batched=False):
     '''
     * :ref:`API in English <reset_net-en>`
 
     .. _reset_net-cn:
 
     :param net: 任何属于 ``nn.Module`` 子类的网络
+    :param batched: 若为 ``True``，则所有重置后电压为0的神经元（``v_reset`` 为 ``None`` 或 ``0``）保存的电压 ``v_buffer``
+        组成一组，在下一次前向传播中第一个重新使用 ``v_buffer`` 的神经元用 ``torch._foreach_zero_`` 将整组一起置0，而不是由各个神经元
+        逐个填充。置0被推迟到下一次前向传播，因此与 ``batched=False`` 一样，在重置之后、下一次前向传播之前从 ``node.v`` 读取的tensor
+        不会被改变，参见 :ref:`BaseNode.reset <BaseNode.reset-cn>`
+    :type batched: bool
 
     :return: None
 
-    将网络的状态重置。做法是遍历网络中的所有 ``Module``，若含有 ``reset()`` 函数，则调用。
+    将网络的状态重置。做法是对 :ref:`stateful_modules <stateful_modules-cn>` 缓存的、含有 ``reset()`` 函数的模块，调用
+    ``reset()``。
 
     * :ref:`中文API <reset_net-cn>`
 
     .. _reset_net-en:
 
     :param net: Any network inherits from ``nn.Module``
+    :param batched: if ``True``, the voltages ``v_buffer`` saved by all neurons whose voltage is 0 after reset
+        (``v_reset`` is ``None`` or ``0``) form a group, and the first neuron reusing its ``v_buffer`` at the next forward
+        zeros the whole group together by ``torch._foreach_zero_``, rather than each neuron filling its own. Zeroing is
+        deferred to the next forward, so the same as ``batched=False``, tensors read from ``node.v`` after reset and
+        before the next forward are not changed, see :ref:`BaseNode.reset <BaseNode.reset-en>`
+    :type batched: bool
 
     :return: None
 
-    Reset the whole network.  Walk through every ``Module`` and call their ``reset()`` function if exists.
+    Reset the whole network. Call ``reset()`` of the modules that have it, which are cached by
+    :ref:`stateful_modules <stateful_modules-en>`.
     '''
-    for m in net.modules():
-        if hasattr(m, 'reset'):
-            m.reset()
-
-def set_monitor(net: nn.Module, monitor_state):
+    reset_modules = stateful_modules(net)[0]
+    for _, m in reset_modules:
+        m.reset()
+
+    if batched:
+        # 只记录需要置0的v_buffer，由下一次前向传播中第一个重新使用v_buffer的神经元一起置0
+        group = []
+        for _, m in reset_modules:
+            if isinstance(m, neuron.BaseNode) and m.v_buffer is not None \
+                    and (m.v_reset is None or (not isinstance(m.v_reset, torch.Tensor) and m.v_reset == 0.)):
+                group.append(m.v_buffer)
+                m.v_buffer_group = group
+
+def set_monitor(net: nn.Module, monitor_state, capacity=None, interval=1, index=None, root=None, v_dtype=None):
     '''
     * :ref:`API in English <set_monitor-en>`
 
@@ -37,6 +160,13 @@ def set_monitor(net: nn.Module, monitor_state):
 
     :param net: 任何属于 ``nn.Module`` 子类的网络
     :param bool monitor_state: 表示开启或关闭monitor
+    :param capacity: 若不为 ``None``，则所有模块都使用容量为 ``capacity`` 的
+        :ref:`monitor.RingBufferMonitor <RingBufferMonitor.__init__-cn>`
+    :param interval: 参见 :ref:`monitor.RingBufferMonitor <RingBufferMonitor.__init__-cn>`
+    :param index: 参见 :ref:`monitor.RingBufferMonitor <RingBufferMonitor.__init__-cn>`
+    :param root: 若不为 ``None``，则所有模块都使用 :ref:`monitor.MemmapMonitor <MemmapMonitor.__init__-cn>`，每个模块的记录保存在
+        ``root`` 下以模块名命名的文件夹中
+    :param v_dtype: 参见 :ref:`monitor.MemmapMonitor <MemmapMonitor.__init__-cn>`
     :return: None
 
     将 ``net`` 中的所有含有监视器的模块，监视器状态设置为\ ``monitor_state``。
@@ -47,14 +177,608 @@ def set_monitor(net: nn.Module, monitor_state):
 
     :param net: Any network inherits from ``nn.Module``
     :param bool monitor_state: Indicating whether to turn on the monitor
+    :param capacity: if not ``None``, all modules will use a :ref:`monitor.RingBufferMonitor <RingBufferMonitor.__init__-en>`
+        with ``capacity``
+    :param interval: see :ref:`monitor.RingBufferMonitor <RingBufferMonitor.__init__-en>`
+    :param index: see :ref:`monitor.RingBufferMonitor <RingBufferMonitor.__init__-en>`
+    :param root: if not ``None``, all modules will use a :ref:`monitor.MemmapMonitor <MemmapMonitor.__init__-en>`, and
+        the records of every module are saved in the directory named after the module under ``root``
+    :param v_dtype: see :ref:`monitor.MemmapMonitor <MemmapMonitor.__init__-en>`
     :return: None
 
     Set states of all monitors in modules of ``net`` to ``monitor_state``.
     '''
-    for m in net.modules():
-        if hasattr(m, 'set_monitor'):
+    for name, m in stateful_modules(net)[1]:
+        if root is not None:
+            m.set_monitor(monitor_state, interval=interval, index=index,
+                          root=os.path.join(root, name if name != '' else 'net'), v_dtype=v_dtype)
+        elif capacity is not None:
+            m.set_monitor(monitor_state, capacity, interval, index)
+        else:
             m.set_monitor(monitor_state)
 
+def detach_net(net: nn.Module):
+    '''
+    * :ref:`API in English <detach_net-en>`
+
+    .. _detach_net-cn:
+
+    :param net: 任何属于 ``nn.Module`` 子类的网络
+    :return: None
+
+    将网络的状态从计算图中分离，但保持状态的值不变。做法是对 :ref:`stateful_modules <stateful_modules-cn>` 中含有 ``reset()``
+    函数的模块，将其需要梯度的tensor属性（例如神经元的电压 ``v``，不包括 ``nn.Parameter`` 和buffer）替换为 ``detach()`` 之后的
+    tensor。之后的反向传播不会再经过分离之前的计算图，可用于截断的BPTT（truncated BPTT）。
+
+    * :ref:`中文API <detach_net-cn>`
+
+    .. _detach_net-en:
+
+    :param net: Any network inherits from ``nn.Module``
+    :return: None
+
+    Detach the states of the network from the computation graph while keeping their values. For the modules in
+    :ref:`stateful_modules <stateful_modules-en>` that have ``reset()``, their tensor attributes that require grad (e.g.,
+    the voltage ``v`` of neurons, excluding ``nn.Parameter`` and buffers) are replaced by the ``detach()`` ones. The
+    following backward will not go through the computation graph before detaching, which can be used for truncated BPTT.
+    '''
+    for _, m in stateful_modules(net)[0]:
+        for name, value in m.__dict__.items():
+            if isinstance(value, torch.Tensor) and value.requires_grad:
+                m.__dict__[name] = value.detach()
+
+def truncated_bptt(net: nn.Module, x_seq: torch.Tensor, k: int, loss_function, optimizer, multi_step=False):
+    '''
+    * :ref:`API in English <truncated_bptt-en>`
+
+    .. _truncated_bptt-cn:
+
+    :param net: 任何属于 ``nn.Module`` 子类的网络
+    :param x_seq: ``shape=[T, *]`` 的输入
+    :type x_seq: torch.Tensor
+    :param k: 每个窗口的时间步数
+    :type k: int
+    :param loss_function: 以 ``(out_seq, i)`` 为输入，其中 ``out_seq`` 是网络在第 ``i`` 个窗口的 ``shape=[k, *]`` 的输出，返回
+        这一窗口的损失。返回 ``None`` 表示这一窗口不进行反向传播
+    :type loss_function: callable
+    :param optimizer: 优化器
+    :type optimizer: torch.optim.Optimizer
+    :param multi_step: 若为 ``True``，则 ``net`` 以 ``shape=[k, *]`` 的输入一次运行整个窗口；否则 ``net`` 是单步的，在每个时刻
+        被调用一次
+    :type multi_step: bool
+    :return: 二元组 ``(out_seq, losses)``。``out_seq`` 是 ``shape=[T, *]`` 的、已经从计算图中分离的输出，``losses`` 是每个
+        进行了反向传播的窗口的损失的列表
+    :rtype: tuple
+
+    截断的BPTT训练。将 ``x_seq`` 按时间切分成长度为 ``k`` 的窗口，对每个窗口运行前向传播、反向传播和一次 ``optimizer.step()``，
+    然后用 :ref:`detach_net <detach_net-cn>` 分离网络的状态，将状态的值带到下一个窗口。计算图只保存一个窗口，因此中间变量占用的
+    内存为 :math:`O(k)` 而不是 :math:`O(T)`。
+
+    本函数不会重置网络，需要在处理下一个序列之前调用 :ref:`reset_net <reset_net-cn>`。
+
+    示例：
+
+    .. code-block:: python
+
+        net = nn.Sequential(nn.Linear(28, 128), neuron.LIFNode(), nn.Linear(128, 10), neuron.LIFNode())
+        optimizer = torch.optim.Adam(net.parameters(), lr=1e-3)
+        for img, label in train_data_loader:
+            x_seq = img.squeeze(1).permute(1, 0, 2)  # [28, N, 28]，每一行作为一个时刻的输入
+            def loss_function(out_seq, i):
+                # 只在最后一个窗口计算损失
+                if i == 27 // 7:
+                    return F.cross_entropy(out_seq.mean(0), label)
+            out_seq, losses = functional.truncated_bptt(net, x_seq, 7, loss_function, optimizer)
+            functional.reset_net(net)
+
+    * :ref:`中文API <truncated_bptt-cn>`
+
+    .. _truncated_bptt-en:
+
+    :param net: Any network inherits from ``nn.Module``
+    :param x_seq: the input with ``shape=[T, *]``
+    :type x_seq: torch.Tensor
+    :param k: the number of time-steps of every window
+    :type k: int
+    :param loss_function: takes ``(out_seq, i)`` as inputs, where ``out_seq`` is the output of the network in the
+        ``i``-th window with ``shape=[k, *]``, and returns the loss of this window. Returning ``None`` means that the
+        backward of this window is skipped
+    :type loss_function: callable
+    :param optimizer: the optimizer
+    :type optimizer: torch.optim.Optimizer
+    :param multi_step: if ``True``, ``net`` runs a whole window at once with the input of ``shape=[k, *]``; otherwise,
+        ``net`` is a single-step network and is called once at every time-step
+    :type multi_step: bool
+    :return: a tuple ``(out_seq, losses)``. ``out_seq`` is the output with ``shape=[T, *]`` detached from the
+        computation graph, and ``losses`` is the list of losses of the windows on which backward was run
+    :rtype: tuple
+
+    Truncated BPTT training. ``x_seq`` is split into windows of ``k`` time-steps. For every window, the forward, the
+    backward and one ``optimizer.step()`` are run, and then the states of the network are detached by
+    :ref:`detach_net <detach_net-en>` and their values are carried to the next window. Only the computation graph of one
+    window is kept, so the memory of intermediate variables is :math:`O(k)` rather than :math:`O(T)`.
+
+    This function does not reset the network. Call :ref:`reset_net <reset_net-en>` before the next sequence.
+
+    Example:
+
+    .. code-block:: python
+
+        net = nn.Sequential(nn.Linear(28, 128), neuron.LIFNode(), nn.Linear(128, 10), neuron.LIFNode())
+        optimizer = torch.optim.Adam(net.parameters(), lr=1e-3)
+        for img, label in train_data_loader:
+            x_seq = img.squeeze(1).permute(1, 0, 2)  # [28, N, 28], each row is the input at one time-step
+            def loss_function(out_seq, i):
+                # only compute the loss in the last window
+                if i == 27 // 7:
+                    return F.cross_entropy(out_seq.mean(0), label)
+            out_seq, losses = functional.truncated_bptt(net, x_seq, 7, loss_function, optimizer)
+            functional.reset_net(net)
+    '''
+    out_seq = []
+    losses = []
+    for i, t_start in enumerate(range(0, x_seq.shape[0], k)):
+        t_end = min(t_start + k, x_seq.shape[0])
+        if multi_step:
+            out = net(x_seq[t_start: t_end])
+        else:
+            out = torch.stack([net(x_seq[t]) for t in range(t_start, t_end)])
+        loss = loss_function(out, i)
+        if loss is not None:
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            losses.append(loss.item())
+        detach_net(net)
+        out_seq.append(out.detach())
+    return torch.cat(out_seq), losses
+
+def get_state(net: nn.Module):
+    '''
+    * :ref:`API in English <get_state-en>`
+
+    .. _get_state-cn:
+
+    :param net: 任何属于 ``nn.Module`` 子类的网络
+    :return: 网络的状态，是以 ``'模块名.属性名'`` 为键的字典
+    :rtype: dict
+
+    获取网络的状态。对 :ref:`stateful_modules <stateful_modules-cn>` 中含有 ``reset()`` 函数的模块，记录类属性 ``state_names``
+    中列出的状态变量，例如神经元的 ``v``；``v_threshold``、``tau`` 等超参数不属于状态。没有定义 ``state_names`` 的模块，记录其所有
+    值为tensor的、名字不以 ``_`` 开头也不以 ``_buffer`` 结尾的属性。tensor会被 ``clone()``，因此之后运行网络不会改变返回的状态；
+    ``clone()`` 是可微分的，返回的状态仍然在计算图中。
+
+    * :ref:`中文API <get_state-cn>`
+
+    .. _get_state-en:
+
+    :param net: Any network inherits from ``nn.Module``
+    :return: the states of the network, which is a dictionary whose keys are ``'module_name.attribute_name'``
+    :rtype: dict
+
+    Get the states of the network. For the modules in :ref:`stateful_modules <stateful_modules-en>` that have
+    ``reset()``, the state variables listed in the class attribute ``state_names`` are recorded, e.g., ``v`` of neurons.
+    Hyper-parameters such as ``v_threshold`` and ``tau`` are not states. For the modules without ``state_names``, all
+    attributes whose values are tensors and whose names neither start with ``_`` nor end with ``_buffer`` are recorded.
+    Tensors are cloned, so running the network later will not change the returned states. ``clone()`` is differentiable,
+    so the returned states are still in the computation graph.
+    '''
+    state = {}
+    for name, m in stateful_modules(net)[0]:
+        state_names = getattr(m, 'state_names', None)
+        if state_names is None:
+            state_names = [key for key, value in m.__dict__.items() if isinstance(value, torch.Tensor)
+                           and not key.startswith('_') and not key.endswith('_buffer')]
+        for key in state_names:
+            if key not in m.__dict__:
+                continue
+            value = m.__dict__[key]
+            state[f'{name}.{key}'] = value.clone() if isinstance(value, torch.Tensor) else value
+    return state
+
+def set_state(net: nn.Module, state: dict):
+    '''
+    * :ref:`API in English <set_state-en>`
+
+    .. _set_state-cn:
+
+    :param net: 任何属于 ``nn.Module`` 子类的网络
+    :param state: :ref:`get_state <get_state-cn>` 返回的状态，也可以只包含其中的一部分键
+    :type state: dict
+    :return: None
+
+    将网络的状态设置为 ``state``。tensor会被 ``clone()`` 后再作为模块的属性，因此之后运行网络（包括原地修改状态）不会改变
+    ``state``。
+
+    * :ref:`中文API <set_state-cn>`
+
+    .. _set_state-en:
+
+    :param net: Any network inherits from ``nn.Module``
+    :param state: the states returned by :ref:`get_state <get_state-en>`, or a part of its keys
+    :type state: dict
+    :return: None
+
+    Set the states of the network to ``state``. Tensors are cloned before being used as the attributes of the modules,
+    so running the network later (including modifying the states in-place) will not change ``state``.
+    '''
+    modules = dict(stateful_modules(net)[0])
+    for key, value in state.items():
+        name, attr = key.rsplit('.', 1)
+        if isinstance(value, torch.Tensor):
+            value = value.clone()
+        modules[name].__dict__[attr] = value
+
+def gather_state(states: list, batch_sizes: list, batch_dim=0):
+    '''
+    * :ref:`API in English <gather_state-en>`
+
+    .. _gather_state-cn:
+
+    :param states: ``N`` 个会话各自的、由 :ref:`get_state <get_state-cn>` 得到的状态
+    :type states: list
+    :param batch_sizes: 每个会话的输入的batch size
+    :type batch_sizes: list
+    :param batch_dim: batch所在的维度
+    :type batch_dim: int
+    :return: 将 ``N`` 个状态沿 ``batch_dim`` 拼接后的状态，可以通过 :ref:`set_state <set_state-cn>` 设置给网络
+    :rtype: dict
+
+    将多个独立的会话（例如多路事件相机的数据流）的状态合并为一个batch，从而用一次前向传播同时处理所有会话。
+
+    对每个键，若第 ``i`` 个会话的值是 ``shape[batch_dim] == batch_sizes[i]`` 的tensor，则认为它含有batch维度。其他的值（例如刚
+    重置过的标量电压 ``0``）被广播到 ``batch_sizes[i]`` 个样本上再拼接；若所有会话的值都不含有batch维度，则认为它们是共享的，
+    使用第一个会话的值。
+
+    示例：
+
+    .. code-block:: python
+
+        # sessions[i]保存了第i个会话的状态，x_list[i]是第i个会话新到达的输入
+        batch_sizes = [x.shape[0] for x in x_list]
+        functional.set_state(net, functional.gather_state([sessions[i] for i in range(N)], batch_sizes))
+        y = net(torch.cat(x_list))
+        for i, state in enumerate(functional.scatter_state(functional.get_state(net), batch_sizes)):
+            sessions[i] = state
+
+    * :ref:`中文API <gather_state-cn>`
+
+    .. _gather_state-en:
+
+    :param states: the states of ``N`` sessions got by :ref:`get_state <get_state-en>`
+    :type states: list
+    :param batch_sizes: the batch size of the input of every session
+    :type batch_sizes: list
+    :param batch_dim: the dimension of batch
+    :type batch_dim: int
+    :return: the states concatenated from ``N`` states along ``batch_dim``, which can be set to the network by
+        :ref:`set_state <set_state-en>`
+    :rtype: dict
+
+    Gather the states of many independent sessions (e.g., multiple streams of event cameras) into one batch, so that all
+    sessions can be processed by one forward.
+
+    For every key, the value of the ``i``-th session is regarded as having the batch dimension if it is a tensor with
+    ``shape[batch_dim] == batch_sizes[i]``. Other values (e.g., the scalar voltage ``0`` just after reset) are broadcast
+    to ``batch_sizes[i]`` samples before concatenating. If none of the values of the sessions have the batch dimension,
+    they are regarded as shared and the value of the first session is used.
+
+    Example:
+
+    .. code-block:: python
+
+        # sessions[i] holds the states of the i-th session, and x_list[i] is the new input of the i-th session
+        batch_sizes = [x.shape[0] for x in x_list]
+        functional.set_state(net, functional.gather_state([sessions[i] for i in range(N)], batch_sizes))
+        y = net(torch.cat(x_list))
+        for i, state in enumerate(functional.scatter_state(functional.get_state(net), batch_sizes)):
+            sessions[i] = state
+    '''
+    def is_batched(value, batch_size):
+        return isinstance(value, torch.Tensor) and value.dim() > batch_dim and value.shape[batch_dim] == batch_size
+
+    batch_state = {}
+    for key in states[0].keys():
+        values = [state[key] for state in states]
+        ref = None
+        for value, batch_size in zip(values, batch_sizes):
+            if is_batched(value, batch_size):
+                ref = value
+                break
+        if ref is None:
+            batch_state[key] = values[0]
+            continue
+
+        batch_values = []
+        for value, batch_size in zip(values, batch_sizes):
+            if is_batched(value, batch_size):
+                batch_values.append(value.to(ref))
+            elif value is None:
+                raise ValueError(f'The state {key} is None in some sessions but is a tensor in others.')
+            else:
+                shape = list(ref.shape)
+                shape[batch_dim] = batch_size
+                batch_values.append(torch.as_tensor(value).to(ref).expand(shape))
+        batch_state[key] = torch.cat(batch_values, batch_dim)
+    return batch_state
+
+def scatter_state(state: dict, batch_sizes: list, batch_dim=0):
+    '''
+    * :ref:`API in English <scatter_state-en>`
+
+    .. _scatter_state-cn:
+
+    :param state: 由 :ref:`get_state <get_state-cn>` 得到的、多个会话合并成一个batch后的状态
+    :type state: dict
+    :param batch_sizes: 每个会话的输入的batch size
+    :type batch_sizes: list
+    :param batch_dim: batch所在的维度
+    :type batch_dim: int
+    :return: 每个会话的状态的列表
+    :rtype: list
+
+    :ref:`gather_state <gather_state-cn>` 的逆操作，将 ``shape[batch_dim] == sum(batch_sizes)`` 的tensor沿 ``batch_dim``
+    切分给各个会话，其他的值由所有会话共享。切分得到的tensor是 ``state`` 中tensor的视图，不会复制数据。
+
+    * :ref:`中文API <scatter_state-cn>`
+
+    .. _scatter_state-en:
+
+    :param state: the states got by :ref:`get_state <get_state-en>` after many sessions have been gathered into one batch
+    :type state: dict
+    :param batch_sizes: the batch size of the input of every session
+    :type batch_sizes: list
+    :param batch_dim: the dimension of batch
+    :type batch_dim: int
+    :return: the list of states of every session
+    :rtype: list
+
+    The inverse of :ref:`gather_state <gather_state-en>`. Tensors with ``shape[batch_dim] == sum(batch_sizes)`` are split
+    along ``batch_dim`` to the sessions, and other values are shared by all sessions. The split tensors are views of
+    the tensors in ``state`` and no data is copied.
+    '''
+    states = [{} for _ in batch_sizes]
+    total = sum(batch_sizes)
+    for key, value in state.items():
+        if isinstance(value, torch.Tensor) and value.dim() > batch_dim and value.shape[batch_dim] == total:
+            for session_state, session_value in zip(states, value.split(batch_sizes, batch_dim)):
+                session_state[key] = session_value
+        else:
+            for session_state in states:
+                session_state[key] = value
+    return states
+
+def checkpoint_segment_size(net: nn.Module, x_seq: torch.Tensor, memory_budget=None, multi_step=False):
+    '''
+    * :ref:`API in English <checkpoint_segment_size-en>`
+
+    .. _checkpoint_segment_size-cn:
+
+    :param net: 任何属于 ``nn.Module`` 子类的网络
+    :param x_seq: ``shape=[T, *]`` 的输入
+    :type x_seq: torch.Tensor
+    :param memory_budget: 中间变量可以使用的内存（字节）。为 ``None`` 时返回 :math:`\\lceil \\sqrt{T} \\rceil`
+    :type memory_budget: int
+    :param multi_step: 参见 :ref:`checkpoint_forward <checkpoint_forward-cn>`
+    :type multi_step: bool
+    :return: :ref:`checkpoint_forward <checkpoint_forward-cn>` 使用的每段的时间步数
+    :rtype: int
+
+    以 ``x_seq[0]`` 运行一步网络的副本，用 ``torch.autograd.graph.saved_tensors_hooks`` 统计一步中为反向传播保存的tensor的字节数
+    :math:`M_{step}`，以及网络状态的字节数 :math:`M_{state}`。副本与 ``net`` 共享参数，但状态、buffer（例如BatchNorm的
+    running_mean）和其他属性是独立的，并且不启用监视器，因此 ``net`` 不会被改变。分段长度为 :math:`k` 时，检查点需要保存
+    :math:`\\lceil T / k \\rceil` 份状态，而反向传播时需要重新计算一段的中间变量，因此内存约为
+    :math:`k M_{step} + \\lceil T / k \\rceil M_{state}`。返回满足预算的最大的 :math:`k`；若都不满足，则返回使内存最小的
+    :math:`k`。PyTorch不提供 ``saved_tensors_hooks`` 时，返回 :math:`\\lceil \\sqrt{T} \\rceil`。
+
+    * :ref:`中文API <checkpoint_segment_size-cn>`
+
+    .. _checkpoint_segment_size-en:
+
+    :param net: Any network inherits from ``nn.Module``
+    :param x_seq: the input with ``shape=[T, *]``
+    :type x_seq: torch.Tensor
+    :param memory_budget: the memory (in bytes) that intermediate variables can use. If ``None``,
+        :math:`\\lceil \\sqrt{T} \\rceil` is returned
+    :type memory_budget: int
+    :param multi_step: see :ref:`checkpoint_forward <checkpoint_forward-en>`
+    :type multi_step: bool
+    :return: the number of time-steps of every segment used by :ref:`checkpoint_forward <checkpoint_forward-en>`
+    :rtype: int
+
+    Run a copy of the network for one step with ``x_seq[0]``, and count the bytes :math:`M_{step}` of tensors saved for
+    backward in one step by ``torch.autograd.graph.saved_tensors_hooks`` and the bytes :math:`M_{state}` of the states
+    of the network. The copy shares parameters with ``net``, but its states, buffers (e.g., running_mean of BatchNorm)
+    and other attributes are independent, and its monitors are disabled, so ``net`` is not changed. With segments of :math:`k` steps, the checkpoints save
+    :math:`\\lceil T / k \\rceil` copies of the states, and the intermediate variables of one segment are recomputed in
+    backward, so the memory is about :math:`k M_{step} + \\lceil T / k \\rceil M_{state}`. The largest :math:`k` within
+    the budget is returned. If no one is within the budget, the :math:`k` with the least memory is returned. If
+    ``saved_tensors_hooks`` is not provided by PyTorch, :math:`\\lceil \\sqrt{T} \\rceil` is returned.
+    '''
+    T = x_seq.shape[0]
+    if memory_budget is None or not hasattr(torch.autograd, 'graph') \
+            or not hasattr(torch.autograd.graph, 'saved_tensors_hooks'):
+        return math.ceil(math.sqrt(T))
+
+    saved = {}
+    def pack_hook(x: torch.Tensor):
+        if not isinstance(x, nn.Parameter):
+            saved[(x.data_ptr(), x.shape, x.dtype)] = x.numel() * x.element_size()
+        return x
+
+    # 在副本上运行，使BatchNorm的统计量、监视器、ZeroSkip的计数等副作用不影响net。预先放入memo的对象不会被deepcopy复制：
+    # 参数直接共享；计算图中的tensor不支持deepcopy，替换为不带梯度的副本；监视器替换为False
+    memo = {}
+    for p in net.parameters():
+        memo[id(p)] = p
+    for m in net.modules():
+        for value in m.__dict__.values():
+            if isinstance(value, torch.Tensor) and value.grad_fn is not None:
+                memo[id(value)] = value.detach().clone()
+        monitor = getattr(m, 'monitor', None)
+        if monitor is not None and not isinstance(monitor, bool):
+            memo[id(monitor)] = False
+    probe = copy.deepcopy(net, memo)
+    with torch.enable_grad(), torch.autograd.graph.saved_tensors_hooks(pack_hook, lambda x: x):
+        if multi_step:
+            probe(x_seq[0: 1])
+        else:
+            probe(x_seq[0])
+    state_bytes = 0
+    for value in get_state(probe).values():
+        if isinstance(value, torch.Tensor):
+            state_bytes += value.numel() * value.element_size()
+    del probe
+    step_bytes = sum(saved.values())
+
+    def memory(k):
+        return k * step_bytes + math.ceil(T / k) * state_bytes
+
+    for k in range(T, 0, -1):
+        if memory(k) <= memory_budget:
+            return k
+    return min(range(1, T + 1), key=memory)
+
+def checkpoint_forward(net: nn.Module, x_seq: torch.Tensor, segment_size=None, memory_budget=None, multi_step=False):
+    '''
+    * :ref:`API in English <checkpoint_forward-en>`
+
+    .. _checkpoint_forward-cn:
+
+    :param net: 任何属于 ``nn.Module`` 子类的网络
+    :param x_seq: ``shape=[T, *]`` 的输入
+    :type x_seq: torch.Tensor
+    :param segment_size: 每段的时间步数。为 ``None`` 时由 :ref:`checkpoint_segment_size <checkpoint_segment_size-cn>` 根据
+        ``memory_budget`` 自动确定
+    :type segment_size: int
+    :param memory_budget: 中间变量可以使用的内存（字节），参见 :ref:`checkpoint_segment_size <checkpoint_segment_size-cn>`
+    :type memory_budget: int
+    :param multi_step: 若为 ``True``，则 ``net`` 以 ``shape=[k, *]`` 的输入一次运行整段；否则 ``net`` 是单步的，在每个时刻
+        被调用一次
+    :type multi_step: bool
+    :return: ``shape=[T, *]`` 的输出
+    :rtype: torch.Tensor
+
+    以梯度检查点（gradient checkpointing）的方式运行 ``T`` 步网络。``torch.utils.checkpoint`` 不能直接用于SNN，因为神经元的
+    状态是在前向传播中以副作用的方式修改的，重新计算时状态已经改变。本函数将 ``x_seq`` 按时间分段，在每段开始时用
+    :ref:`get_state <get_state-cn>` 记录网络的状态，并将状态中的tensor作为 ``torch.utils.checkpoint`` 的显式输入和输出。前向
+    传播时不保存段内的中间变量；反向传播时先用 :ref:`set_state <set_state-cn>` 恢复这一段开始时的状态，再重新计算这一段，
+    梯度也通过状态传到上一段。中间变量的内存从 :math:`O(T)` 降为 :math:`O(k)`，代价是多一次前向传播。
+
+    不需要计算梯度时，直接运行网络，不使用检查点。监视器在重新计算时会再次记录，因此应当关闭。
+
+    * :ref:`中文API <checkpoint_forward-cn>`
+
+    .. _checkpoint_forward-en:
+
+    :param net: Any network inherits from ``nn.Module``
+    :param x_seq: the input with ``shape=[T, *]``
+    :type x_seq: torch.Tensor
+    :param segment_size: the number of time-steps of every segment. If ``None``, it will be decided by
+        :ref:`checkpoint_segment_size <checkpoint_segment_size-en>` according to ``memory_budget``
+    :type segment_size: int
+    :param memory_budget: the memory (in bytes) that intermediate variables can use, see
+        :ref:`checkpoint_segment_size <checkpoint_segment_size-en>`
+    :type memory_budget: int
+    :param multi_step: if ``True``, ``net`` runs a whole segment at once with the input of ``shape=[k, *]``; otherwise,
+        ``net`` is a single-step network and is called once at every time-step
+    :type multi_step: bool
+    :return: the output with ``shape=[T, *]``
+    :rtype: torch.Tensor
+
+    Run the network for ``T`` steps with gradient checkpointing. ``torch.utils.checkpoint`` can not be used for SNNs
+    directly, because the states of neurons are modified as side effects in forward and have been changed when
+    recomputing. This function splits ``x_seq`` into segments in time. At the beginning of every segment, the states of
+    the network are recorded by :ref:`get_state <get_state-en>`, and the tensors in the states are used as explicit
+    inputs and outputs of ``torch.utils.checkpoint``. Intermediate variables in a segment are not saved in forward. In
+    backward, the states at the beginning of the segment are restored by :ref:`set_state <set_state-en>` and the segment
+    is recomputed, and gradients also go to the previous segment through the states. The memory of intermediate
+    variables is reduced from :math:`O(T)` to :math:`O(k)` at the cost of one more forward.
+
+    If gradients are not required, the network is run directly without checkpoints. Monitors would record again when
+    recomputing, so they should be turned off.
+    '''
+    if multi_step:
+        def run(x):
+            return net(x)
+    else:
+        def run(x):
+            return torch.stack([net(x[t]) for t in range(x.shape[0])])
+
+    if not torch.is_grad_enabled():
+        return run(x_seq)
+
+    if segment_size is None:
+        segment_size = checkpoint_segment_size(net, x_seq, memory_budget, multi_step)
+
+    checkpoint_kwargs = {}
+    if 'use_reentrant' in inspect.signature(torch.utils.checkpoint.checkpoint).parameters:
+        checkpoint_kwargs['use_reentrant'] = True
+    # 保证至少有一个输入需要梯度，否则重入式的checkpoint不会计算参数的梯度
+    dummy = torch.zeros([], requires_grad=True)
+
+    def segment_function(state: dict, keys: list, out_keys: list):
+        def forward(x, dummy, *values):
+            if torch.is_grad_enabled():
+                # 反向传播中的重新计算，结束后恢复网络当前的状态
+                live_state = get_state(net)
+            seg_state = state.copy()
+            seg_state.update(zip(keys, values))
+            set_state(net, seg_state)
+            y = run(x)
+            new_state = get_state(net)
+            out_keys.clear()
+            out_keys.extend(key for key, value in new_state.items() if isinstance(value, torch.Tensor))
+            if torch.is_grad_enabled():
+                set_state(net, live_state)
+            return (y, ) + tuple(new_state[key] for key in out_keys)
+        return forward
+
+    y_seq = []
+    for t_start in range(0, x_seq.shape[0], segment_size):
+        state = get_state(net)
+        keys = [key for key, value in state.items() if isinstance(value, torch.Tensor)]
+        out_keys = []
+        ret = torch.utils.checkpoint.checkpoint(segment_function(state, keys, out_keys),
+                                                x_seq[t_start: t_start + segment_size], dummy,
+                                                *[state[key] for key in keys], **checkpoint_kwargs)
+        y_seq.append(ret[0])
+        set_state(net, dict(zip(out_keys, ret[1:])))
+    return torch.cat(y_seq)
+
+def zero_skip_stats(net: nn.Module):
+    '''
+    * :ref:`API in English <zero_skip_stats-en>`
+
+    .. _zero_skip_stats-cn:
+
+    :param net: 任何属于 ``nn.Module`` 子类的网络
+    :return: 字典，键 ``'total'`` 是所有 :ref:`layer.ZeroSkip <ZeroSkip.__init__-cn>` 的统计之和，其他的键是每个
+        ``ZeroSkip`` 的模块名，值是它的 ``stats()``
+    :rtype: dict
+
+    * :ref:`中文API <zero_skip_stats-cn>`
+
+    .. _zero_skip_stats-en:
+
+    :param net: Any network inherits from ``nn.Module``
+    :return: a dictionary. The key ``'total'`` is the sum of statistics of all
+        :ref:`layer.ZeroSkip <ZeroSkip.__init__-en>`, and other keys are the module names of every ``ZeroSkip`` whose
+        values are their ``stats()``
+    :rtype: dict
+    '''
+    ret = {}
+    total = {'samples': 0, 'skipped_samples': 0, 'skipped_macs': 0, 'skipped_node_steps': 0}
+    for name, m in net.named_modules():
+        if isinstance(m, layer.ZeroSkip):
+            ret[name] = m.stats()
+            for key in total.keys():
+                if ret[name][key] is not None:
+                    total[key] += ret[name][key]
+    total['skip_ratio'] = total['skipped_samples'] / total['samples'] if total['samples'] > 0 else 0.
+    ret['total'] = total
+    return ret
+
 def spike_cluster(v: torch.Tensor, v_threshold, T_in: int):
     '''
     * :ref:`API in English <spike_cluster-en>`
@@ -589,3 +1313,195 @@ def spike_mse_loss(x: torch.Tensor, spikes: torch.Tensor):
 
     '''
     return (x.square() + accelerating.mul(1 - 2 * x, spikes)).mean()
+
+def sweep_param(values, batch_size: int, dim: int, batch_dim=0):
+    '''
+    * :ref:`API in English <sweep_param-en>`
+
+    .. _sweep_param-cn:
+
+    :param values: ``K`` 组超参数的取值，例如 ``K`` 个 ``tau``
+    :type values: list or torch.Tensor
+    :param batch_size: 每组超参数使用的batch大小 ``B``
+    :type batch_size: int
+    :param dim: 神经元输入的维数，例如输入 ``shape = [N, C, H, W]`` 时为4
+    :type dim: int
+    :param batch_dim: 神经元输入中batch所在的维度。例如多步神经元的输入 ``shape = [T, N, *]`` 时为1
+    :type batch_dim: int
+    :return: 可以作为神经元参数的tensor，在 ``batch_dim`` 上的长度为 ``K * B``，其他维度的长度为1
+    :rtype: torch.Tensor
+
+    用于在一个batch中同时扫描 ``K`` 组超参数。与 :ref:`sweep_input <sweep_input-cn>` 配合，第 ``k * B`` 到 ``(k + 1) * B - 1``
+    个样本使用第 ``k`` 组超参数。示例代码：
+
+    .. code-block:: python
+
+        taus = torch.linspace(2., 128., 64)
+        net = nn.Sequential(nn.Linear(784, 10), neuron.LIFNode(tau=functional.sweep_param(taus, B, 2)))
+        y = net(functional.sweep_input(x, taus.numel()))
+        acc = functional.sweep_metric(y, functional.sweep_input(label, taus.numel()), taus.numel())  # shape = [64]
+
+    需要注意，所有组超参数共享网络的权重，因此适用于评估同一个网络在不同超参数下的表现，或是只学习神经元参数的情况。若每组超参数需要独立的
+    权重，可以使用 :ref:`neuron.lif_step <lif_step-cn>` 等无状态函数配合 ``torch.func.vmap``，此时脉冲发放函数需要使用默认的
+    ``neuron.sigmoid_spiking_function`` 或 :ref:`surrogate.scriptable_spiking_function <scriptable_spiking_function-cn>`，
+    ``surrogate.Sigmoid()`` 等替代函数模块不支持 ``vmap``。
+
+    * :ref:`中文API <sweep_param-cn>`
+
+    .. _sweep_param-en:
+
+    :param values: values of ``K`` hyper-parameter configurations, e.g., ``K`` values of ``tau``
+    :type values: list or torch.Tensor
+    :param batch_size: the batch size ``B`` used by every configuration
+    :type batch_size: int
+    :param dim: the number of dimensions of the neurons' input, e.g., 4 for the input with ``shape = [N, C, H, W]``
+    :type dim: int
+    :param batch_dim: the batch dimension of the neurons' input. E.g., 1 for the input of multi-step neurons with
+        ``shape = [T, N, *]``
+    :type batch_dim: int
+    :return: a tensor that can be used as a param of neurons, whose length at ``batch_dim`` is ``K * B`` and lengths at
+        other dimensions are 1
+    :rtype: torch.Tensor
+
+    It is used to sweep ``K`` hyper-parameter configurations in one batch. With :ref:`sweep_input <sweep_input-en>`, the
+    ``k * B``-th to ``(k + 1) * B - 1``-th samples use the ``k``-th configuration. Examples:
+
+    .. code-block:: python
+
+        taus = torch.linspace(2., 128., 64)
+        net = nn.Sequential(nn.Linear(784, 10), neuron.LIFNode(tau=functional.sweep_param(taus, B, 2)))
+        y = net(functional.sweep_input(x, taus.numel()))
+        acc = functional.sweep_metric(y, functional.sweep_input(label, taus.numel()), taus.numel())  # shape = [64]
+
+    Note that all configurations share the weights of the network. Thus, it suits evaluating one network under different
+    hyper-parameters, or learning only the params of neurons. If every configuration needs independent weights, the
+    stateless functions such as :ref:`neuron.lif_step <lif_step-en>` can be used with ``torch.func.vmap``. In this case,
+    the spiking function should be the default ``neuron.sigmoid_spiking_function`` or
+    :ref:`surrogate.scriptable_spiking_function <scriptable_spiking_function-en>`, because the surrogate function modules
+    such as ``surrogate.Sigmoid()`` do not support ``vmap``.
+    '''
+    values = torch.as_tensor(values, dtype=torch.float).flatten()
+    shape = [1] * (dim - batch_dim)
+    shape[0] = -1
+    return values.repeat_interleave(batch_size).view(shape)
+
+def sweep_input(x: torch.Tensor, num_configs: int, batch_dim=0):
+    '''
+    * :ref:`API in English <sweep_input-en>`
+
+    .. _sweep_input-cn:
+
+    :param x: 一个batch的输入或标签，在 ``batch_dim`` 上的长度为 ``B``
+    :type x: torch.Tensor
+    :param num_configs: 超参数的组数 ``K``
+    :type num_configs: int
+    :param batch_dim: batch所在的维度
+    :type batch_dim: int
+    :return: 将 ``x`` 在 ``batch_dim`` 上重复 ``K`` 次，长度为 ``K * B``
+    :rtype: torch.Tensor
+
+    参见 :ref:`sweep_param <sweep_param-cn>`。
+
+    * :ref:`中文API <sweep_input-cn>`
+
+    .. _sweep_input-en:
+
+    :param x: the input or labels of one batch, whose length at ``batch_dim`` is ``B``
+    :type x: torch.Tensor
+    :param num_configs: the number ``K`` of hyper-parameter configurations
+    :type num_configs: int
+    :param batch_dim: the batch dimension
+    :type batch_dim: int
+    :return: ``x`` repeated ``K`` times at ``batch_dim``, whose length is ``K * B``
+    :rtype: torch.Tensor
+
+    See :ref:`sweep_param <sweep_param-en>`.
+    '''
+    repeats = [1] * x.dim()
+    repeats[batch_dim] = num_configs
+    return x.repeat(repeats)
+
+def split_sweep(x: torch.Tensor, num_configs: int, batch_dim=0):
+    '''
+    * :ref:`API in English <split_sweep-en>`
+
+    .. _split_sweep-cn:
+
+    :param x: 扫描超参数时得到的输出，在 ``batch_dim`` 上的长度为 ``K * B``
+    :type x: torch.Tensor
+    :param num_configs: 超参数的组数 ``K``
+    :type num_configs: int
+    :param batch_dim: batch所在的维度
+    :type batch_dim: int
+    :return: ``shape = [K, ...]`` 的tensor，第 ``k`` 个元素是第 ``k`` 组超参数的输出，batch维度的长度为 ``B``
+    :rtype: torch.Tensor
+
+    将 :ref:`sweep_param <sweep_param-cn>` 扫描超参数时得到的输出，按照超参数拆分。
+
+    * :ref:`中文API <split_sweep-cn>`
+
+    .. _split_sweep-en:
+
+    :param x: the output of sweeping hyper-parameters, whose length at ``batch_dim`` is ``K * B``
+    :type x: torch.Tensor
+    :param num_configs: the number ``K`` of hyper-parameter configurations
+    :type num_configs: int
+    :param batch_dim: the batch dimension
+    :type batch_dim: int
+    :return: a tensor with ``shape = [K, ...]``, whose ``k``-th element is the output of the ``k``-th configuration, and
+        the length of the batch dimension is ``B``
+    :rtype: torch.Tensor
+
+    Split the output of sweeping hyper-parameters by :ref:`sweep_param <sweep_param-en>` into configurations.
+    '''
+    shape = list(x.shape)
+    x = x.view(shape[:batch_dim] + [num_configs, shape[batch_dim] // num_configs] + shape[batch_dim + 1:])
+    return x.movedim(batch_dim, 0)
+
+def sweep_metric(y: torch.Tensor, target: torch.Tensor, num_configs: int, metric=None, batch_dim=0):
+    '''
+    * :ref:`API in English <sweep_metric-en>`
+
+    .. _sweep_metric-cn:
+
+    :param y: 扫描超参数时网络的输出，在 ``batch_dim`` 上的长度为 ``K * B``
+    :type y: torch.Tensor
+    :param target: 对应的标签，通常由 :ref:`sweep_input <sweep_input-cn>` 得到
+    :type target: torch.Tensor
+    :param num_configs: 超参数的组数 ``K``
+    :type num_configs: int
+    :param metric: 计算指标的函数 ``metric(y_k, target_k) -> float or torch.Tensor``。为 ``None`` 时计算分类的正确率，
+        即 ``(y_k.argmax(1) == target_k).float().mean()``
+    :type metric: callable
+    :param batch_dim: ``y`` 中batch所在的维度。``target`` 的batch总是在第0维
+    :type batch_dim: int
+    :return: ``shape = [K]`` 的tensor，第 ``k`` 个元素是第 ``k`` 组超参数的指标
+    :rtype: torch.Tensor
+
+    按照超参数拆分输出和标签，并分别计算指标。
+
+    * :ref:`中文API <sweep_metric-cn>`
+
+    .. _sweep_metric-en:
+
+    :param y: the output of the network when sweeping hyper-parameters, whose length at ``batch_dim`` is ``K * B``
+    :type y: torch.Tensor
+    :param target: the corresponding targets, which are usually got by :ref:`sweep_input <sweep_input-en>`
+    :type target: torch.Tensor
+    :param num_configs: the number ``K`` of hyper-parameter configurations
+    :type num_configs: int
+    :param metric: the function to compute the metric ``metric(y_k, target_k) -> float or torch.Tensor``. If ``None``,
+        the classification accuracy ``(y_k.argmax(1) == target_k).float().mean()`` is computed
+    :type metric: callable
+    :param batch_dim: the batch dimension of ``y``. The batch of ``target`` is always at dimension 0
+    :type batch_dim: int
+    :return: a tensor with ``shape = [K]``, whose ``k``-th element is the metric of the ``k``-th configuration
+    :rtype: torch.Tensor
+
+    Split the output and targets by configurations, and compute the metric of every configuration.
+    '''
+    y = split_sweep(y, num_configs, batch_dim)
+    target = split_sweep(target, num_configs)
+    if metric is None:
+        metric = lambda y_k, target_k: (y_k.argmax(1) == target_k).float().mean()
+    return torch.as_tensor([float(metric(y[k], target[k])) for k in range(num_configs)])
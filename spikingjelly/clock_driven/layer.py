@@ -5,6 +5,9 @@ import math
 from spikingjelly.clock_driven import accelerating
 
 class NeuNorm(nn.Module):
+    # 本层的状态变量，由functional.get_state和functional.set_state读写
+    state_names = ('x', )
+
     def __init__(self, in_channels, height, width, k=0.9, shared_across_channels=False):
         '''
         * :ref:`API in English <NeuNorm.__init__-en>`
@@ -66,6 +69,7 @@ class NeuNorm(nn.Module):
         '''
         super().__init__()
         self.x = 0
+        self.x_buffer = None
         self.k0 = k
         self.k1 = (1 - self.k0) / in_channels**2
         if shared_across_channels:
@@ -75,7 +79,19 @@ class NeuNorm(nn.Module):
         nn.init.kaiming_uniform_(self.w, a=math.sqrt(5))
 
     def forward(self, in_spikes: torch.Tensor):
-        self.x = self.k0 * self.x + self.k1 * in_spikes.sum(dim=1, keepdim=True)  # x.shape = [batch_size, 1, height, width]
+        x_shape = torch.Size([in_spikes.shape[0], 1]) + in_spikes.shape[2:]  # x.shape = [batch_size, 1, height, width]
+        if self.x_buffer is not None:
+            # 重新使用reset()之前的x
+            if not isinstance(self.x, torch.Tensor):
+                x = accelerating.reuse_state(self.x_buffer, x_shape, in_spikes.device, in_spikes.dtype)
+                if x is not None:
+                    self.x = x
+            self.x_buffer = None
+        if not torch.is_grad_enabled() and isinstance(self.x, torch.Tensor) and not self.x.requires_grad \
+                and self.x.shape == x_shape and self.x.dtype == in_spikes.dtype:
+            self.x.mul_(self.k0).add_(self.k1 * in_spikes.sum(dim=1, keepdim=True))
+        else:
+            self.x = self.k0 * self.x + self.k1 * in_spikes.sum(dim=1, keepdim=True)
         return in_spikes - self.w * self.x
 
     def reset(self):
@@ -96,6 +112,7 @@ class NeuNorm(nn.Module):
 
         This layer is stateful. This function will reset all stateful variables.
         '''
+        self.x_buffer = accelerating.stash_state(self.x)
         self.x = 0
 
 class DCT(nn.Module):
@@ -184,6 +201,8 @@ class AXAT(nn.Module):
         return x.view(x_shape)
 
 class Dropout(nn.Module):
+    state_names = ('mask', )
+
     def __init__(self, p=0.5, dropout_spikes=False):
         '''
         * :ref:`API in English <Dropout.__init__-en>`
@@ -251,6 +270,8 @@ class Dropout(nn.Module):
         super().__init__()
         assert 0 < p < 1
         self.mask = None
+        self.mask_buffer = None  # reset()之前的mask，在输入的形状和设备不变时被重新使用
+        self.mask_reusable = False  # mask是否从未在启用梯度时使用过，即没有被计算图保存
         self.p = p
         self.dropout_spikes = dropout_spikes
 
@@ -260,12 +281,21 @@ class Dropout(nn.Module):
         )
 
     def create_mask(self, x: torch.Tensor):
-        self.mask = F.dropout(torch.ones_like(x.data), self.p, training=True)
+        mask = accelerating.reuse_state(self.mask_buffer, x.shape, x.device, x.dtype, 1.)
+        if mask is None:
+            self.mask = F.dropout(torch.ones_like(x.data), self.p, training=True)
+        else:
+            self.mask = F.dropout(mask, self.p, training=True, inplace=True)
+        self.mask_buffer = None
 
     def forward(self, x: torch.Tensor):
         if self.training:
             if self.mask is None:
                 self.create_mask(x)
+                self.mask_reusable = True
+            if torch.is_grad_enabled():
+                # mask可能被计算图保存，原地修改会使反向传播出错，因此reset()之后不再重新使用
+                self.mask_reusable = False
             if self.dropout_spikes:
                 return accelerating.mul(self.mask, x)
             else:
@@ -283,6 +313,9 @@ class Dropout(nn.Module):
 
         本层是一个有状态的层。此函数重置本层的状态变量。
 
+        若旧的mask只在不需要梯度时（例如 ``torch.no_grad()`` 中）使用过，并且输入的形状和设备不变，旧的mask的内存会在下一次
+        ``create_mask`` 时被重新使用。被计算图保存的mask不会被重新使用。
+
         * :ref:`中文API <Dropout.reset-cn>`
 
         .. _Dropout.reset-en:
@@ -290,8 +323,17 @@ class Dropout(nn.Module):
         :return: None
 
         This layer is stateful. This function will reset all stateful variables.
+
+        .. admonition:: Note
+            :class: note
+
+            The memory of the old mask is reused by the next ``create_mask`` if the old mask has only been used without
+            grad (e.g., in ``torch.no_grad()``) and the shape and the device of the input do not change. A mask saved by
+            a computation graph is never reused.
         '''
+        self.mask_buffer = self.mask if self.mask_reusable else None
         self.mask = None
+        self.mask_reusable = False
 
 class Dropout2d(Dropout):
     def __init__(self, p=0.2, dropout_spikes=False):
@@ -328,9 +370,16 @@ class Dropout2d(Dropout):
         super().__init__(p, dropout_spikes)
 
     def create_mask(self, x: torch.Tensor):
-        self.mask = F.dropout2d(torch.ones_like(x.data), self.p, training=True)
+        mask = accelerating.reuse_state(self.mask_buffer, x.shape, x.device, x.dtype, 1.)
+        if mask is None:
+            self.mask = F.dropout2d(torch.ones_like(x.data), self.p, training=True)
+        else:
+            self.mask = F.dropout2d(mask, self.p, training=True, inplace=True)
+        self.mask_buffer = None
 
 class SynapseFilter(nn.Module):
+    state_names = ('out_i', )
+
     def __init__(self, tau=100.0, learnable=False):
         '''
         * :ref:`API in English <LowPassSynapse.__init__-en>`
@@ -545,6 +594,8 @@ class ChannelsPool(nn.Module):
         return self.pool(x.flatten(2).permute(0, 2, 1)).permute(0, 2, 1).view((x_shape[0], -1) + x_shape[2:])
 
 class DropConnectLinear(nn.Module):
+    state_names = ('dropped_w', 'dropped_b')
+
     def __init__(self, in_features: int, out_features: int, bias: bool = True, p: float = 0.5, samples_num: int = 1024,
                  invariant: bool = False, activation: None or nn.Module = nn.ReLU()) -> None:
         '''
@@ -733,3 +784,527 @@ class DropConnectLinear(nn.Module):
 
     def extra_repr(self) -> str:
         return f'in_features={self.in_features}, out_features={self.out_features}, bias={self.bias is not None}, p={self.p}, invariant={self.invariant}'
+
+class SeqToANNContainer(nn.Module):
+    def __init__(self, *args):
+        '''
+        * :ref:`API in English <SeqToANNContainer.__init__-en>`
+
+        .. _SeqToANNContainer.__init__-cn:
+
+        :param *args: 无状态的单个或多个ANN网络层，例如 ``nn.Conv2d``，``nn.BatchNorm2d``，``nn.Linear``
+
+        包装无状态的ANN网络层，使其能够处理多步输入。输入 ``shape = [T, N, *]`` 的序列，会先被变形为 ``shape = [T * N, *]``，
+        送入被包装的网络层中只计算一次，再将输出变形为 ``shape = [T, N, *]``。与多步神经元（例如 ``neuron.MultiStepLIFNode``）
+        搭配使用时，``T`` 次小规模的卷积或矩阵乘法被合并为一次大规模的计算，能够更充分地利用BLAS和oneDNN等计算库。
+
+        示例代码：
+
+        .. code-block:: python
+
+            >>> net = nn.Sequential(
+            >>>     SeqToANNContainer(nn.Conv2d(1, 8, 3, padding=1, bias=False), nn.BatchNorm2d(8)),
+            >>>     neuron.MultiStepLIFNode(tau=2.0)
+            >>> )
+            >>> x_seq = torch.rand([4, 2, 1, 28, 28])
+            >>> net(x_seq).shape
+            torch.Size([4, 2, 8, 28, 28])
+
+        .. warning::
+            被包装的网络层必须是无状态的，即每个时刻的输出只取决于当前时刻的输入。
+
+        * :ref:`中文API <SeqToANNContainer.__init__-cn>`
+
+        .. _SeqToANNContainer.__init__-en:
+
+        :param *args: one or many stateless ANN layers, e.g., ``nn.Conv2d``, ``nn.BatchNorm2d``, ``nn.Linear``
+
+        A container that makes stateless ANN layers able to process multi-step inputs. The input sequence with
+        ``shape = [T, N, *]`` will be reshaped to ``shape = [T * N, *]``, sent to the wrapped layers to be computed only
+        once, and then the output will be reshaped to ``shape = [T, N, *]``. When used with multi-step neurons (e.g.,
+        ``neuron.MultiStepLIFNode``), ``T`` small convolutions or matrix multiplications are merged into one large
+        computation, which makes better use of libraries such as BLAS and oneDNN.
+
+        Examples:
+
+        .. code-block:: python
+
+            >>> net = nn.Sequential(
+            >>>     SeqToANNContainer(nn.Conv2d(1, 8, 3, padding=1, bias=False), nn.BatchNorm2d(8)),
+            >>>     neuron.MultiStepLIFNode(tau=2.0)
+            >>> )
+            >>> x_seq = torch.rand([4, 2, 1, 28, 28])
+            >>> net(x_seq).shape
+            torch.Size([4, 2, 8, 28, 28])
+
+        .. admonition:: Warning
+            :class: warning
+
+            The wrapped layers should be stateless, which means that the output at every time-step only depends on the
+            input at the same time-step.
+        '''
+        super().__init__()
+        if len(args) == 1:
+            self.module = args[0]
+        else:
+            self.module = nn.Sequential(*args)
+
+    def forward(self, x_seq: torch.Tensor):
+        y_shape = [x_seq.shape[0], x_seq.shape[1]]
+        y_seq = self.module(x_seq.flatten(0, 1))
+        y_shape.extend(y_seq.shape[1:])
+        return y_seq.view(y_shape)
+
+class SpikeLinear(nn.Linear):
+    def __init__(self, in_features: int, out_features: int, bias: bool = True, packed: bool = False) -> None:
+        '''
+        * :ref:`API in English <SpikeLinear.__init__-en>`
+
+        .. _SpikeLinear.__init__-cn:
+
+        :param in_features: 每个输入样本的特征数
+        :type in_features: int
+        :param out_features: 每个输出样本的特征数
+        :type out_features: int
+        :param bias: 若为 ``False``，则本层不会有可学习的偏置项。默认为 ``True``
+        :type bias: bool
+        :param packed: 为 ``True`` 时，反向传播所需的输入按位打包保存；否则以 ``bool`` 类型保存。默认为 ``False``
+        :type packed: bool
+
+        输入为脉冲的 ``nn.Linear``，可以直接替换 ``nn.Linear``。``nn.Linear`` 在前向传播时会保存 ``float32`` 的输入用于计算权重的梯度，
+        而本层使用 :ref:`accelerating.spike_linear <spike_linear-cn>`，将输入保存为 ``bool`` 或按位打包，大幅减少BPTT时的内存消耗。
+
+        .. warning::
+            输入中的元素只能为 ``0`` 和 ``1``，否则反向传播时计算的权重梯度是错误的。
+
+        * :ref:`中文API <SpikeLinear.__init__-cn>`
+
+        .. _SpikeLinear.__init__-en:
+
+        :param in_features: size of each input sample
+        :type in_features: int
+        :param out_features: size of each output sample
+        :type out_features: int
+        :param bias: If set to ``False``, the layer will not learn an additive bias. Default: ``True``
+        :type bias: bool
+        :param packed: if ``True``, the input needed by backward is saved in bits; otherwise it is saved as ``bool``.
+            Default: ``False``
+        :type packed: bool
+
+        The ``nn.Linear`` for spike inputs, which is a drop-in replacement of ``nn.Linear``. ``nn.Linear`` saves the
+        ``float32`` input in forward for computing the gradient of weight, while this layer uses
+        :ref:`accelerating.spike_linear <spike_linear-en>` to save the input as ``bool`` or in bits, which reduces the
+        memory consumption during BPTT largely.
+
+        .. admonition:: Warning
+            :class: warning
+
+            The elements in the input must be ``0`` and ``1``. Otherwise, the gradient of weight in backward is wrong.
+        '''
+        super().__init__(in_features, out_features, bias)
+        self.packed = packed
+
+    def forward(self, spike: torch.Tensor) -> torch.Tensor:
+        return accelerating.spike_linear(spike, self.weight, self.bias, self.packed)
+
+    def extra_repr(self) -> str:
+        return super().extra_repr() + f', packed={self.packed}'
+
+class SpikeConv2d(nn.Conv2d):
+    def __init__(self, in_channels: int, out_channels: int, kernel_size, stride=1, padding=0, dilation=1, groups: int = 1,
+                 bias: bool = True, packed: bool = False) -> None:
+        '''
+        * :ref:`API in English <SpikeConv2d.__init__-en>`
+
+        .. _SpikeConv2d.__init__-cn:
+
+        :param packed: 为 ``True`` 时，反向传播所需的输入按位打包保存；否则以 ``bool`` 类型保存。默认为 ``False``
+        :type packed: bool
+
+        其他参数的含义与 ``nn.Conv2d`` 相同，只支持 ``padding_mode='zeros'``。
+
+        输入为脉冲的 ``nn.Conv2d``，可以直接替换 ``nn.Conv2d``。本层使用 :ref:`accelerating.spike_conv2d <spike_conv2d-cn>`，将输入
+        保存为 ``bool`` 或按位打包，大幅减少BPTT时的内存消耗。
+
+        .. warning::
+            输入中的元素只能为 ``0`` 和 ``1``，否则反向传播时计算的权重梯度是错误的。
+
+        * :ref:`中文API <SpikeConv2d.__init__-cn>`
+
+        .. _SpikeConv2d.__init__-en:
+
+        :param packed: if ``True``, the input needed by backward is saved in bits; otherwise it is saved as ``bool``.
+            Default: ``False``
+        :type packed: bool
+
+        Other params are the same as those of ``nn.Conv2d``. Only ``padding_mode='zeros'`` is supported.
+
+        The ``nn.Conv2d`` for spike inputs, which is a drop-in replacement of ``nn.Conv2d``. This layer uses
+        :ref:`accelerating.spike_conv2d <spike_conv2d-en>` to save the input as ``bool`` or in bits, which reduces the
+        memory consumption during BPTT largely.
+
+        .. admonition:: Warning
+            :class: warning
+
+            The elements in the input must be ``0`` and ``1``. Otherwise, the gradient of weight in backward is wrong.
+        '''
+        super().__init__(in_channels, out_channels, kernel_size, stride, padding, dilation, groups, bias)
+        self.packed = packed
+
+    def forward(self, spike: torch.Tensor) -> torch.Tensor:
+        return accelerating.spike_conv2d(spike, self.weight, self.bias, self.stride, self.padding, self.dilation,
+                                         self.groups, self.packed)
+
+    def extra_repr(self) -> str:
+        return super().extra_repr() + f', packed={self.packed}'
+
+# 自动校准得到的稀疏计算的阈值，键为层的类型、输入的形状和设备等，相同配置的层只需要校准一次
+sparse_threshold_cache = {}
+
+def spike_density(spike: torch.Tensor):
+    '''
+    :param spike: 脉冲
+    :type spike: torch.Tensor
+    :return: ``spike`` 中非0元素的比例
+    :rtype: float
+    '''
+    if hasattr(torch, 'count_nonzero'):
+        return torch.count_nonzero(spike).item() / spike.numel()
+    else:
+        return (spike != 0).sum().item() / spike.numel()
+
+class AdaptiveSpikeLinear(SpikeLinear):
+    def __init__(self, in_features: int, out_features: int, bias: bool = True, packed: bool = False,
+                 sparse_threshold=None) -> None:
+        '''
+        * :ref:`API in English <AdaptiveSpikeLinear.__init__-en>`
+
+        .. _AdaptiveSpikeLinear.__init__-cn:
+
+        :param sparse_threshold: 输入的脉冲密度低于此值时使用稀疏计算。为 ``None`` 时，在第一次前向传播时通过
+            :ref:`accelerating.calibrate_sparse_threshold <calibrate_sparse_threshold-cn>` 在当前机器上自动校准
+        :type sparse_threshold: float
+
+        其他参数与 :ref:`SpikeLinear <SpikeLinear.__init__-cn>` 相同。
+
+        根据输入的脉冲密度自动选择计算方式的 :ref:`SpikeLinear <SpikeLinear.__init__-cn>`。输入不需要梯度，且脉冲密度低于
+        ``sparse_threshold`` 时，使用 :ref:`accelerating.sparse_spike_linear <sparse_spike_linear-cn>`，只累加有脉冲的输入对应的
+        权重列；否则使用稠密的矩阵乘法。计算脉冲密度需要一次设备同步。``num_sparse_calls`` 和 ``num_dense_calls`` 记录两种计算方式
+        被使用的次数。
+
+        * :ref:`中文API <AdaptiveSpikeLinear.__init__-cn>`
+
+        .. _AdaptiveSpikeLinear.__init__-en:
+
+        :param sparse_threshold: the sparse computation is used when the spike density of the input is lower than this
+            value. If ``None``, it will be calibrated automatically on the current machine by
+            :ref:`accelerating.calibrate_sparse_threshold <calibrate_sparse_threshold-en>` at the first forward
+        :type sparse_threshold: float
+
+        Other params are the same as those of :ref:`SpikeLinear <SpikeLinear.__init__-en>`.
+
+        The :ref:`SpikeLinear <SpikeLinear.__init__-en>` that chooses the computation according to the spike density of
+        the input. When the input does not require grad and its spike density is lower than ``sparse_threshold``,
+        :ref:`accelerating.sparse_spike_linear <sparse_spike_linear-en>` is used, which only accumulates the columns of
+        the weight corresponding to inputs with spikes. Otherwise, the dense matrix multiplication is used. Computing the
+        spike density needs one device synchronization. ``num_sparse_calls`` and ``num_dense_calls`` count how many times
+        the two computations are used.
+        '''
+        super().__init__(in_features, out_features, bias, packed)
+        self.sparse_threshold = sparse_threshold
+        self.weight_t = None  # (weight的版本, weight.t().contiguous())
+        self.num_sparse_calls = 0
+        self.num_dense_calls = 0
+
+    def calibrate(self, shape):
+        '''
+        :param shape: 输入的形状
+        :type shape: torch.Size
+        :return: 自动校准得到的稀疏计算的阈值
+        :rtype: float
+        '''
+        key = ('linear', tuple(shape), self.out_features, self.bias is not None, self.weight.device, self.weight.dtype)
+        if key not in sparse_threshold_cache:
+            sparse_threshold_cache[key] = accelerating.calibrate_sparse_threshold(
+                lambda x: super(AdaptiveSpikeLinear, self).forward(x),
+                lambda x: accelerating.sparse_spike_linear(x, self.weight, self.bias),
+                shape, device=self.weight.device, dtype=self.weight.dtype)
+        return sparse_threshold_cache[key]
+
+    def forward(self, spike: torch.Tensor) -> torch.Tensor:
+        if not spike.requires_grad:
+            if self.sparse_threshold is None:
+                self.sparse_threshold = self.calibrate(spike.shape)
+            if spike_density(spike) < self.sparse_threshold:
+                self.num_sparse_calls += 1
+                if torch.is_grad_enabled():
+                    return accelerating.sparse_spike_linear(spike, self.weight, self.bias)
+                if self.weight_t is None or self.weight_t[0] != self.weight._version:
+                    self.weight_t = (self.weight._version, self.weight.t().contiguous())
+                return accelerating.sparse_spike_linear(spike, self.weight, self.bias, self.weight_t[1])
+        self.num_dense_calls += 1
+        return super().forward(spike)
+
+    def extra_repr(self) -> str:
+        return super().extra_repr() + f', sparse_threshold={self.sparse_threshold}'
+
+class AdaptiveSpikeConv2d(SpikeConv2d):
+    def __init__(self, in_channels: int, out_channels: int, kernel_size, stride=1, padding=0, dilation=1, groups: int = 1,
+                 bias: bool = True, packed: bool = False, sparse_threshold=None) -> None:
+        '''
+        * :ref:`API in English <AdaptiveSpikeConv2d.__init__-en>`
+
+        .. _AdaptiveSpikeConv2d.__init__-cn:
+
+        :param sparse_threshold: 见 :ref:`AdaptiveSpikeLinear <AdaptiveSpikeLinear.__init__-cn>`
+        :type sparse_threshold: float
+
+        其他参数与 :ref:`SpikeConv2d <SpikeConv2d.__init__-cn>` 相同。
+
+        根据输入的脉冲密度自动选择计算方式的 :ref:`SpikeConv2d <SpikeConv2d.__init__-cn>`，稀疏计算使用
+        :ref:`accelerating.sparse_spike_conv2d <sparse_spike_conv2d-cn>`。``groups`` 不为1时总是使用稠密计算。
+
+        * :ref:`中文API <AdaptiveSpikeConv2d.__init__-cn>`
+
+        .. _AdaptiveSpikeConv2d.__init__-en:
+
+        :param sparse_threshold: see :ref:`AdaptiveSpikeLinear <AdaptiveSpikeLinear.__init__-en>`
+        :type sparse_threshold: float
+
+        Other params are the same as those of :ref:`SpikeConv2d <SpikeConv2d.__init__-en>`.
+
+        The :ref:`SpikeConv2d <SpikeConv2d.__init__-en>` that chooses the computation according to the spike density of
+        the input, and the sparse computation uses :ref:`accelerating.sparse_spike_conv2d <sparse_spike_conv2d-en>`. The
+        dense computation is always used when ``groups`` is not 1.
+        '''
+        super().__init__(in_channels, out_channels, kernel_size, stride, padding, dilation, groups, bias, packed)
+        self.sparse_threshold = sparse_threshold if groups == 1 else 0.
+        self.num_sparse_calls = 0
+        self.num_dense_calls = 0
+
+    def calibrate(self, shape):
+        '''
+        :param shape: 输入的形状
+        :type shape: torch.Size
+        :return: 自动校准得到的稀疏计算的阈值
+        :rtype: float
+        '''
+        key = ('conv2d', tuple(shape), tuple(self.weight.shape), self.stride, self.padding, self.dilation,
+               self.bias is not None, self.weight.device, self.weight.dtype)
+        if key not in sparse_threshold_cache:
+            sparse_threshold_cache[key] = accelerating.calibrate_sparse_threshold(
+                lambda x: super(AdaptiveSpikeConv2d, self).forward(x),
+                lambda x: accelerating.sparse_spike_conv2d(x, self.weight, self.bias, self.stride, self.padding,
+                                                           self.dilation),
+                shape, device=self.weight.device, dtype=self.weight.dtype)
+        return sparse_threshold_cache[key]
+
+    def forward(self, spike: torch.Tensor) -> torch.Tensor:
+        if not spike.requires_grad:
+            if self.sparse_threshold is None:
+                self.sparse_threshold = self.calibrate(spike.shape)
+            if spike_density(spike) < self.sparse_threshold:
+                self.num_sparse_calls += 1
+                return accelerating.sparse_spike_conv2d(spike, self.weight, self.bias, self.stride, self.padding,
+                                                        self.dilation)
+        self.num_dense_calls += 1
+        return super().forward(spike)
+
+    def extra_repr(self) -> str:
+        return super().extra_repr() + f', sparse_threshold={self.sparse_threshold}'
+
+class ZeroSkip(nn.Module):
+    state_names = ('idle_steps', )
+
+    def __init__(self, synapse: nn.Module, node=None):
+        '''
+        * :ref:`API in English <ZeroSkip.__init__-en>`
+
+        .. _ZeroSkip.__init__-cn:
+
+        :param synapse: 逐样本计算的突触层，例如 ``nn.Conv2d``，``nn.Linear``。不能含有训练模式下的 ``nn.BatchNorm2d`` 等跨样本的层
+        :type synapse: nn.Module
+        :param node: 跟在 ``synapse`` 之后的神经元。若为 ``None``，则只包装 ``synapse``
+        :type node: neuron.BaseNode or None
+
+        跳过输入全为0的样本的突触计算。ANN转换得到的SNN和DVS数据的模型中，许多层在很多时刻的输入脉冲全为0，例如在
+        ``simulate_snn`` 的前几个时刻，但 ``Conv2d`` 和 ``Linear`` 仍然会进行完整的稠密计算。本层在每个时刻检查每个样本的输入是否
+        全为0，只对含有非0输入的样本进行 ``synapse`` 的计算；输入全为0的样本的输出是 ``synapse`` 对0输入的输出（即偏置，会被缓存）。
+
+        若给出了 ``node``，不需要计算梯度，``synapse`` 对0输入的输出为0，且整个batch的输入都为0，则 ``node`` 的这一时刻也会被跳过：
+        只要没有神经元能够放电，IF神经元的电压保持不变，而LIF/PLIF神经元只有泄漏，会在下一个不被跳过的时刻通过
+        ``node.neuronal_decay(steps)`` 以解析的方式一次性更新。在此之前读取 ``node.v`` 需要先调用 ``flush()``。
+
+        只有在输入不需要梯度时才会跳过计算，因此不会改变反向传播的梯度。判断是否全为0需要一次设备同步。``stats()`` 返回跳过的计算量。
+
+        示例代码：
+
+        .. code-block:: python
+
+            net = nn.Sequential(
+                ZeroSkip(nn.Conv2d(2, 32, 3, padding=1, bias=False), neuron.IFNode()),
+                ZeroSkip(nn.Conv2d(32, 32, 3, padding=1, bias=False), neuron.LIFNode(tau=2.0)),
+            )
+            with torch.no_grad():
+                for t in range(T):
+                    net(x_seq[t])
+            print(functional.zero_skip_stats(net))
+
+        * :ref:`中文API <ZeroSkip.__init__-cn>`
+
+        .. _ZeroSkip.__init__-en:
+
+        :param synapse: a synaptic layer computed sample by sample, e.g., ``nn.Conv2d``, ``nn.Linear``. Layers mixing
+            samples, such as ``nn.BatchNorm2d`` in training mode, are not allowed
+        :type synapse: nn.Module
+        :param node: the neurons after ``synapse``. If ``None``, only ``synapse`` is wrapped
+        :type node: neuron.BaseNode or None
+
+        Skip the synaptic computation of samples whose inputs are all zero. In SNNs converted from ANNs and models for DVS
+        data, many layers get all-zero input spikes at many time-steps, e.g., at the first time-steps of ``simulate_snn``,
+        but ``Conv2d`` and ``Linear`` still run the full dense computation. This layer checks whether the input of every
+        sample is all zero at every time-step, and only computes ``synapse`` for samples with non-zero inputs. The output
+        of samples with all-zero inputs is the output of ``synapse`` for zero input (i.e., the bias, which is cached).
+
+        If ``node`` is given, gradients are not required, the output of ``synapse`` for zero input is zero, and the inputs
+        of the whole batch are zero, this time-step of ``node`` is also skipped: as long as no neuron can fire, the voltage
+        of IF neurons does not change, and LIF/PLIF neurons only leak, which is applied in closed form at once by
+        ``node.neuronal_decay(steps)`` at the next time-step that is not skipped. Call ``flush()`` before reading
+        ``node.v`` in between.
+
+        The computation is only skipped when the input does not require grad, so gradients of backward are not changed.
+        Checking whether the input is all zero needs one device synchronization. ``stats()`` returns the skipped
+        computation.
+
+        Examples:
+
+        .. code-block:: python
+
+            net = nn.Sequential(
+                ZeroSkip(nn.Conv2d(2, 32, 3, padding=1, bias=False), neuron.IFNode()),
+                ZeroSkip(nn.Conv2d(32, 32, 3, padding=1, bias=False), neuron.LIFNode(tau=2.0)),
+            )
+            with torch.no_grad():
+                for t in range(T):
+                    net(x_seq[t])
+            print(functional.zero_skip_stats(net))
+        '''
+        super().__init__()
+        self.synapse = synapse
+        self.node = node
+        self.zero_output_cache = None  # (key, synapse对0输入的输出)
+        self.idle_steps = 0  # 被跳过的、还没有更新到node.v上的时刻数
+        self.node_decayable = None  # node是否实现了neuronal_decay，在第一次需要时检查
+        self.reset_stats()
+
+    def reset_stats(self):
+        '''
+        :return: None
+
+        清空 ``stats()`` 的统计。
+        '''
+        self.num_samples = 0
+        self.num_skipped_samples = 0
+        self.num_steps = 0
+        self.num_skipped_node_steps = 0
+        self.sample_out_numel = None
+
+    def zero_output(self, x: torch.Tensor):
+        # synapse对单个0输入样本的输出，shape = [1, *]。不需要梯度时，在参数没有被修改前会被缓存
+        if torch.is_grad_enabled():
+            return self.synapse(x.new_zeros([1] + list(x.shape[1:])))
+        key = (x.shape[1:], x.device, x.dtype, tuple(p._version for p in self.synapse.parameters()))
+        if self.zero_output_cache is None or self.zero_output_cache[0] != key:
+            y0 = self.synapse(x.new_zeros([1] + list(x.shape[1:])))
+            self.zero_output_cache = (key, y0, not bool(y0.any()))
+            self.sample_out_numel = y0.numel()
+        return self.zero_output_cache[1]
+
+    def flush(self):
+        '''
+        :return: None
+
+        将被跳过的时刻的泄漏更新到 ``node.v`` 上。
+        '''
+        if self.idle_steps > 0:
+            self.node.neuronal_decay(self.idle_steps)
+            self.idle_steps = 0
+
+    def can_skip_node(self):
+        # 只有在不需要梯度、node对0输入有解析解、且没有神经元能够放电时，才能跳过node
+        if torch.is_grad_enabled() or getattr(self.node, 'monitor', False) or not self.zero_output_cache[2]:
+            return False
+        if self.idle_steps > 0:
+            # 输入为0时电压单调地趋向静息电位，因此在连续被跳过的时刻中只需要检查一次
+            return True
+        if self.node_decayable is None:
+            try:
+                self.node.neuronal_decay(0)
+                self.node_decayable = True
+            except (AttributeError, NotImplementedError):
+                self.node_decayable = False
+        if not self.node_decayable:
+            return False
+        v_rest = 0. if self.node.v_reset is None else self.node.v_reset
+        return not bool(torch.as_tensor(self.node.v >= self.node.v_threshold).any()) \
+               and not bool(torch.as_tensor(v_rest >= self.node.v_threshold).any())
+
+    def forward(self, x: torch.Tensor):
+        self.num_steps += 1
+        self.num_samples += x.shape[0]
+        if x.requires_grad:
+            y = self.synapse(x)
+        else:
+            active = (x.flatten(1) != 0).any(1)
+            num_active = int(active.sum())
+            self.num_skipped_samples += x.shape[0] - num_active
+            if num_active == x.shape[0]:
+                y = self.synapse(x)
+            else:
+                y0 = self.zero_output(x)
+                y_shape = [x.shape[0]] + list(y0.shape[1:])
+                if num_active == 0:
+                    if self.node is not None and self.can_skip_node():
+                        self.idle_steps += 1
+                        self.num_skipped_node_steps += 1
+                        return torch.zeros(y_shape, dtype=y0.dtype, device=y0.device)
+                # 复制缓存的输出，否则之后的原地运算（例如relu_）会修改缓存，使之后被跳过的时刻的输出都出错
+                y = y0.expand(y_shape).clone()
+                if num_active > 0:
+                    y[active] = self.synapse(x[active])
+
+        if self.node is None:
+            return y
+        self.flush()
+        return self.node(y)
+
+    def stats(self):
+        '''
+        :return: 统计结果的字典，包括处理的样本数 ``samples``，跳过突触计算的样本数 ``skipped_samples`` 及其比例 ``skip_ratio``，
+            跳过的乘加运算数 ``skipped_macs`` （仅支持 ``nn.Linear`` 和卷积层，否则为 ``None``），以及跳过 ``node`` 的时刻数
+            ``skipped_node_steps``
+        :rtype: dict
+        '''
+        macs = None
+        if isinstance(self.synapse, nn.Linear):
+            macs = self.synapse.in_features * self.synapse.out_features
+        elif isinstance(self.synapse, nn.modules.conv._ConvNd) and self.sample_out_numel is not None:
+            macs = self.sample_out_numel * self.synapse.in_channels // self.synapse.groups
+            for k in self.synapse.kernel_size:
+                macs *= k
+        return {
+            'samples': self.num_samples,
+            'skipped_samples': self.num_skipped_samples,
+            'skip_ratio': self.num_skipped_samples / self.num_samples if self.num_samples > 0 else 0.,
+            'skipped_macs': None if macs is None else macs * self.num_skipped_samples,
+            'steps': self.num_steps,
+            'skipped_node_steps': self.num_skipped_node_steps
+        }
+
+    def reset(self):
+        '''
+        :return: None
+
+        本层是一个有状态的层。此函数丢弃被跳过的、还没有更新到 ``node.v`` 上的时刻数，``node`` 本身由它自己的 ``reset()`` 重置。
+        '''
+        self.idle_steps = 0
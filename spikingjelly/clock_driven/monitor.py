@@ -0,0 +1,617 @@
+import torch
+import numpy as np
+import os
+import json
+import shutil
+from spikingjelly.clock_driven import accelerating
+
+
+class RingBufferMonitor:
+    def __init__(self, capacity: int, interval: int = 1, index=None):
+        '''
+        * :ref:`API in English <RingBufferMonitor.__init__-en>`
+
+        .. _RingBufferMonitor.__init__-cn:
+
+        :param capacity: 每个键最多保存的记录数量。超过 ``capacity`` 后，新的记录会覆盖最早的记录
+        :type capacity: int
+        :param interval: 每 ``interval`` 次记录中只保存第1次，用于对时间进行降采样。默认为1，即保存全部记录
+        :type interval: int
+        :param index: 若不为 ``None``，则只保存 ``x[index]``，用于只记录部分神经元，例如 ``index = (slice(None), [0, 3, 7])``
+            表示记录所有样本中第0，3，7号神经元
+        :type index: Any
+
+        保存在与被记录的数据相同设备上的环形缓冲区监视器。首次记录某个键时，会预先分配 ``shape = [capacity, *]`` 的缓冲区，之后的每次
+        记录只是将数据拷贝到缓冲区中，不会进行设备同步，也不会产生新的内存分配。读取记录时，才会一次性地将缓冲区异步拷贝到主机内存中。
+
+        ``monitor[key]`` 返回按照时间顺序排列的 ``numpy`` 数组，``shape = [n, *]``，其中 ``n`` 是保存的记录数量，因此可以像
+        原来的列表监视器一样使用，例如 ``np.asarray(monitor['v'])``。
+
+        示例代码：
+
+        .. code-block:: python
+
+            >>> lif = neuron.LIFNode()
+            >>> lif.set_monitor(True, capacity=64)
+            >>> for t in range(8):
+            >>>     lif(torch.rand([2, 4]))
+            >>> lif.monitor['s'].shape
+            (8, 2, 4)
+
+        * :ref:`中文API <RingBufferMonitor.__init__-cn>`
+
+        .. _RingBufferMonitor.__init__-en:
+
+        :param capacity: the maximum number of records saved for every key. After ``capacity`` records, new records will
+            overwrite the oldest ones
+        :type capacity: int
+        :param interval: only the first one in every ``interval`` records is saved, which subsamples in time. Default: 1,
+            which means all records are saved
+        :type interval: int
+        :param index: if not ``None``, only ``x[index]`` will be saved, which records a part of neurons. For example,
+            ``index = (slice(None), [0, 3, 7])`` means recording the 0-th, 3-th and 7-th neurons of all samples
+        :type index: Any
+
+        A ring buffer monitor located on the same device as the recorded data. When a key is recorded for the first time,
+        a buffer with ``shape = [capacity, *]`` is preallocated. After that, every record only copies data into the
+        buffer, without device synchronization or new memory allocation. Only when the records are read, the buffers
+        are copied to host memory in one bulk, asynchronous copy.
+
+        ``monitor[key]`` returns a ``numpy`` array in chronological order with ``shape = [n, *]``, where ``n`` is the
+        number of saved records. Thus, it can be used as the former list monitor, e.g., ``np.asarray(monitor['v'])``.
+
+        Examples:
+
+        .. code-block:: python
+
+            >>> lif = neuron.LIFNode()
+            >>> lif.set_monitor(True, capacity=64)
+            >>> for t in range(8):
+            >>>     lif(torch.rand([2, 4]))
+            >>> lif.monitor['s'].shape
+            (8, 2, 4)
+        '''
+        assert capacity > 0 and interval > 0
+        self.capacity = capacity
+        self.interval = interval
+        self.index = index
+        self.buffers = {}
+        self.calls = {}  # 每个键被调用record的次数
+        self.records = {}  # 每个键被写入缓冲区的次数
+        self.host_buffers = {}
+        self.copy_event = None
+
+    def __repr__(self):
+        return f'RingBufferMonitor(capacity={self.capacity}, interval={self.interval}, index={self.index})'
+
+    def keys(self):
+        return self.buffers.keys()
+
+    def is_empty(self, key: str):
+        '''
+        :param key: 记录的键
+        :type key: str
+        :return: 键 ``key`` 是否还没有被记录过
+        :rtype: bool
+        '''
+        return self.calls.get(key, 0) == 0
+
+    def record(self, key: str, x: torch.Tensor):
+        '''
+        * :ref:`API in English <RingBufferMonitor.record-en>`
+
+        .. _RingBufferMonitor.record-cn:
+
+        :param key: 记录的键，例如 ``'v'`` 或 ``'s'``
+        :type key: str
+        :param x: 被记录的数据
+        :type x: torch.Tensor
+        :return: None
+
+        将 ``x`` 拷贝到键 ``key`` 对应的缓冲区中。若 ``x`` 的形状、数据类型或设备与缓冲区不同，则重新分配缓冲区。
+
+        * :ref:`中文API <RingBufferMonitor.record-cn>`
+
+        .. _RingBufferMonitor.record-en:
+
+        :param key: the key of the record, e.g., ``'v'`` or ``'s'``
+        :type key: str
+        :param x: the recorded data
+        :type x: torch.Tensor
+        :return: None
+
+        Copy ``x`` into the buffer of ``key``. If the shape, data type or device of ``x`` differs from that of the buffer,
+        the buffer will be reallocated.
+        '''
+        calls = self.calls.get(key, 0)
+        self.calls[key] = calls + 1
+        if calls % self.interval != 0:
+            return
+        x = x.detach()
+        if self.index is not None:
+            x = x[self.index]
+
+        buffer = self.buffers.get(key)
+        if buffer is None or buffer.shape[1:] != x.shape or buffer.dtype != x.dtype or buffer.device != x.device:
+            buffer = torch.empty([self.capacity] + list(x.shape), dtype=x.dtype, device=x.device)
+            self.buffers[key] = buffer
+            self.records[key] = 0
+
+        records = self.records[key]
+        buffer[records % self.capacity].copy_(x)
+        self.records[key] = records + 1
+        self.host_buffers.clear()
+
+    def copy_to_host(self):
+        '''
+        * :ref:`API in English <RingBufferMonitor.copy_to_host-en>`
+
+        .. _RingBufferMonitor.copy_to_host-cn:
+
+        :return: None
+
+        启动从缓冲区到主机内存的异步拷贝。对于CUDA上的缓冲区，数据会被拷贝到锁页内存中，拷贝与之后的计算可以并行。
+        读取 ``monitor[key]`` 时会自动调用此函数并等待拷贝完成，因此通常不需要手动调用。
+
+        * :ref:`中文API <RingBufferMonitor.copy_to_host-cn>`
+
+        .. _RingBufferMonitor.copy_to_host-en:
+
+        :return: None
+
+        Start the asynchronous copy from buffers to host memory. Buffers on CUDA are copied to pinned memory, and the copy
+        can overlap with the following computation. This function is called automatically and waited when reading
+        ``monitor[key]``, so it usually does not need to be called manually.
+        '''
+        self.copy_event = None
+        for key, buffer in self.buffers.items():
+            n = min(self.records[key], self.capacity)
+            if buffer.is_cuda:
+                host_buffer = torch.empty([n] + list(buffer.shape[1:]), dtype=buffer.dtype, pin_memory=True)
+                host_buffer.copy_(buffer[0: n], non_blocking=True)
+                if self.copy_event is None:
+                    self.copy_event = torch.cuda.Event()
+                self.copy_event.record(torch.cuda.current_stream(buffer.device))
+            else:
+                host_buffer = buffer[0: n].clone()
+            self.host_buffers[key] = host_buffer
+
+    def __getitem__(self, key: str):
+        if key not in self.host_buffers:
+            self.copy_to_host()
+        if self.copy_event is not None:
+            self.copy_event.synchronize()
+            self.copy_event = None
+        host_buffer = self.host_buffers[key]
+        records = self.records[key]
+        if records > self.capacity:
+            # 缓冲区已经被写满，最早的记录位于records % capacity处
+            start = records % self.capacity
+            host_buffer = torch.cat((host_buffer[start:], host_buffer[0: start]))
+        return host_buffer.numpy()
+
+    def reset(self):
+        '''
+        * :ref:`API in English <RingBufferMonitor.reset-en>`
+
+        .. _RingBufferMonitor.reset-cn:
+
+        :return: None
+
+        清空所有记录。已经分配的缓冲区会被保留，以便下次记录时复用。
+
+        * :ref:`中文API <RingBufferMonitor.reset-cn>`
+
+        .. _RingBufferMonitor.reset-en:
+
+        :return: None
+
+        Clear all records. The allocated buffers are kept to be reused by the next records.
+        '''
+        self.calls.clear()
+        for key in self.records.keys():
+            self.records[key] = 0
+        self.host_buffers.clear()
+        self.copy_event = None
+
+
+class MemmapMonitor:
+    def __init__(self, root: str, chunk_size: int = 1024, interval: int = 1, index=None, v_dtype=None,
+                 spike_keys=('s',)):
+        '''
+        * :ref:`API in English <MemmapMonitor.__init__-en>`
+
+        .. _MemmapMonitor.__init__-cn:
+
+        :param root: 保存记录的文件夹。两次 ``reset()`` 之间的记录属于同一次运行，保存在子文件夹 ``run_dir = {root}/run_{i}``
+            中，其中每个键的记录保存为若干个 ``{key}_{i}.npy`` 文件，元信息保存在 ``{key}.json`` 中
+        :type root: str
+        :param chunk_size: 每个 ``.npy`` 文件保存的记录数量
+        :type chunk_size: int
+        :param interval: 每 ``interval`` 次记录中只保存第1次，用于对时间进行降采样
+        :type interval: int
+        :param index: 若不为 ``None``，则只保存 ``x[index]``
+        :type index: Any
+        :param v_dtype: 若不为 ``None``，则脉冲以外的记录（例如电压）会被转换为 ``v_dtype`` 后再保存，例如 ``np.float16``
+        :param spike_keys: 这些键的记录被视为脉冲，会先在原设备上使用 :ref:`accelerating.pack_spike <pack_spike-cn>`
+            按位打包，再拷贝到主机并保存，每个字节保存8个脉冲
+        :type spike_keys: tuple
+
+        将记录以流的方式写入 ``np.memmap`` 映射的 ``.npy`` 文件的监视器，主机内存的占用与仿真时长 ``T`` 无关，适用于 ``T`` 很大的仿真。
+        记录先被写入一个 ``shape = [chunk_size, *]`` 的内存映射文件，写满后刷新到磁盘并创建下一个文件。
+
+        ``monitor[key]`` 返回当前运行的 :ref:`MemmapRecords <MemmapRecords.__init__-cn>`，只有在被索引时才从磁盘读取对应的部分。
+        仿真结束后，也可以使用 ``MemmapRecords(run_dir, key)`` 直接打开某次运行的记录。``reset()`` 不会删除已经写入的文件，
+        需要删除时调用 ``remove_files()``。
+
+        * :ref:`中文API <MemmapMonitor.__init__-cn>`
+
+        .. _MemmapMonitor.__init__-en:
+
+        :param root: the directory to save records. Records between two calls of ``reset()`` belong to one run and are
+            saved in the subdirectory ``run_dir = {root}/run_{i}``, where the records of every key are saved in several
+            ``{key}_{i}.npy`` files, and the meta information is saved in ``{key}.json``
+        :type root: str
+        :param chunk_size: the number of records saved in every ``.npy`` file
+        :type chunk_size: int
+        :param interval: only the first one in every ``interval`` records is saved, which subsamples in time
+        :type interval: int
+        :param index: if not ``None``, only ``x[index]`` will be saved
+        :type index: Any
+        :param v_dtype: if not ``None``, records except spikes (e.g., voltages) will be converted to ``v_dtype`` before
+            being saved, e.g., ``np.float16``
+        :param spike_keys: records of these keys are regarded as spikes, which will be packed in bits by
+            :ref:`accelerating.pack_spike <pack_spike-en>` on the original device before being copied to host and saved,
+            8 spikes per byte
+        :type spike_keys: tuple
+
+        A monitor streaming records into ``.npy`` files mapped by ``np.memmap``. Its host memory consumption is
+        independent of the simulating duration ``T``, which suits simulations with a large ``T``. Records are written into
+        a memory-mapped file with ``shape = [chunk_size, *]``, which is flushed to disk when it is full, and then the next
+        file is created.
+
+        ``monitor[key]`` returns :ref:`MemmapRecords <MemmapRecords.__init__-en>` of the current run, which reads the
+        corresponding part from disk only when it is indexed. After the simulation, the records of a run can also be
+        opened directly by ``MemmapRecords(run_dir, key)``. ``reset()`` does not delete the written files. Call
+        ``remove_files()`` to delete them.
+        '''
+        assert chunk_size > 0 and interval > 0
+        self.root = root
+        self.chunk_size = chunk_size
+        self.interval = interval
+        self.index = index
+        self.v_dtype = v_dtype
+        self.spike_keys = spike_keys
+        self.calls = {}
+        self.records = {}
+        self.meta = {}
+        self.chunks = {}  # 每个键正在写入的内存映射文件
+        os.makedirs(root, exist_ok=True)
+        # 从第一个未被使用的编号开始，不覆盖之前保存在root中的运行
+        self.first_run = 0
+        while os.path.exists(os.path.join(root, f'run_{self.first_run}')):
+            self.first_run += 1
+        self.run = self.first_run
+
+    @property
+    def run_dir(self):
+        return os.path.join(self.root, f'run_{self.run}')
+
+    def __repr__(self):
+        return f'MemmapMonitor(root={self.root}, chunk_size={self.chunk_size}, interval={self.interval}, index={self.index}, v_dtype={self.v_dtype})'
+
+    def keys(self):
+        return self.meta.keys()
+
+    def is_empty(self, key: str):
+        return self.calls.get(key, 0) == 0
+
+    def record(self, key: str, x: torch.Tensor):
+        '''
+        * :ref:`API in English <MemmapMonitor.record-en>`
+
+        .. _MemmapMonitor.record-cn:
+
+        :param key: 记录的键，例如 ``'v'`` 或 ``'s'``
+        :type key: str
+        :param x: 被记录的数据
+        :type x: torch.Tensor
+        :return: None
+
+        将 ``x`` 写入键 ``key`` 对应的内存映射文件中。同一个键的记录的形状和数据类型必须相同，例如batch size改变时，需要先调用
+        ``reset()``，否则会抛出 ``ValueError``。
+
+        * :ref:`中文API <MemmapMonitor.record-cn>`
+
+        .. _MemmapMonitor.record-en:
+
+        :param key: the key of the record, e.g., ``'v'`` or ``'s'``
+        :type key: str
+        :param x: the recorded data
+        :type x: torch.Tensor
+        :return: None
+
+        Write ``x`` into the memory-mapped file of ``key``. The records of the same key must have the same shape and
+        dtype. For example, ``reset()`` should be called before the batch size changes, otherwise ``ValueError`` is raised.
+        '''
+        calls = self.calls.get(key, 0)
+        self.calls[key] = calls + 1
+        if calls % self.interval != 0:
+            return
+        x = x.detach()
+        if self.index is not None:
+            x = x[self.index]
+
+        if key in self.spike_keys:
+            packed, shape = accelerating.pack_spike(x)
+            x_np = packed.cpu().numpy()
+            meta = {'shape': list(shape), 'dtype': 'uint8', 'packed': True}
+        else:
+            x_np = x.cpu().numpy()
+            if self.v_dtype is not None:
+                x_np = x_np.astype(self.v_dtype)
+            meta = {'shape': list(x_np.shape), 'dtype': x_np.dtype.str, 'packed': False}
+
+        records = self.records.get(key, 0)
+        if key not in self.meta:
+            self.meta[key] = meta
+        elif self.meta[key] != meta:
+            raise ValueError(f'The record of key "{key}" changes from shape={self.meta[key]["shape"]}, '
+                             f'dtype={self.meta[key]["dtype"]} to shape={meta["shape"]}, dtype={meta["dtype"]}. '
+                             f'Call reset() before recording data of a different shape')
+        offset = records % self.chunk_size
+        if offset == 0:
+            os.makedirs(self.run_dir, exist_ok=True)
+            self.chunks[key] = np.lib.format.open_memmap(
+                self.chunk_path(key, records // self.chunk_size), mode='w+', dtype=x_np.dtype,
+                shape=(self.chunk_size,) + x_np.shape)
+        elif key not in self.chunks:
+            # close()之后继续记录，重新打开未写满的文件
+            self.chunks[key] = np.lib.format.open_memmap(self.chunk_path(key, records // self.chunk_size), mode='r+')
+        chunk = self.chunks[key]
+        chunk[offset] = x_np
+        self.records[key] = records + 1
+        if offset == self.chunk_size - 1:
+            chunk.flush()
+            del self.chunks[key]
+            self.write_meta(key)
+
+    def chunk_path(self, key: str, i: int):
+        return os.path.join(self.run_dir, f'{key}_{i}.npy')
+
+    def write_meta(self, key: str):
+        meta = dict(self.meta[key])
+        meta['records'] = self.records[key]
+        meta['chunk_size'] = self.chunk_size
+        with open(os.path.join(self.run_dir, f'{key}.json'), 'w') as f:
+            json.dump(meta, f)
+
+    def flush(self):
+        '''
+        * :ref:`API in English <MemmapMonitor.flush-en>`
+
+        .. _MemmapMonitor.flush-cn:
+
+        :return: None
+
+        将所有正在写入的文件和元信息刷新到磁盘。读取 ``monitor[key]`` 时会自动调用。
+
+        * :ref:`中文API <MemmapMonitor.flush-cn>`
+
+        .. _MemmapMonitor.flush-en:
+
+        :return: None
+
+        Flush all files being written and the meta information to disk. It is called automatically when reading
+        ``monitor[key]``.
+        '''
+        for chunk in self.chunks.values():
+            chunk.flush()
+        for key in self.meta.keys():
+            self.write_meta(key)
+
+    def __getitem__(self, key: str):
+        self.flush()
+        return MemmapRecords(self.run_dir, key)
+
+    def close(self):
+        '''
+        :return: None
+
+        将所有正在写入的文件和元信息刷新到磁盘，并关闭这些文件。之后仍然可以继续记录，未写满的文件会被重新打开并继续写入。
+        '''
+        self.flush()
+        self.chunks.clear()
+
+    def __del__(self):
+        # 解释器退出时，模块中的全局变量（例如open）可能已经被清理
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def reset(self):
+        '''
+        * :ref:`API in English <MemmapMonitor.reset-en>`
+
+        .. _MemmapMonitor.reset-cn:
+
+        :return: None
+
+        结束当前的运行：将正在写入的文件和元信息刷新到磁盘并关闭，清空内存中的记录状态。若当前运行写入了记录，之后的记录会写入新的子文件夹
+        ``run_{i + 1}``，并且可以具有不同的形状。已经写入的文件不会被删除，之前得到的 ``MemmapRecords`` 仍然可以读取。
+
+        * :ref:`中文API <MemmapMonitor.reset-cn>`
+
+        .. _MemmapMonitor.reset-en:
+
+        :return: None
+
+        Finish the current run: flush and close the files being written and the meta information, and clear the
+        in-memory states of records. If the current run has written records, the following records will be written
+        into a new subdirectory ``run_{i + 1}`` and can have a different shape. The written files are not deleted, and
+        ``MemmapRecords`` obtained before can still be read.
+        '''
+        self.close()
+        self.calls.clear()
+        if self.records.__len__() > 0:
+            self.run += 1
+        self.records.clear()
+        self.meta.clear()
+
+    def remove_files(self):
+        '''
+        * :ref:`API in English <MemmapMonitor.remove_files-en>`
+
+        .. _MemmapMonitor.remove_files-cn:
+
+        :return: None
+
+        清空所有记录，并删除这个监视器写入 ``root`` 的所有运行的子文件夹。之前得到的 ``MemmapRecords`` 将无法再读取。
+
+        * :ref:`中文API <MemmapMonitor.remove_files-cn>`
+
+        .. _MemmapMonitor.remove_files-en:
+
+        :return: None
+
+        Clear all records, and delete the subdirectories of all runs written into ``root`` by this monitor.
+        ``MemmapRecords`` obtained before can not be read anymore.
+        '''
+        self.reset()
+        for run in range(self.first_run, self.run + 1):
+            shutil.rmtree(os.path.join(self.root, f'run_{run}'), ignore_errors=True)
+        self.run = self.first_run
+
+
+class MemmapRecords:
+    def __init__(self, root: str, key: str):
+        '''
+        * :ref:`API in English <MemmapRecords.__init__-en>`
+
+        .. _MemmapRecords.__init__-cn:
+
+        :param root: :ref:`MemmapMonitor <MemmapMonitor.__init__-cn>` 保存某次运行的记录的子文件夹，即 ``monitor.run_dir``
+        :type root: str
+        :param key: 记录的键
+        :type key: str
+
+        以懒加载的方式读取 :ref:`MemmapMonitor <MemmapMonitor.__init__-cn>` 保存的记录。``records[i]`` 和 ``records[i: j]``
+        只会读取涉及到的 ``.npy`` 文件中的对应部分，打包的脉冲也只会对读取的部分解包。``np.asarray(records)`` 会读取全部记录。
+
+        与 ``spikingjelly.visualizing`` 配合使用，只加载需要画出的时间段，示例代码：
+
+        .. code-block:: python
+
+            >>> lif = neuron.LIFNode()
+            >>> lif.set_monitor(True, root='./lif_records', v_dtype=np.float16)
+            >>> for t in range(100000):
+            >>>     lif(torch.rand([1]) * 2)
+            >>> v = lif.monitor['v']
+            >>> s = lif.monitor['s']
+            >>> visualizing.plot_one_neuron_v_s(v[50000: 50200], s[50000: 50200], t_offset=50000)
+
+        * :ref:`中文API <MemmapRecords.__init__-cn>`
+
+        .. _MemmapRecords.__init__-en:
+
+        :param root: the subdirectory where :ref:`MemmapMonitor <MemmapMonitor.__init__-en>` saves the records of a run,
+            i.e., ``monitor.run_dir``
+        :type root: str
+        :param key: the key of the records
+        :type key: str
+
+        Read records saved by :ref:`MemmapMonitor <MemmapMonitor.__init__-en>` lazily. ``records[i]`` and
+        ``records[i: j]`` only read the corresponding parts of the involved ``.npy`` files, and packed spikes are only
+        unpacked for the read part. ``np.asarray(records)`` reads all records.
+
+        It can be used with ``spikingjelly.visualizing`` to load only the time range to be plotted.
+        Examples:
+
+        .. code-block:: python
+
+            >>> lif = neuron.LIFNode()
+            >>> lif.set_monitor(True, root='./lif_records', v_dtype=np.float16)
+            >>> for t in range(100000):
+            >>>     lif(torch.rand([1]) * 2)
+            >>> v = lif.monitor['v']
+            >>> s = lif.monitor['s']
+            >>> visualizing.plot_one_neuron_v_s(v[50000: 50200], s[50000: 50200], t_offset=50000)
+        '''
+        self.root = root
+        self.key = key
+        with open(os.path.join(root, f'{key}.json'), 'r') as f:
+            meta = json.load(f)
+        self.records = meta['records']
+        self.chunk_size = meta['chunk_size']
+        self.record_shape = tuple(meta['shape'])
+        self.packed = meta['packed']
+        self.dtype = np.dtype(np.float32) if self.packed else np.dtype(meta['dtype'])
+
+    @property
+    def shape(self):
+        return (self.records,) + self.record_shape
+
+    @property
+    def ndim(self):
+        return self.shape.__len__()
+
+    def __len__(self):
+        return self.records
+
+    def __repr__(self):
+        return f'MemmapRecords(root={self.root}, key={self.key}, shape={self.shape}, packed={self.packed})'
+
+    def read(self, start: int, end: int):
+        '''
+        :param start: 起始位置
+        :type start: int
+        :param end: 结束位置（不包含）
+        :type end: int
+        :return: 第 ``start`` 到 ``end - 1`` 条记录，``shape = [end - start, *]``
+        :rtype: np.ndarray
+        '''
+        outputs = []
+        i = start
+        while i < end:
+            chunk_id = i // self.chunk_size
+            offset = i % self.chunk_size
+            n = min(end - i, self.chunk_size - offset)
+            chunk = np.load(os.path.join(self.root, f'{self.key}_{chunk_id}.npy'), mmap_mode='r')
+            outputs.append(np.array(chunk[offset: offset + n]))
+            i += n
+        if outputs.__len__() == 0:
+            return np.empty((0,) + self.record_shape, dtype=self.dtype)
+        x = np.concatenate(outputs)
+        if self.packed:
+            numel = int(np.prod(self.record_shape))
+            x = np.unpackbits(x, axis=1, count=numel).reshape((x.shape[0],) + self.record_shape).astype(self.dtype)
+        return x
+
+    def __getitem__(self, item):
+        if isinstance(item, tuple):
+            # 先在时间维度上读取，再在读取的结果上对其余维度索引
+            x = self[item[0]]
+            if isinstance(item[0], slice):
+                return x[(slice(None),) + item[1:]]
+            return x[item[1:]]
+        if isinstance(item, slice):
+            start, stop, step = item.indices(self.records)
+            if step < 0:
+                return self.read(stop + 1, start + 1)[::-1][::-step]
+            return self.read(start, stop)[::step]
+        if item < 0:
+            item += self.records
+        if item < 0 or item >= self.records:
+            raise IndexError(f'index {item} is out of range for {self.records} records')
+        return self.read(item, item + 1)[0]
+
+    def __iter__(self):
+        for i in range(0, self.records, self.chunk_size):
+            yield from self.read(i, min(i + self.chunk_size, self.records))
+
+    def __array__(self, dtype=None):
+        x = self.read(0, self.records)
+        if dtype is not None:
+            x = x.astype(dtype)
+        return x
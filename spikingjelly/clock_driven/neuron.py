@@ -1,20 +1,548 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from spikingjelly.clock_driven import surrogate, accelerating, layer
+from spikingjelly.clock_driven import surrogate, accelerating, layer, monitor
 import math
+import copy
+
+class multi_step_recompute_function(torch.autograd.Function):
+    @staticmethod
+    def forward(ctx, dv_seq: torch.Tensor, v_init: torch.Tensor, tau, v_threshold, v_reset, detach_reset: bool,
+                surrogate_function):
+        # 充电过程统一写为 h = a * v + b * dv + c，tau为None时是IF神经元的 h = v + dv
+        # 前向传播只保存输入dv_seq、初始电压v_init和bool类型的脉冲，反向传播时根据脉冲重新计算电压
+        if tau is None:
+            a, b, c = 1., 1., 0.
+        else:
+            b = 1. / tau
+            a = 1. - b
+            c = 0. if v_reset is None else v_reset * b
+        spike_seq = torch.empty(dv_seq.shape, dtype=torch.bool, device=dv_seq.device)
+        v = v_init
+        for t in range(dv_seq.shape[0]):
+            h = a * v + b * dv_seq[t] + c
+            spike_seq[t] = (h >= v_threshold)
+            if v_reset is None:
+                v = h - spike_seq[t] * v_threshold
+            elif isinstance(v_reset, torch.Tensor):
+                v = torch.where(spike_seq[t], v_reset.to(h), h)
+            else:
+                v = h.masked_fill(spike_seq[t], v_reset)
+
+        ctx.save_for_backward(dv_seq, v_init, spike_seq)
+        ctx.coefficients = (a, b, c)
+        ctx.v_threshold = v_threshold
+        ctx.v_reset = v_reset
+        ctx.detach_reset = detach_reset
+        ctx.surrogate_function = surrogate_function
+        return spike_seq.to(dv_seq), v
+
+    @staticmethod
+    def backward(ctx, grad_spike_seq: torch.Tensor, grad_v: torch.Tensor):
+        dv_seq, v_init, spike_seq = ctx.saved_tensors
+        a, b, c = ctx.coefficients
+        v_threshold = ctx.v_threshold
+        v_reset = ctx.v_reset
+
+        # 脉冲已知，则电压的递推不再需要与阈值比较，直接重新计算出每个时刻充电后的电压h
+        h_seq = torch.empty_like(dv_seq)
+        v = v_init
+        for t in range(dv_seq.shape[0]):
+            h_seq[t] = a * v + b * dv_seq[t] + c
+            if v_reset is None:
+                v = h_seq[t] - spike_seq[t] * v_threshold
+            elif isinstance(v_reset, torch.Tensor):
+                v = torch.where(spike_seq[t], v_reset.to(h_seq), h_seq[t])
+            else:
+                v = h_seq[t].masked_fill(spike_seq[t], v_reset)
+
+        if grad_v is None:
+            grad_v = torch.zeros_like(dv_seq[0])
+        grad_dv_seq = torch.empty_like(dv_seq)
+        for t in range(dv_seq.shape[0] - 1, -1, -1):
+            if v_reset is None:
+                grad_h = grad_v
+                grad_spike_from_v = - v_threshold * grad_v
+            else:
+                grad_h = grad_v * spike_seq[t].logical_not()
+                grad_spike_from_v = (v_reset - h_seq[t]) * grad_v
+
+            if ctx.detach_reset:
+                grad_spike = grad_spike_seq[t]
+            else:
+                grad_spike = grad_spike_seq[t] + grad_spike_from_v
+
+            with torch.enable_grad():
+                x = (h_seq[t] - v_threshold).detach().requires_grad_(True)
+                grad_h = grad_h + torch.autograd.grad(ctx.surrogate_function(x), x, grad_spike)[0]
+
+            grad_dv_seq[t] = grad_h * b
+            grad_v = grad_h * a
+
+        return grad_dv_seq, grad_v, None, None, None, None, None
+
+def if_charge(v, dv: torch.Tensor, inplace=False):
+    '''
+    :param v: 充电前的电压
+    :type v: float or torch.Tensor
+    :param dv: 输入到神经元的电压增量
+    :type dv: torch.Tensor
+    :param inplace: 是否原地修改 ``v`` 并返回它。``v`` 必须是与充电后的电压形状相同的tensor，且不需要梯度
+    :type inplace: bool
+    :return: IF神经元充电后的电压 :math:`H_t = V_{t-1} + X_t`
+    :rtype: torch.Tensor
+    '''
+    if inplace:
+        return v.add_(dv)
+    return v + dv
+
+def lif_charge(v, dv: torch.Tensor, tau, v_reset=0.0, inplace=False):
+    '''
+    :param v: 充电前的电压
+    :type v: float or torch.Tensor
+    :param dv: 输入到神经元的电压增量
+    :type dv: torch.Tensor
+    :param tau: 膜电位时间常数
+    :type tau: float or torch.Tensor
+    :param v_reset: 重置电压。为 ``None`` 时视为0
+    :type v_reset: float or torch.Tensor or None
+    :param inplace: 是否原地修改 ``v`` 并返回它。``v`` 必须是与充电后的电压形状相同的tensor，且不需要梯度
+    :type inplace: bool
+    :return: LIF神经元充电后的电压 :math:`H_t = V_{t-1} + \\frac{1}{\\tau}(X_t - (V_{t-1} - V_{reset}))`
+    :rtype: torch.Tensor
+    '''
+    if v_reset is None:
+        dh = (dv - v) / tau
+    else:
+        dh = (dv - (v - v_reset)) / tau
+    if inplace:
+        return v.add_(dh)
+    return v + dh
+
+def plif_charge(v, dv: torch.Tensor, w, v_reset=0.0, inplace=False):
+    '''
+    :param v: 充电前的电压
+    :type v: float or torch.Tensor
+    :param dv: 输入到神经元的电压增量
+    :type dv: torch.Tensor
+    :param w: 膜电位时间常数的倒数 :math:`\\frac{1}{\\tau}`，即 :ref:`PLIFNode <PLIFNode.__init__-cn>` 中经过 ``clamp_function``
+        （若有）之后的 ``w``
+    :type w: float or torch.Tensor
+    :param v_reset: 重置电压
+    :type v_reset: float or torch.Tensor
+    :param inplace: 是否原地修改 ``v`` 并返回它。``v`` 必须是与充电后的电压形状相同的tensor，且不需要梯度
+    :type inplace: bool
+    :return: PLIF神经元充电后的电压 :math:`H_t = V_{t-1} + w(X_t - (V_{t-1} - V_{reset}))`
+    :rtype: torch.Tensor
+    '''
+    if inplace:
+        return v.add_((dv - (v - v_reset)) * w)
+    return v + (dv - (v - v_reset)) * w
+
+def rif_charge(v, dv: torch.Tensor, w, v_reset=0.0, inplace=False):
+    '''
+    :param v: 充电前的电压
+    :type v: float or torch.Tensor
+    :param dv: 输入到神经元的电压增量
+    :type dv: torch.Tensor
+    :param w: :ref:`RIFNode <RIFNode.__init__-cn>` 中经过 ``amplitude`` 约束之后的 ``w``
+    :type w: float or torch.Tensor
+    :param v_reset: 重置电压
+    :type v_reset: float or torch.Tensor
+    :param inplace: 是否原地修改 ``v`` 并返回它。``v`` 必须是与充电后的电压形状相同的tensor，且不需要梯度
+    :type inplace: bool
+    :return: RIF神经元充电后的电压 :math:`H_t = V_{t-1} + w(V_{t-1} - V_{reset}) + X_t`
+    :rtype: torch.Tensor
+    '''
+    if inplace:
+        return v.add_((v - v_reset) * w).add_(dv)
+    return v + (v - v_reset) * w + dv
+
+def adapt_threshold_charge(v, b, last_spike, dv: torch.Tensor, tau_m, tau_adp, v_threshold_baseline=1.0,
+                           v_threshold_range=1.8, dt=1.0):
+    '''
+    :param v: 充电前的电压
+    :type v: float or torch.Tensor
+    :param b: 阈值的自适应分量
+    :type b: float or torch.Tensor
+    :param last_spike: 上一个时刻释放的脉冲
+    :type last_spike: torch.Tensor
+    :param dv: 输入到神经元的电压增量
+    :type dv: torch.Tensor
+    :param tau_m: 膜电位时间常数
+    :type tau_m: torch.Tensor
+    :param tau_adp: 阈值的时间常数
+    :type tau_adp: torch.Tensor
+    :param v_threshold_baseline: 阈值的基线 :math:`b_0`
+    :type v_threshold_baseline: float or torch.Tensor
+    :param v_threshold_range: 阈值的范围 :math:`\\beta`
+    :type v_threshold_range: float or torch.Tensor
+    :param dt: 仿真的时间步长
+    :type dt: float
+    :return: 一个元组 ``(h, b, v_threshold)``，分别为 :ref:`AdaptThresholdNode <AdaptThresholdNode.__init__-cn>` 充电后的电压、
+        更新后的 ``b`` 和这一时刻的阈值
+    :rtype: tuple
+    '''
+    alpha = torch.exp(-dt / tau_m)
+    rho = torch.exp(-dt / tau_adp)
+    b = rho * b + (1 - rho) * last_spike
+    v_threshold = v_threshold_baseline + v_threshold_range * b
+    return v * alpha + (1 - alpha) * dv, b, v_threshold
+
+def reset_voltage(h: torch.Tensor, spike: torch.Tensor, v_threshold, v_reset):
+    '''
+    :param h: 充电后的电压
+    :type h: torch.Tensor
+    :param spike: 释放的脉冲
+    :type spike: torch.Tensor
+    :param v_threshold: 阈值电压
+    :type v_threshold: float or torch.Tensor
+    :param v_reset: 重置电压。为 ``None`` 时使用soft方式 :math:`V_t = H_t - S_t V_{threshold}`，否则使用hard方式
+        :math:`V_t = H_t (1 - S_t) + S_t V_{reset}`
+    :type v_reset: float or torch.Tensor or None
+    :return: 重置后的电压
+    :rtype: torch.Tensor
+    '''
+    if v_reset is None:
+        return h - spike * v_threshold
+    else:
+        return h * (1 - spike) + v_reset * spike
+
+def sigmoid_spiking_function(x: torch.Tensor):
+    '''
+    :param x: 输入tensor
+    :type x: torch.Tensor
+    :return: ``heaviside(x)``
+    :rtype: torch.Tensor
+
+    无状态函数默认的脉冲发放函数，前向传播和反向传播的梯度都与 ``surrogate.Sigmoid()`` 相同。它由
+    :ref:`surrogate.scriptable_spiking_function <scriptable_spiking_function-cn>` 实现，只由tensor运算组成，不使用
+    ``autograd.Function``，因此可以在 ``torch.func.vmap``、``torch.func.grad`` 等变换中使用。
+    '''
+    return surrogate.scriptable_spiking_function(x, 'Sigmoid', 1.)
+
+def fire_and_reset(h: torch.Tensor, v_threshold=1.0, v_reset=0.0, surrogate_function=sigmoid_spiking_function, detach_reset=False):
+    '''
+    * :ref:`API in English <fire_and_reset-en>`
+
+    .. _fire_and_reset-cn:
+
+    :param h: 充电后的电压
+    :type h: torch.Tensor
+    :param v_threshold: 阈值电压
+    :type v_threshold: float or torch.Tensor
+    :param v_reset: 重置电压。为 ``None`` 时使用soft方式
+    :type v_reset: float or torch.Tensor or None
+    :param surrogate_function: 脉冲发放函数
+    :type surrogate_function: callable
+    :param detach_reset: 是否将reset过程的计算图分离
+    :type detach_reset: bool
+    :return: 一个元组 ``(spike, v)``，分别为释放的脉冲和重置后的电压
+    :rtype: tuple
+
+    无状态的放电和重置过程。
+
+    * :ref:`中文API <fire_and_reset-cn>`
+
+    .. _fire_and_reset-en:
+
+    :param h: the voltage after charging
+    :type h: torch.Tensor
+    :param v_threshold: threshold voltage
+    :type v_threshold: float or torch.Tensor
+    :param v_reset: reset voltage. The soft reset is used if ``None``
+    :type v_reset: float or torch.Tensor or None
+    :param surrogate_function: the spiking function
+    :type surrogate_function: callable
+    :param detach_reset: whether detach the computation graph of reset
+    :type detach_reset: bool
+    :return: a tuple ``(spike, v)``, which are fired spikes and the voltage after reset
+    :rtype: tuple
+
+    The stateless fire and reset processes.
+    '''
+    spike = surrogate_function(h - v_threshold)
+    if detach_reset:
+        return spike, reset_voltage(h, spike.detach(), v_threshold, v_reset)
+    else:
+        return spike, reset_voltage(h, spike, v_threshold, v_reset)
+
+def if_step(v, dv: torch.Tensor, v_threshold=1.0, v_reset=0.0, surrogate_function=sigmoid_spiking_function, detach_reset=False):
+    '''
+    * :ref:`API in English <if_step-en>`
+
+    .. _if_step-cn:
+
+    :param v: 神经元的状态，即上一个时刻的电压
+    :type v: float or torch.Tensor
+    :param dv: 输入到神经元的电压增量
+    :type dv: torch.Tensor
+    :param v_threshold: 阈值电压
+    :type v_threshold: float or torch.Tensor
+    :param v_reset: 重置电压。为 ``None`` 时使用soft方式
+    :type v_reset: float or torch.Tensor or None
+    :param surrogate_function: 脉冲发放函数，默认为 ``sigmoid_spiking_function``
+    :type surrogate_function: callable
+    :param detach_reset: 是否将reset过程的计算图分离
+    :type detach_reset: bool
+    :return: 一个元组 ``(spike, v)``，分别为释放的脉冲和新的状态
+    :rtype: tuple
+
+    无状态的 :ref:`IFNode <IFNode.__init__-cn>` 单步函数，形式为 ``(state, input, params) -> (spike, new_state)``。状态由调用者
+    保存和传入，因此可以配合 ``torch.func.functional_call``、``torch.func.vmap`` 等使用。
+
+    参数也可以是tensor，并与输入进行广播。例如，将 ``K`` 组不同的超参数放在第0维，可以在一次调用中运行 ``K`` 个独立的神经元层：
+
+    .. code-block:: python
+
+        K, N = 100, 32
+        v_threshold = torch.linspace(0.5, 2., K).view(K, 1)
+        v = 0.
+        for t in range(T):
+            spike, v = neuron.if_step(v, x[t].expand(K, N), v_threshold=v_threshold)
+
+    需要注意，``surrogate.Sigmoid()`` 等替代函数模块使用 ``autograd.Function``，不支持 ``torch.func.vmap``。在 ``vmap`` 中
+    应使用默认的 ``sigmoid_spiking_function``，或是用 :ref:`surrogate.scriptable_spiking_function <scriptable_spiking_function-cn>`
+    构造其他替代函数，例如：
+
+    .. code-block:: python
+
+        taus = torch.linspace(2., 128., 64)
+        atan = lambda x: surrogate.scriptable_spiking_function(x, 'ATan', 2.)
+        spike, v = torch.func.vmap(lambda tau: neuron.lif_step(v, x, tau, surrogate_function=atan))(taus)
+
+    * :ref:`中文API <if_step-cn>`
+
+    .. _if_step-en:
+
+    :param v: the state of neurons, which is the voltage at the last time-step
+    :type v: float or torch.Tensor
+    :param dv: increment of voltage inputted to neurons
+    :type dv: torch.Tensor
+    :param v_threshold: threshold voltage
+    :type v_threshold: float or torch.Tensor
+    :param v_reset: reset voltage. The soft reset is used if ``None``
+    :type v_reset: float or torch.Tensor or None
+    :param surrogate_function: the spiking function. The default is ``sigmoid_spiking_function``
+    :type surrogate_function: callable
+    :param detach_reset: whether detach the computation graph of reset
+    :type detach_reset: bool
+    :return: a tuple ``(spike, v)``, which are fired spikes and the new state
+    :rtype: tuple
+
+    The stateless single-step function of :ref:`IFNode <IFNode.__init__-en>`, whose form is
+    ``(state, input, params) -> (spike, new_state)``. The state is kept and passed by the caller, so it can be used with
+    ``torch.func.functional_call``, ``torch.func.vmap``, etc.
+
+    The params can also be tensors, which are broadcast with the input. For example, putting ``K`` groups of different
+    hyper-parameters in dimension 0 runs ``K`` independent layers of neurons in one call:
+
+    .. code-block:: python
+
+        K, N = 100, 32
+        v_threshold = torch.linspace(0.5, 2., K).view(K, 1)
+        v = 0.
+        for t in range(T):
+            spike, v = neuron.if_step(v, x[t].expand(K, N), v_threshold=v_threshold)
+
+    Note that the surrogate function modules such as ``surrogate.Sigmoid()`` use ``autograd.Function`` and do not
+    support ``torch.func.vmap``. In ``vmap``, the default ``sigmoid_spiking_function`` should be used, or other surrogate
+    functions can be built by :ref:`surrogate.scriptable_spiking_function <scriptable_spiking_function-en>`, e.g.:
+
+    .. code-block:: python
+
+        taus = torch.linspace(2., 128., 64)
+        atan = lambda x: surrogate.scriptable_spiking_function(x, 'ATan', 2.)
+        spike, v = torch.func.vmap(lambda tau: neuron.lif_step(v, x, tau, surrogate_function=atan))(taus)
+    '''
+    return fire_and_reset(if_charge(v, dv), v_threshold, v_reset, surrogate_function, detach_reset)
+
+def lif_step(v, dv: torch.Tensor, tau=100.0, v_threshold=1.0, v_reset=0.0, surrogate_function=sigmoid_spiking_function, detach_reset=False):
+    '''
+    * :ref:`API in English <lif_step-en>`
+
+    .. _lif_step-cn:
+
+    :param tau: 膜电位时间常数
+    :type tau: float or torch.Tensor
+
+    其他参数和返回值与 :ref:`if_step <if_step-cn>` 相同。
+
+    无状态的 :ref:`LIFNode <LIFNode.__init__-cn>` 单步函数。
+
+    * :ref:`中文API <lif_step-cn>`
+
+    .. _lif_step-en:
+
+    :param tau: membrane time constant
+    :type tau: float or torch.Tensor
+
+    Other params and the return value are the same as those of :ref:`if_step <if_step-en>`.
+
+    The stateless single-step function of :ref:`LIFNode <LIFNode.__init__-en>`.
+    '''
+    return fire_and_reset(lif_charge(v, dv, tau, v_reset), v_threshold, v_reset, surrogate_function, detach_reset)
+
+def plif_step(v, dv: torch.Tensor, w, v_threshold=1.0, v_reset=0.0, surrogate_function=sigmoid_spiking_function, detach_reset=False):
+    '''
+    * :ref:`API in English <plif_step-en>`
+
+    .. _plif_step-cn:
+
+    :param w: 膜电位时间常数的倒数，参见 ``plif_charge``
+    :type w: float or torch.Tensor
+
+    其他参数和返回值与 :ref:`if_step <if_step-cn>` 相同。
+
+    无状态的 :ref:`PLIFNode <PLIFNode.__init__-cn>` 单步函数。
+
+    * :ref:`中文API <plif_step-cn>`
+
+    .. _plif_step-en:
+
+    :param w: the reciprocal of the membrane time constant. See ``plif_charge``
+    :type w: float or torch.Tensor
+
+    Other params and the return value are the same as those of :ref:`if_step <if_step-en>`.
+
+    The stateless single-step function of :ref:`PLIFNode <PLIFNode.__init__-en>`.
+    '''
+    return fire_and_reset(plif_charge(v, dv, w, v_reset), v_threshold, v_reset, surrogate_function, detach_reset)
+
+def rif_step(v, dv: torch.Tensor, w, v_threshold=1.0, v_reset=0.0, surrogate_function=sigmoid_spiking_function, detach_reset=False):
+    '''
+    * :ref:`API in English <rif_step-en>`
+
+    .. _rif_step-cn:
+
+    :param w: 参见 ``rif_charge``
+    :type w: float or torch.Tensor
+
+    其他参数和返回值与 :ref:`if_step <if_step-cn>` 相同。
+
+    无状态的 :ref:`RIFNode <RIFNode.__init__-cn>` 单步函数。
+
+    * :ref:`中文API <rif_step-cn>`
+
+    .. _rif_step-en:
+
+    :param w: see ``rif_charge``
+    :type w: float or torch.Tensor
+
+    Other params and the return value are the same as those of :ref:`if_step <if_step-en>`.
+
+    The stateless single-step function of :ref:`RIFNode <RIFNode.__init__-en>`.
+    '''
+    return fire_and_reset(rif_charge(v, dv, w, v_reset), v_threshold, v_reset, surrogate_function, detach_reset)
+
+def adapt_threshold_step(state: tuple, dv: torch.Tensor, tau_m, tau_adp, v_threshold_baseline=1.0, v_threshold_range=1.8,
+                         v_reset=0.0, surrogate_function=surrogate.Erf(), dt=1.0):
+    '''
+    * :ref:`API in English <adapt_threshold_step-en>`
+
+    .. _adapt_threshold_step-cn:
+
+    :param state: 神经元的状态 ``(v, b, last_spike)``
+    :type state: tuple
+    :param dv: 输入到神经元的电压增量
+    :type dv: torch.Tensor
+    :param tau_m: 膜电位时间常数
+    :type tau_m: torch.Tensor
+    :param tau_adp: 阈值的时间常数
+    :type tau_adp: torch.Tensor
+    :param v_threshold_baseline: 阈值的基线
+    :param v_threshold_range: 阈值的范围
+    :param v_reset: 重置电压。为 ``None`` 时使用soft方式
+    :param surrogate_function: 脉冲发放函数
+    :param dt: 仿真的时间步长
+    :return: 一个元组 ``(spike, (v, b, spike))``，分别为释放的脉冲和新的状态
+    :rtype: tuple
+
+    无状态的 :ref:`AdaptThresholdNode <AdaptThresholdNode.__init__-cn>` 单步函数。
+
+    * :ref:`中文API <adapt_threshold_step-cn>`
+
+    .. _adapt_threshold_step-en:
+
+    :param state: the state of neurons ``(v, b, last_spike)``
+    :type state: tuple
+    :param dv: increment of voltage inputted to neurons
+    :type dv: torch.Tensor
+    :param tau_m: membrane time constant
+    :type tau_m: torch.Tensor
+    :param tau_adp: time constant of the threshold
+    :type tau_adp: torch.Tensor
+    :param v_threshold_baseline: the baseline of the threshold
+    :param v_threshold_range: the range of the threshold
+    :param v_reset: reset voltage. The soft reset is used if ``None``
+    :param surrogate_function: the spiking function
+    :param dt: the time-step of simulation
+    :return: a tuple ``(spike, (v, b, spike))``, which are fired spikes and the new state
+    :rtype: tuple
+
+    The stateless single-step function of :ref:`AdaptThresholdNode <AdaptThresholdNode.__init__-en>`.
+    '''
+    v, b, last_spike = state
+    h, b, v_threshold = adapt_threshold_charge(v, b, last_spike, dv, tau_m, tau_adp, v_threshold_baseline,
+                                               v_threshold_range, dt)
+    spike, v = fire_and_reset(h, v_threshold, v_reset, surrogate_function)
+    return spike, (v, b, spike)
+
+def multi_step(step_function, state, dv_seq: torch.Tensor, *args, **kwargs):
+    '''
+    * :ref:`API in English <multi_step-en>`
+
+    .. _multi_step-cn:
+
+    :param step_function: 单步函数，例如 :ref:`lif_step <lif_step-cn>`
+    :type step_function: callable
+    :param state: 初始状态
+    :param dv_seq: ``shape = [T, *]``，``T`` 个时刻输入到神经元的电压增量
+    :type dv_seq: torch.Tensor
+    :param args: ``step_function`` 的其他参数
+    :param kwargs: ``step_function`` 的其他参数
+    :return: 一个元组 ``(spike_seq, state)``，分别为 ``shape = [T, *]`` 的输出脉冲和最终的状态
+    :rtype: tuple
+
+    按时间顺序运行 ``T`` 次 ``step_function``。
+
+    * :ref:`中文API <multi_step-cn>`
+
+    .. _multi_step-en:
+
+    :param step_function: the single-step function, e.g., :ref:`lif_step <lif_step-en>`
+    :type step_function: callable
+    :param state: the initial state
+    :param dv_seq: ``shape = [T, *]``, increments of voltage inputted to neurons at ``T`` time-steps
+    :type dv_seq: torch.Tensor
+    :param args: other params of ``step_function``
+    :param kwargs: other params of ``step_function``
+    :return: a tuple ``(spike_seq, state)``, which are output spikes with ``shape = [T, *]`` and the final state
+    :rtype: tuple
+
+    Run ``step_function`` ``T`` times in order.
+    '''
+    spike_seq = []
+    for t in range(dv_seq.shape[0]):
+        spike, state = step_function(state, dv_seq[t], *args, **kwargs)
+        spike_seq.append(spike)
+    return torch.stack(spike_seq), state
 
 class BaseNode(nn.Module):
+    # 神经元的状态变量，由functional.get_state和functional.set_state读写
+    state_names = ('v', )
+
     def __init__(self, v_threshold=1.0, v_reset=0.0, surrogate_function=surrogate.Sigmoid(), detach_reset=False, monitor_state=False):
         '''
         * :ref:`API in English <BaseNode.__init__-en>`
 
         .. _BaseNode.__init__-cn:
 
-        :param v_threshold: 神经元的阈值电压
+        :param v_threshold: 神经元的阈值电压。也可以是能与输入广播的tensor，例如输入 ``shape = [N, C]`` 时，``shape = [N, 1]``
+            表示每个样本使用不同的阈值，``shape = [C]`` 表示每个通道使用不同的阈值。tensor会被注册为buffer
 
         :param v_reset: 神经元的重置电压。如果不为 ``None``，当神经元释放脉冲后，电压会被重置为 ``v_reset``；
-            如果设置为 ``None``，则电压会被减去 ``v_threshold``
+            如果设置为 ``None``，则电压会被减去 ``v_threshold``。与 ``v_threshold`` 相同，也可以是能与输入广播的tensor
 
         :param surrogate_function: 反向传播时用来计算脉冲函数梯度的替代函数
 
@@ -31,10 +559,13 @@ class BaseNode(nn.Module):
 
         .. _BaseNode.__init__-en:
 
-        :param v_threshold: threshold voltage of neurons
+        :param v_threshold: threshold voltage of neurons. It can also be a tensor that broadcasts with the input. For
+            example, when the input has ``shape = [N, C]``, ``shape = [N, 1]`` means a different threshold for every sample,
+            and ``shape = [C]`` means a different threshold for every channel. A tensor will be registered as a buffer
 
         :param v_reset: reset voltage of neurons. If not ``None``, voltage of neurons that just fired spikes will be set to
-            ``v_reset``. If ``None``, voltage of neurons that just fired spikes will subtract ``v_threshold``
+            ``v_reset``. If ``None``, voltage of neurons that just fired spikes will subtract ``v_threshold``. Same as
+            ``v_threshold``, it can also be a tensor that broadcasts with the input
 
         :param surrogate_function: surrogate function for replacing gradient of spiking functions during back-propagation
 
@@ -50,8 +581,8 @@ class BaseNode(nn.Module):
         This class is the base class of differentiable spiking neurons.
         '''
         super().__init__()
-        self.v_threshold = v_threshold
-        self.v_reset = v_reset
+        self.set_neuron_param('v_threshold', v_threshold)
+        self.set_neuron_param('v_reset', v_reset)
         self.detach_reset = detach_reset
         if self.v_reset is None:
             self.v = 0
@@ -62,11 +593,55 @@ class BaseNode(nn.Module):
             self.monitor = {'v': [], 's': []}
         else:
             self.monitor = False
+        self.fast_inference = True  # 不需要计算梯度时，是否使用inference_spiking
+        self.bool_spike = False  # inference_spiking是否输出bool类型的脉冲
+        self.v_buffer = None  # reset()之前的电压tensor，在输入的形状和设备不变时被重新使用
+        # functional.reset_net(batched=True)设置的、等待一起置0的v_buffer的列表，被多个神经元共享。为None时v_buffer在重新使用时填充
+        self.v_buffer_group = None
 
     def extra_repr(self):
         return f'v_threshold={self.v_threshold}, v_reset={self.v_reset}, detach_reset={self.detach_reset}'
 
-    def set_monitor(self, monitor_state=True):
+    def set_neuron_param(self, name: str, value):
+        '''
+        * :ref:`API in English <BaseNode.set_neuron_param-en>`
+
+        .. _BaseNode.set_neuron_param-cn:
+
+        :param name: 参数的名字，例如 ``'v_threshold'``
+        :type name: str
+        :param value: 参数的值
+        :type value: float or torch.Tensor or None
+        :return: None
+
+        设置神经元的超参数。若 ``value`` 是tensor，则被注册为buffer，从而随模块一起移动到其他设备，并被保存在 ``state_dict`` 中。
+
+        * :ref:`中文API <BaseNode.set_neuron_param-cn>`
+
+        .. _BaseNode.set_neuron_param-en:
+
+        :param name: the name of the param, e.g., ``'v_threshold'``
+        :type name: str
+        :param value: the value of the param
+        :type value: float or torch.Tensor or None
+        :return: None
+
+        Set a hyper-parameter of neurons. If ``value`` is a tensor, it will be registered as a buffer, which will be moved
+        to other devices with the module and saved in ``state_dict``.
+        '''
+        if isinstance(value, torch.Tensor) and not isinstance(value, nn.Parameter):
+            if name in self._buffers:
+                self._buffers[name] = value
+            else:
+                if hasattr(self, name):
+                    delattr(self, name)
+                self.register_buffer(name, value)
+        else:
+            if name in self._buffers:
+                del self._buffers[name]
+            setattr(self, name, value)
+
+    def set_monitor(self, monitor_state=True, capacity=None, interval=1, index=None, root=None, v_dtype=None):
         '''
         * :ref:`API in English <BaseNode.set_monitor-en>`
 
@@ -74,6 +649,19 @@ class BaseNode(nn.Module):
 
         :param monitor_state: ``True`` 或 ``False``，表示开启或关闭monitor
 
+        :param capacity: 若为 ``None``，则使用列表保存 ``numpy`` 数组的监视器；否则使用容量为 ``capacity`` 的
+            :ref:`monitor.RingBufferMonitor <RingBufferMonitor.__init__-cn>`，每一步记录充电后（重置前）的电压 ``v``
+            和输出脉冲 ``s``
+
+        :param interval: 参见 :ref:`monitor.RingBufferMonitor <RingBufferMonitor.__init__-cn>`，只在 ``capacity`` 或 ``root`` 不为 ``None`` 时生效
+
+        :param index: 参见 :ref:`monitor.RingBufferMonitor <RingBufferMonitor.__init__-cn>`，只在 ``capacity`` 或 ``root`` 不为 ``None`` 时生效
+
+        :param root: 若不为 ``None``，则使用将记录写入 ``root`` 文件夹的 :ref:`monitor.MemmapMonitor <MemmapMonitor.__init__-cn>`，
+            适用于仿真时长很大的情况
+
+        :param v_dtype: 参见 :ref:`monitor.MemmapMonitor <MemmapMonitor.__init__-cn>`，只在 ``root`` 不为 ``None`` 时生效
+
         :return: None
 
         设置开启或关闭monitor。
@@ -84,12 +672,33 @@ class BaseNode(nn.Module):
 
         :param monitor_state: ``True`` or ``False``, which indicates turn on or turn off the monitor
 
+        :param capacity: if ``None``, the monitor saving ``numpy`` arrays in lists is used; otherwise, a
+            :ref:`monitor.RingBufferMonitor <RingBufferMonitor.__init__-en>` with ``capacity`` is used, which records the
+            voltage ``v`` after charging (before reset) and the output spikes ``s`` at every step
+
+        :param interval: see :ref:`monitor.RingBufferMonitor <RingBufferMonitor.__init__-en>`. It only takes effect when
+            ``capacity`` or ``root`` is not ``None``
+
+        :param index: see :ref:`monitor.RingBufferMonitor <RingBufferMonitor.__init__-en>`. It only takes effect when
+            ``capacity`` or ``root`` is not ``None``
+
+        :param root: if not ``None``, a :ref:`monitor.MemmapMonitor <MemmapMonitor.__init__-en>` writing records into the
+            directory ``root`` is used, which suits simulations with a long duration
+
+        :param v_dtype: see :ref:`monitor.MemmapMonitor <MemmapMonitor.__init__-en>`. It only takes effect when ``root``
+            is not ``None``
+
         :return: None
 
         Turn on or turn off the monitor.
         '''
         if monitor_state:
-            self.monitor = {'v': [], 's': []}
+            if root is not None:
+                self.monitor = monitor.MemmapMonitor(root, interval=interval, index=index, v_dtype=v_dtype)
+            elif capacity is not None:
+                self.monitor = monitor.RingBufferMonitor(capacity, interval, index)
+            else:
+                self.monitor = {'v': [], 's': []}
         else:
             self.monitor = False
 
@@ -112,39 +721,238 @@ class BaseNode(nn.Module):
         Calculate out spikes of neurons and update neurons' voltage by their current voltage, threshold voltage and reset voltage.
 
         '''
-        
+        if self.use_inference_spiking():
+            return self.inference_spiking()
+
         spike = self.surrogate_function(self.v - self.v_threshold)
         if self.monitor:
-            if self.monitor['v'].__len__() == 0:
-                # 补充在0时刻的电压
-                if self.v_reset is None:
-                    self.monitor['v'].append(self.v.data.cpu().numpy().copy() * 0)
-                else:
-                    self.monitor['v'].append(self.v.data.cpu().numpy().copy() * self.v_reset)
-
-            self.monitor['v'].append(self.v.data.cpu().numpy().copy())
-            self.monitor['s'].append(spike.data.cpu().numpy().copy())
+            if isinstance(self.monitor, dict):
+                if self.monitor['v'].__len__() == 0:
+                    # 补充在0时刻的电压
+                    if self.v_reset is None:
+                        self.monitor['v'].append(self.v.data.cpu().numpy().copy() * 0)
+                    else:
+                        self.monitor['v'].append(self.v.data.cpu().numpy().copy() * self.v_reset)
+
+                self.monitor['v'].append(self.v.data.cpu().numpy().copy())
+                self.monitor['s'].append(spike.data.cpu().numpy().copy())
+            else:
+                self.monitor.record('v', self.v)
+                self.monitor.record('s', spike)
 
         if self.training and self.detach_reset:
             spike_d = spike.detach()
         else:
             spike_d = spike
-            
+
+        self.neuronal_reset(spike_d)
+
+        if isinstance(self.monitor, dict):
+            self.monitor['v'].append(self.v.data.cpu().numpy().copy())
+
+        return spike
+
+    def use_inference_spiking(self):
+        '''
+        :return: 是否可以使用 :ref:`inference_spiking <BaseNode.inference_spiking-cn>`，即 ``self.fast_inference`` 为 ``True``，
+            不需要计算梯度，没有开启监视器，且电压 ``self.v`` 是不需要梯度的tensor
+        :rtype: bool
+        '''
+        return self.fast_inference and not torch.is_grad_enabled() and not self.monitor \
+               and self.surrogate_function.spiking and isinstance(self.v, torch.Tensor) and not self.v.requires_grad
+
+    def use_inplace_charge(self, dv: torch.Tensor):
+        '''
+        :param dv: 输入到神经元的电压增量
+        :type dv: torch.Tensor
+        :return: ``neuronal_charge`` 是否可以原地修改 ``self.v``，即满足 ``use_inference_spiking()``
+            的条件，且 ``self.v`` 的形状、数据类型、设备与 ``dv`` 相同，并且不是 ``self.v_reset`` 本身
+        :rtype: bool
+        '''
+        return self.use_inference_spiking() and self.v is not self.v_reset and self.v.shape == dv.shape \
+               and self.v.dtype == dv.dtype and self.v.device == dv.device
+
+    def reuse_v(self, dv: torch.Tensor):
+        '''
+        * :ref:`API in English <BaseNode.reuse_v-en>`
+
+        .. _BaseNode.reuse_v-cn:
+
+        :param dv: 输入到神经元的电压增量
+        :type dv: torch.Tensor
+        :return: None
+
+        若 ``reset()`` 保存了重置之前的电压 ``self.v_buffer``，且它的形状、数据类型、设备与 ``dv`` 相同，则将其原地填充为 ``v_reset``
+        后作为 ``self.v``，不分配新的内存；否则仍使用标量 ``self.v``，在充电时重新分配。每次前向传播开始时调用。
+
+        * :ref:`中文API <BaseNode.reuse_v-cn>`
+
+        .. _BaseNode.reuse_v-en:
+
+        :param dv: increment of voltage inputted to neurons
+        :type dv: torch.Tensor
+        :return: None
+
+        If ``reset()`` has saved the voltage before reset as ``self.v_buffer`` and its shape, dtype and device are the
+        same as ``dv``, it will be filled with ``v_reset`` in-place and used as ``self.v`` without allocating new memory.
+        Otherwise the scalar ``self.v`` is kept and the voltage is reallocated by charging. It is called at the beginning
+        of every forward.
+        '''
+        if self.v_buffer is not None:
+            if not isinstance(self.v, torch.Tensor) or self.v is self.v_reset:
+                if self.v_buffer_group is not None:
+                    # 这一组神经元中第一个前向传播的神经元将整组v_buffer一起置0
+                    if self.v_buffer_group.__len__() > 0:
+                        accelerating.zero_buffers(self.v_buffer_group)
+                        self.v_buffer_group.clear()
+                    fill_value = None
+                elif self.v_reset is None:
+                    fill_value = 0.
+                else:
+                    fill_value = self.v_reset
+                v = accelerating.reuse_state(self.v_buffer, dv.shape, dv.device, dv.dtype, fill_value)
+                if v is not None:
+                    self.v = v
+            self.v_buffer = None
+            self.v_buffer_group = None
+
+    def inference_spiking(self):
+        '''
+        * :ref:`API in English <BaseNode.inference_spiking-en>`
+
+        .. _BaseNode.inference_spiking-cn:
+
+        :return: 神经元的输出脉冲。若 ``self.bool_spike`` 为 ``True``，则为 ``bool`` 类型，否则与 ``self.v`` 的数据类型相同
+
+        不需要计算梯度时（例如在 ``torch.no_grad()`` 下进行推理）使用的放电和重置过程。与 ``spiking()`` 相比，不调用替代函数和
+        ``accelerating`` 中的 ``autograd.Function``，而是直接用 ``self.v >= self.v_threshold`` 计算脉冲，并用 ``masked_fill_``
+        （hard方式）或 ``sub_`` （soft方式）原地重置电压。除了充电得到的电压外，每一步不会再分配新的tensor。
+        IF、LIF、PLIF、RIF神经元此时的充电过程也是原地进行的（见 ``use_inplace_charge``），因此电压在每一步都使用同一块内存。
+
+        在 ``self.fast_inference`` 为 ``True``，``torch.is_grad_enabled()`` 为 ``False``，且没有开启监视器时，``spiking()`` 会自动
+        调用此函数。设置 ``self.fast_inference = False`` 可以禁用。
+
+        * :ref:`中文API <BaseNode.inference_spiking-cn>`
+
+        .. _BaseNode.inference_spiking-en:
+
+        :return: out spikes of neurons. If ``self.bool_spike`` is ``True``, the dtype is ``bool``; otherwise, it is the
+            same as that of ``self.v``
+
+        The fire and reset processes used when gradients are not required, e.g., inference under ``torch.no_grad()``.
+        Compared with ``spiking()``, the surrogate function and the ``autograd.Function`` in ``accelerating`` are not
+        called. Instead, spikes are computed by ``self.v >= self.v_threshold`` directly, and the voltage is reset in-place
+        by ``masked_fill_`` (hard reset) or ``sub_`` (soft reset). No tensor is allocated at every step except the charged
+        voltage.
+        The IF, LIF, PLIF and RIF neurons also charge in-place in this case (see ``use_inplace_charge``), so the voltage
+        uses the same memory at every step.
+
+        ``spiking()`` calls this function automatically when ``self.fast_inference`` is ``True``,
+        ``torch.is_grad_enabled()`` is ``False`` and the monitor is off. Set ``self.fast_inference = False`` to disable it.
+        '''
+        spike = self.v >= self.v_threshold
         if self.v_reset is None:
-            if self.surrogate_function.spiking:
-                self.v = accelerating.soft_voltage_transform(self.v, spike_d, self.v_threshold)
+            if isinstance(self.v_threshold, torch.Tensor):
+                self.v.sub_(spike.to(self.v) * self.v_threshold)
             else:
-                self.v = self.v - spike_d * self.v_threshold
+                self.v.sub_(spike.to(self.v), alpha=self.v_threshold)
         else:
-            if self.surrogate_function.spiking:
-                self.v = accelerating.hard_voltage_transform(self.v, spike_d, self.v_reset)
+            if isinstance(self.v_reset, torch.Tensor):
+                self.v = torch.where(spike, self.v_reset.to(self.v), self.v)
             else:
-                self.v = self.v * (1 - spike_d) + self.v_reset * spike_d
+                self.v.masked_fill_(spike, self.v_reset)
+        if self.bool_spike:
+            return spike
+        else:
+            return spike.to(self.v)
 
-        if self.monitor:
-            self.monitor['v'].append(self.v.data.cpu().numpy().copy())
+    def neuronal_reset(self, spike: torch.Tensor):
+        '''
+        * :ref:`API in English <BaseNode.neuronal_reset-en>`
 
-        return spike
+        .. _BaseNode.neuronal_reset-cn:
+
+        :param spike: 神经元释放的脉冲
+        :type spike: torch.Tensor
+        :return: None
+
+        根据释放的脉冲重置神经元的电压。``v_reset`` 为 ``None`` 时采用soft方式，否则采用hard方式。
+
+        * :ref:`中文API <BaseNode.neuronal_reset-cn>`
+
+        .. _BaseNode.neuronal_reset-en:
+
+        :param spike: spikes fired by neurons
+        :type spike: torch.Tensor
+        :return: None
+
+        Reset the voltage of neurons according to fired spikes. The soft reset is used when ``v_reset`` is ``None``,
+        otherwise the hard reset is used.
+        '''
+        if self.v_reset is None:
+            if self.surrogate_function.spiking and not isinstance(self.v_threshold, torch.Tensor):
+                self.v = accelerating.soft_voltage_transform(self.v, spike, self.v_threshold)
+            else:
+                self.v = reset_voltage(self.v, spike, self.v_threshold, self.v_reset)
+        else:
+            if self.surrogate_function.spiking and not isinstance(self.v_reset, torch.Tensor):
+                self.v = accelerating.hard_voltage_transform(self.v, spike, self.v_reset)
+            else:
+                self.v = reset_voltage(self.v, spike, self.v_threshold, self.v_reset)
+
+    def neuronal_charge(self, dv: torch.Tensor):
+        '''
+        * :ref:`API in English <BaseNode.neuronal_charge-en>`
+
+        .. _BaseNode.neuronal_charge-cn:
+
+        :param dv: 输入到神经元的电压增量
+
+        :return: None
+
+        根据输入的电压增量，更新神经元的电压 ``self.v``，即神经元的充电过程。子类需要实现这一函数。
+
+        * :ref:`中文API <BaseNode.neuronal_charge-cn>`
+
+        .. _BaseNode.neuronal_charge-en:
+
+        :param dv: increment of voltage inputted to neurons
+
+        :return: None
+
+        Update the voltage ``self.v`` of neurons by the input increment, which is the charging process of neurons.
+        Subclass should implement this function.
+        '''
+        raise NotImplementedError
+
+    def neuronal_decay(self, steps: int):
+        '''
+        * :ref:`API in English <BaseNode.neuronal_decay-en>`
+
+        .. _BaseNode.neuronal_decay-cn:
+
+        :param steps: 输入为0的时刻数
+        :type steps: int
+        :return: None
+
+        以解析的方式更新 ``steps`` 个输入为0、且没有神经元放电的时刻后的电压 ``self.v``，等价于调用 ``steps`` 次
+        ``neuronal_charge(0)``。被 :ref:`layer.ZeroSkip <ZeroSkip.__init__-cn>` 用于跳过输入全为0的时刻。不支持的子类会抛出
+        ``NotImplementedError``。
+
+        * :ref:`中文API <BaseNode.neuronal_decay-cn>`
+
+        .. _BaseNode.neuronal_decay-en:
+
+        :param steps: the number of time-steps with zero input
+        :type steps: int
+        :return: None
+
+        Update the voltage ``self.v`` after ``steps`` time-steps with zero input and no spike in closed form, which is
+        equivalent to calling ``neuronal_charge(0)`` for ``steps`` times. It is used by
+        :ref:`layer.ZeroSkip <ZeroSkip.__init__-en>` to skip time-steps whose inputs are all zero. Subclasses that do not
+        support it raise ``NotImplementedError``.
+        '''
+        raise NotImplementedError
 
     def forward(self, dv: torch.Tensor):
         '''
@@ -157,7 +965,7 @@ class BaseNode(nn.Module):
 
         :return: 神经元的输出脉冲
 
-        子类需要实现这一函数。
+        单步前向传播，先调用 ``neuronal_charge(dv)`` 充电，再调用 ``spiking()`` 放电和重置。
 
         * :ref:`中文API <BaseNode.forward-cn>`
 
@@ -167,10 +975,106 @@ class BaseNode(nn.Module):
 
         :return: out spikes of neurons
 
-        Subclass should implement this function.
+        Single-step forward, which calls ``neuronal_charge(dv)`` to charge and then ``spiking()`` to fire and reset.
 
         '''
-        raise NotImplementedError
+        self.reuse_v(dv)
+        self.neuronal_charge(dv)
+        return self.spiking()
+
+    def multi_step_recompute_forward(self, dv_seq: torch.Tensor, tau=None):
+        '''
+        * :ref:`API in English <BaseNode.multi_step_recompute_forward-en>`
+
+        .. _BaseNode.multi_step_recompute_forward-cn:
+
+        :param dv_seq: ``shape = [T, *]``，``T`` 个时刻输入到神经元的电压增量
+        :type dv_seq: torch.Tensor
+        :param tau: LIF神经元的膜电位时间常数。为 ``None`` 时表示IF神经元的充电过程 :math:`H_t = V_{t-1} + X_t`
+        :type tau: float or None
+        :return: ``shape = [T, *]``，``T`` 个时刻神经元的输出脉冲
+        :rtype: torch.Tensor
+
+        以节省内存的方式运行多步前向传播。前向传播时只保存输入、初始电压和 ``bool`` 类型的脉冲，反向传播时根据保存的脉冲重新计算每个
+        时刻的电压，而不是在计算图中保存所有时刻的中间变量。仅支持 ``surrogate_function.spiking == True``。
+
+        * :ref:`中文API <BaseNode.multi_step_recompute_forward-cn>`
+
+        .. _BaseNode.multi_step_recompute_forward-en:
+
+        :param dv_seq: ``shape = [T, *]``, increments of voltage inputted to neurons at ``T`` time-steps
+        :type dv_seq: torch.Tensor
+        :param tau: membrane time constant of the LIF neuron. ``None`` indicates the charging process of the IF neuron
+            :math:`H_t = V_{t-1} + X_t`
+        :type tau: float or None
+        :return: ``shape = [T, *]``, out spikes of neurons at ``T`` time-steps
+        :rtype: torch.Tensor
+
+        Run the multi-step forward in a memory-efficient way. Only the input, the initial voltage and the spikes (as
+        ``bool``) are saved in forward, and the voltage at every time-step is recomputed from the saved spikes in backward,
+        rather than keeping all intermediate variables of every time-step in the computation graph. Only
+        ``surrogate_function.spiking == True`` is supported.
+        '''
+        assert self.surrogate_function.spiking
+        self.reuse_v(dv_seq[0])
+        if isinstance(self.v, torch.Tensor):
+            v_init = self.v.expand_as(dv_seq[0])
+        else:
+            v_init = torch.full_like(dv_seq[0], self.v)
+        spike_seq, self.v = multi_step_recompute_function.apply(dv_seq, v_init, tau, self.v_threshold, self.v_reset,
+                                                                self.training and self.detach_reset,
+                                                                self.surrogate_function)
+        return spike_seq
+
+    def multi_step_forward(self, dv_seq: torch.Tensor):
+        '''
+        * :ref:`API in English <BaseNode.multi_step_forward-en>`
+
+        .. _BaseNode.multi_step_forward-cn:
+
+        :param dv_seq: ``shape = [T, *]``，``T`` 个时刻输入到神经元的电压增量
+        :type dv_seq: torch.Tensor
+        :return: ``shape = [T, *]``，``T`` 个时刻神经元的输出脉冲
+        :rtype: torch.Tensor
+
+        在一次调用中，按时间顺序运行 ``T`` 步的充电、放电、重置过程。与在外部调用 ``T`` 次 ``forward`` 相比，省去了每一步的
+        ``nn.Module.__call__`` 开销和监视器的检查。若开启了监视器，则逐步调用 ``spiking()`` 以保持监视器的行为不变。
+
+        * :ref:`中文API <BaseNode.multi_step_forward-cn>`
+
+        .. _BaseNode.multi_step_forward-en:
+
+        :param dv_seq: ``shape = [T, *]``, increments of voltage inputted to neurons at ``T`` time-steps
+        :type dv_seq: torch.Tensor
+        :return: ``shape = [T, *]``, out spikes of neurons at ``T`` time-steps
+        :rtype: torch.Tensor
+
+        Run the charge, fire and reset processes for ``T`` steps in one call. Compared with calling ``forward`` ``T``
+        times outside, the ``nn.Module.__call__`` overhead and the monitor checks of every step are removed. If the monitor
+        is on, ``spiking()`` will be called at every step to keep the behavior of the monitor.
+        '''
+        assert dv_seq.dim() > 1, 'dv_seq.shape should be [T, *]'
+        self.reuse_v(dv_seq[0])
+        spike_seq = []
+        if self.monitor:
+            for t in range(dv_seq.shape[0]):
+                self.neuronal_charge(dv_seq[t])
+                spike_seq.append(self.spiking())
+            return torch.stack(spike_seq)
+
+        detach_reset = self.training and self.detach_reset
+        for t in range(dv_seq.shape[0]):
+            self.neuronal_charge(dv_seq[t])
+            if self.use_inference_spiking():
+                spike_seq.append(self.inference_spiking())
+                continue
+            spike = self.surrogate_function(self.v - self.v_threshold)
+            if detach_reset:
+                self.neuronal_reset(spike.detach())
+            else:
+                self.neuronal_reset(spike)
+            spike_seq.append(spike)
+        return torch.stack(spike_seq)
 
     def reset(self):
         '''
@@ -183,6 +1087,11 @@ class BaseNode(nn.Module):
         重置神经元为初始状态，也就是将电压设置为 ``v_reset``。
         如果子类的神经元还含有其他状态变量，需要在此函数中将这些状态变量全部重置。
 
+        若重置前的电压是不需要梯度的tensor，则会被保存为 ``self.v_buffer``，在下一次前向传播时，若输入的形状和设备不变，则被原地填充
+        为 ``v_reset`` 并重新使用，不会分配新的内存。因此，在不需要梯度时从 ``self.v`` 读取的tensor，在下一次前向传播时会被覆盖；
+        如果需要保留，应先调用 ``clone()``。使用 :ref:`functional.reset_net(batched=True) <reset_net-cn>` 时，覆盖发生在网络的下一次
+        前向传播中第一个神经元运行时，而不是重置时。
+
         * :ref:`中文API <BaseNode.reset-cn>`
 
         .. _BaseNode.reset-en:
@@ -191,13 +1100,27 @@ class BaseNode(nn.Module):
 
         Reset neurons to initial states, which means that set voltage to ``v_reset``.
         Note that if the subclass has other stateful variables, these variables should be reset by this function.
+
+        .. admonition:: Note
+            :class: note
+
+            If the voltage before reset is a tensor that does not require grad, it will be saved as ``self.v_buffer``.
+            At the next forward, if the shape and the device of the input do not change, it will be filled with
+            ``v_reset`` in-place and reused without allocating new memory. So the tensor read from ``self.v`` without
+            grad will be overwritten by the next forward. Call ``clone()`` to keep it. With
+            :ref:`functional.reset_net(batched=True) <reset_net-en>`, it is overwritten when the first neuron runs in
+            the next forward of the network, rather than at reset.
         '''
+        self.v_buffer = accelerating.stash_state(self.v)
+        self.v_buffer_group = None
         if self.v_reset is None:
             self.v = 0
         else:
             self.v = self.v_reset
-        if self.monitor:
+        if isinstance(self.monitor, dict):
             self.monitor = {'v': [], 's': []}
+        elif self.monitor:
+            self.monitor.reset()
 
 
 class IFNode(BaseNode):
@@ -252,9 +1175,12 @@ class IFNode(BaseNode):
         '''
         super().__init__(v_threshold, v_reset, surrogate_function, detach_reset, monitor_state)
 
-    def forward(self, dv: torch.Tensor):
-        self.v += dv
-        return self.spiking()
+    def neuronal_charge(self, dv: torch.Tensor):
+        self.v = if_charge(self.v, dv, self.use_inplace_charge(dv))
+
+    def neuronal_decay(self, steps: int):
+        # IF神经元没有泄漏，输入为0时电压不变
+        pass
 
 class LIFNode(BaseNode):
     def __init__(self, tau=100.0, v_threshold=1.0, v_reset=0.0, surrogate_function=surrogate.Sigmoid(), detach_reset=False,
@@ -264,7 +1190,8 @@ class LIFNode(BaseNode):
 
         .. _LIFNode.__init__-cn:
 
-        :param tau: 膜电位时间常数。``tau`` 对于这一层的所有神经元都是共享的
+        :param tau: 膜电位时间常数。若为 ``float``，则 ``tau`` 对于这一层的所有神经元都是共享的；也可以是能与输入广播的tensor，
+            例如 ``shape = [N, 1]`` 表示每个样本使用不同的 ``tau``
 
         :param v_threshold: 神经元的阈值电压
 
@@ -289,7 +1216,8 @@ class LIFNode(BaseNode):
 
         .. _LIFNode.__init__-en:
 
-        :param tau: membrane time constant. ``tau`` is shared by all neurons in this layer
+        :param tau: membrane time constant. If it is a ``float``, ``tau`` is shared by all neurons in this layer. It can also
+            be a tensor that broadcasts with the input, e.g., ``shape = [N, 1]`` means a different ``tau`` for every sample
 
 
         :param v_threshold: threshold voltage of neurons
@@ -313,17 +1241,20 @@ class LIFNode(BaseNode):
             \\tau_{m} \\frac{\\mathrm{d}V(t)}{\\mathrm{d}t} = -(V(t) - V_{reset}) + R_{m}I(t)
         '''
         super().__init__(v_threshold, v_reset, surrogate_function, detach_reset, monitor_state)
-        self.tau = tau
+        self.set_neuron_param('tau', tau)
 
     def extra_repr(self):
         return f'v_threshold={self.v_threshold}, v_reset={self.v_reset}, tau={self.tau}'
 
-    def forward(self, dv: torch.Tensor):
+    def neuronal_charge(self, dv: torch.Tensor):
+        self.v = lif_charge(self.v, dv, self.tau, self.v_reset, self.use_inplace_charge(dv))
+
+    def neuronal_decay(self, steps: int):
+        # H_t = V_reset + (V_{t-1} - V_reset)(1 - 1 / tau)
         if self.v_reset is None:
-            self.v += (dv - self.v) / self.tau
+            self.v = self.v * (1. - 1. / self.tau) ** steps
         else:
-            self.v += (dv - (self.v - self.v_reset)) / self.tau
-        return self.spiking()
+            self.v = self.v_reset + (self.v - self.v_reset) * (1. - 1. / self.tau) ** steps
 
 class PLIFNode(BaseNode):
     @staticmethod
@@ -366,7 +1297,8 @@ class PLIFNode(BaseNode):
 
         .. _PLIFNode.__init__-cn:
 
-        :param init_tau: 初始的 ``tau``
+        :param init_tau: 初始的 ``tau``。也可以是能与输入广播的tensor，此时 ``self.w`` 的形状与 ``init_tau`` 相同，例如
+            ``shape = [C]`` 表示每个通道有独立的可学习的 ``tau``。``clamp_function`` 需要是逐元素的函数
 
         :param clamp: 本层神经元中可学习的参数为``w``,当 ``clamp == False`` 时，``self.v`` 的更新按照 ``self.v += (dv - (self.v - self.v_reset)) * self.w``；
             当 ``clamp == True`` 时，``self.v`` 的更新按照 ``self.v += (dv - (self.v - self.v_reset)) * clamp_function(self.w)``，
@@ -413,7 +1345,9 @@ class PLIFNode(BaseNode):
 
         .. _PLIFNode.__init__-en:
 
-        :param init_tau: initial value of ``tau``
+        :param init_tau: initial value of ``tau``. It can also be a tensor that broadcasts with the input, and then
+            ``self.w`` has the same shape as ``init_tau``, e.g., ``shape = [C]`` means an independent learnable ``tau`` for
+            every channel. ``clamp_function`` should be element-wise
 
         :param clamp: the learnable parameter is ``w`. When ``clamp == False``, the update of ``self.v`` is ``self.v += (dv - (self.v - self.v_reset)) * self.w``;
             when ``clamp == True``, the update of ``self.v`` is ``self.v += (dv - (self.v - self.v_reset)) * clamp_function(self.w)``,
@@ -463,21 +1397,40 @@ class PLIFNode(BaseNode):
         self.clamp = clamp
         if self.clamp:
             self.clamp_function = clamp_function
-            init_w = inverse_clamp_function(init_tau)
-            self.w = nn.Parameter(torch.tensor([init_w], dtype=torch.float))
-            assert abs(self.tau() - init_tau) < 1e-4, print('tau:', self.tau(), 'init_tau', init_tau)
+            if isinstance(init_tau, torch.Tensor):
+                init_w = [inverse_clamp_function(tau) for tau in init_tau.flatten().tolist()]
+                self.w = nn.Parameter(torch.tensor(init_w, dtype=torch.float).view_as(init_tau))
+                assert (self.tau() - init_tau).abs().max().item() < 1e-4, print('tau:', self.tau(), 'init_tau', init_tau)
+            else:
+                init_w = inverse_clamp_function(init_tau)
+                self.w = nn.Parameter(torch.tensor([init_w], dtype=torch.float))
+                assert abs(self.tau() - init_tau) < 1e-4, print('tau:', self.tau(), 'init_tau', init_tau)
 
         else:
-            self.w = nn.Parameter(1 / torch.tensor([init_tau], dtype=torch.float))
+            if isinstance(init_tau, torch.Tensor):
+                self.w = nn.Parameter(1 / init_tau.float())
+            else:
+                self.w = nn.Parameter(1 / torch.tensor([init_tau], dtype=torch.float))
 
-    def forward(self, dv: torch.Tensor):
+    def neuronal_charge(self, dv: torch.Tensor):
         if self.clamp:
-            self.v += (dv - (self.v - self.v_reset)) * self.clamp_function(self.w)
+            self.v = plif_charge(self.v, dv, self.clamp_function(self.w), self.v_reset, self.use_inplace_charge(dv))
         else:
-            self.v += (dv - (self.v - self.v_reset)) * self.w
-        return self.spiking()
+            self.v = plif_charge(self.v, dv, self.w, self.v_reset, self.use_inplace_charge(dv))
+
+    def neuronal_decay(self, steps: int):
+        w = self.clamp_function(self.w) if self.clamp else self.w
+        if self.v_reset is None:
+            self.v = self.v * (1. - w) ** steps
+        else:
+            self.v = self.v_reset + (self.v - self.v_reset) * (1. - w) ** steps
 
     def tau(self):
+        if self.w.numel() > 1:
+            if self.clamp:
+                return 1 / self.clamp_function(self.w.data)
+            else:
+                return 1 / self.w.data
         if self.clamp:
             return 1 / self.clamp_function(self.w.data).item()
         else:
@@ -595,19 +1548,17 @@ class RIFNode(BaseNode):
 
         return f'v_threshold={self.v_threshold}, v_reset={self.v_reset}, w={self.w()}'
 
-    def forward(self, dv: torch.Tensor):
+    def neuronal_charge(self, dv: torch.Tensor):
         if self.amplitude is None:
-            self.v += (self.v - self.v_reset) * self.g + dv
+            self.v = rif_charge(self.v, dv, self.g, self.v_reset, self.use_inplace_charge(dv))
         elif isinstance(self.amplitude, float):
-            self.v += (self.v - self.v_reset) * ((self.g.sigmoid() * 2 - 1) * self.amplitude) + dv
+            self.v = rif_charge(self.v, dv, (self.g.sigmoid() * 2 - 1) * self.amplitude, self.v_reset, self.use_inplace_charge(dv))
         else:
-            self.v += (self.v - self.v_reset) * \
-                     (self.g.sigmoid() * (self.amplitude[1] - self.amplitude[0]) + self.amplitude[0]) * self.amplitude + dv
-
-
-        return self.spiking()
+            self.v = rif_charge(self.v, dv, (self.g.sigmoid() * (self.amplitude[1] - self.amplitude[0]) + self.amplitude[0]) * self.amplitude, self.v_reset, self.use_inplace_charge(dv))
 
 class AdaptThresholdNode(nn.Module):
+    state_names = ('v', 'v_threshold', 'b', 'last_spike')
+
     def __init__(self, neuron_shape, tau_m: float, tau_adp: float, v_threshold_baseline=1.0, v_threshold_range=1.8, v_reset=0.0, surrogate_function=surrogate.Erf(), monitor_state=False, dt=1.0):
         '''
         * :ref:`API in English <AdaptThresholdNode.__init__-en>`
@@ -719,48 +1670,53 @@ class AdaptThresholdNode(nn.Module):
     def extra_repr(self):
         return f'v_threshold_baseline={self.b_0}, v_threshold_range={self.beta}, v_reset={self.v_reset}'
 
-    def set_monitor(self, monitor_state=True):
+    def set_monitor(self, monitor_state=True, capacity=None, interval=1, index=None, root=None, v_dtype=None):
         if monitor_state:
-            self.monitor = {'v': [], 's': []}
+            if root is not None:
+                self.monitor = monitor.MemmapMonitor(root, interval=interval, index=index, v_dtype=v_dtype)
+            elif capacity is not None:
+                self.monitor = monitor.RingBufferMonitor(capacity, interval, index)
+            else:
+                self.monitor = {'v': [], 's': []}
         else:
             self.monitor = False
 
     def spiking(self):
         spike = self.surrogate_function(self.v - self.v_threshold)
         if self.monitor:
-            if self.monitor['v'].__len__() == 0:
-                # 补充在0时刻的电压
-                if self.v_reset is None:
-                    self.monitor['v'].append(self.v.data.cpu().numpy().copy() * 0)
-                else:
-                    self.monitor['v'].append(self.v.data.cpu().numpy().copy() * self.v_reset)
-
-            self.monitor['v'].append(self.v.data.cpu().numpy().copy())
-            self.monitor['s'].append(spike.data.cpu().numpy().copy())
+            if isinstance(self.monitor, dict):
+                if self.monitor['v'].__len__() == 0:
+                    # 补充在0时刻的电压
+                    if self.v_reset is None:
+                        self.monitor['v'].append(self.v.data.cpu().numpy().copy() * 0)
+                    else:
+                        self.monitor['v'].append(self.v.data.cpu().numpy().copy() * self.v_reset)
+
+                self.monitor['v'].append(self.v.data.cpu().numpy().copy())
+                self.monitor['s'].append(spike.data.cpu().numpy().copy())
+            else:
+                self.monitor.record('v', self.v)
+                self.monitor.record('s', spike)
 
         if self.v_reset is None:
-            if self.surrogate_function.spiking:
+            if self.surrogate_function.spiking and not isinstance(self.v_threshold, torch.Tensor):
                 self.v = accelerating.soft_voltage_transform(self.v, spike, self.v_threshold)
             else:
-                self.v = self.v - spike * self.v_threshold
+                self.v = reset_voltage(self.v, spike, self.v_threshold, self.v_reset)
         else:
-            if self.surrogate_function.spiking:
+            if self.surrogate_function.spiking and not isinstance(self.v_reset, torch.Tensor):
                 self.v = accelerating.hard_voltage_transform(self.v, spike, self.v_reset)
             else:
-                self.v = self.v * (1 - spike) + self.v_reset * spike
+                self.v = reset_voltage(self.v, spike, self.v_threshold, self.v_reset)
 
-        if self.monitor:
+        if isinstance(self.monitor, dict):
             self.monitor['v'].append(self.v.data.cpu().numpy().copy())
 
         return spike
 
     def forward(self, dv: torch.Tensor):
-        alpha = torch.exp(-self.dt / self.tau_m)
-        rho = torch.exp(-self.dt / self.tau_adp)
-
-        self.b = rho * self.b + (1 - rho) * self.last_spike
-        self.v_threshold = self.b_0 + self.beta * self.b
-        self.v = self.v * alpha + (1 - alpha) * dv
+        self.v, self.b, self.v_threshold = adapt_threshold_charge(self.v, self.b, self.last_spike, dv, self.tau_m,
+                                                                  self.tau_adp, self.b_0, self.beta, self.dt)
 
         spike = self.spiking()
 
@@ -777,5 +1733,456 @@ class AdaptThresholdNode(nn.Module):
         self.v_threshold = self.b_0
         self.b = 0
         self.last_spike = torch.rand(self.neuron_shape)
-        if self.monitor:
+        if isinstance(self.monitor, dict):
             self.monitor = {'v': [], 's': []}
+        elif self.monitor:
+            self.monitor.reset()
+
+class MultiStepIFNode(IFNode):
+    def __init__(self, v_threshold=1.0, v_reset=0.0, surrogate_function=surrogate.Sigmoid(), detach_reset=False, monitor_state=False,
+                 memory_efficient=False):
+        '''
+        * :ref:`API in English <MultiStepIFNode.__init__-en>`
+
+        .. _MultiStepIFNode.__init__-cn:
+
+        :param memory_efficient: 训练时是否使用节省内存的BPTT。若为 ``True``，前向传播时只保存输入和 ``bool`` 类型的脉冲，反向传播时
+            重新计算电压，参见 :ref:`BaseNode.multi_step_recompute_forward <BaseNode.multi_step_recompute_forward-cn>`
+
+        其他参数的含义与 :ref:`IFNode <IFNode.__init__-cn>` 相同。
+
+        多步版本的 :ref:`IFNode <IFNode.__init__-cn>`。输入 ``shape = [T, *]`` 的电压增量序列，在一次调用中运行 ``T`` 步，
+        输出 ``shape = [T, *]`` 的脉冲序列。
+
+        * :ref:`中文API <MultiStepIFNode.__init__-cn>`
+
+        .. _MultiStepIFNode.__init__-en:
+
+        :param memory_efficient: whether to use the memory-efficient BPTT during training. If ``True``, only the input and
+            the spikes (as ``bool``) are saved in forward, and the voltage is recomputed in backward. Refer to
+            :ref:`BaseNode.multi_step_recompute_forward <BaseNode.multi_step_recompute_forward-en>`
+
+        Other params are the same as those of :ref:`IFNode <IFNode.__init__-en>`.
+
+        The multi-step version of :ref:`IFNode <IFNode.__init__-en>`. It takes the increments of voltage with
+        ``shape = [T, *]`` as input, runs ``T`` steps in one call and outputs spikes with ``shape = [T, *]``.
+        '''
+        super().__init__(v_threshold, v_reset, surrogate_function, detach_reset, monitor_state)
+        self.memory_efficient = memory_efficient
+
+    def extra_repr(self):
+        return super().extra_repr() + f', memory_efficient={self.memory_efficient}'
+
+    def forward(self, dv_seq: torch.Tensor):
+        if self.memory_efficient and self.training and self.surrogate_function.spiking and not self.monitor:
+            return self.multi_step_recompute_forward(dv_seq)
+        return self.multi_step_forward(dv_seq)
+
+class MultiStepLIFNode(LIFNode):
+    def __init__(self, tau=100.0, v_threshold=1.0, v_reset=0.0, surrogate_function=surrogate.Sigmoid(), detach_reset=False,
+                 monitor_state=False, memory_efficient=False):
+        '''
+        * :ref:`API in English <MultiStepLIFNode.__init__-en>`
+
+        .. _MultiStepLIFNode.__init__-cn:
+
+        :param memory_efficient: 训练时是否使用节省内存的BPTT。若为 ``True``，前向传播时只保存输入和 ``bool`` 类型的脉冲，反向传播时
+            重新计算电压，参见 :ref:`BaseNode.multi_step_recompute_forward <BaseNode.multi_step_recompute_forward-cn>`
+
+        其他参数的含义与 :ref:`LIFNode <LIFNode.__init__-cn>` 相同。
+
+        多步版本的 :ref:`LIFNode <LIFNode.__init__-cn>`。输入 ``shape = [T, *]`` 的电压增量序列，在一次调用中运行 ``T`` 步，
+        输出 ``shape = [T, *]`` 的脉冲序列。
+
+        * :ref:`中文API <MultiStepLIFNode.__init__-cn>`
+
+        .. _MultiStepLIFNode.__init__-en:
+
+        :param memory_efficient: whether to use the memory-efficient BPTT during training. If ``True``, only the input and
+            the spikes (as ``bool``) are saved in forward, and the voltage is recomputed in backward. Refer to
+            :ref:`BaseNode.multi_step_recompute_forward <BaseNode.multi_step_recompute_forward-en>`
+
+        Other params are the same as those of :ref:`LIFNode <LIFNode.__init__-en>`.
+
+        The multi-step version of :ref:`LIFNode <LIFNode.__init__-en>`. It takes the increments of voltage with
+        ``shape = [T, *]`` as input, runs ``T`` steps in one call and outputs spikes with ``shape = [T, *]``.
+        '''
+        super().__init__(tau, v_threshold, v_reset, surrogate_function, detach_reset, monitor_state)
+        self.memory_efficient = memory_efficient
+
+    def extra_repr(self):
+        return super().extra_repr() + f', memory_efficient={self.memory_efficient}'
+
+    def forward(self, dv_seq: torch.Tensor):
+        if self.memory_efficient and self.training and self.surrogate_function.spiking and not self.monitor:
+            return self.multi_step_recompute_forward(dv_seq, self.tau)
+        return self.multi_step_forward(dv_seq)
+
+class MultiStepPLIFNode(PLIFNode):
+    def __init__(self, init_tau=2.0, clamp=False, clamp_function=None, inverse_clamp_function=None, v_threshold=1.0, v_reset=0.0, surrogate_function=surrogate.Sigmoid(), detach_reset=False,
+                 monitor_state=False):
+        '''
+        * :ref:`API in English <MultiStepPLIFNode.__init__-en>`
+
+        .. _MultiStepPLIFNode.__init__-cn:
+
+        参数的含义与 :ref:`PLIFNode <PLIFNode.__init__-cn>` 相同。
+
+        多步版本的 :ref:`PLIFNode <PLIFNode.__init__-cn>`。输入 ``shape = [T, *]`` 的电压增量序列，在一次调用中运行 ``T`` 步，
+        输出 ``shape = [T, *]`` 的脉冲序列。
+
+        * :ref:`中文API <MultiStepPLIFNode.__init__-cn>`
+
+        .. _MultiStepPLIFNode.__init__-en:
+
+        The params are the same as those of :ref:`PLIFNode <PLIFNode.__init__-en>`.
+
+        The multi-step version of :ref:`PLIFNode <PLIFNode.__init__-en>`. It takes the increments of voltage with
+        ``shape = [T, *]`` as input, runs ``T`` steps in one call and outputs spikes with ``shape = [T, *]``.
+        '''
+        super().__init__(init_tau, clamp, clamp_function, inverse_clamp_function, v_threshold, v_reset, surrogate_function, detach_reset, monitor_state)
+
+    def forward(self, dv_seq: torch.Tensor):
+        return self.multi_step_forward(dv_seq)
+
+class ScriptableBaseNode(nn.Module):
+    __constants__ = ['v_threshold', 'v_reset', 'soft_reset', 'detach_reset', 'surrogate_name', 'alpha']
+    state_names = ('v', )
+
+    def __init__(self, v_threshold=1.0, v_reset=0.0, surrogate_function=surrogate.Sigmoid(), detach_reset=False):
+        '''
+        * :ref:`API in English <ScriptableBaseNode.__init__-en>`
+
+        .. _ScriptableBaseNode.__init__-cn:
+
+        :param v_threshold: 神经元的阈值电压
+
+        :param v_reset: 神经元的重置电压。如果不为 ``None``，当神经元释放脉冲后，电压会被重置为 ``v_reset``；
+            如果设置为 ``None``，则电压会被减去 ``v_threshold``
+
+        :param surrogate_function: 反向传播时用来计算脉冲函数梯度的替代函数。只用于读取其类名和 ``alpha``，必须是
+            :ref:`surrogate.scriptable_spiking_function <scriptable_spiking_function-cn>` 支持的替代函数，且 ``spiking == True``
+
+        :param detach_reset: 是否将reset过程的计算图分离
+
+        可以被 ``torch.jit.script`` 编译的神经元的基类。与 :ref:`BaseNode <BaseNode.__init__-cn>` 不同：
+
+        * 电压 ``self.v`` 始终是tensor，初始值和 ``reset()`` 后的值是0维的tensor，在第一步时被广播为输入的形状
+
+        * 阈值、重置电压、替代函数的参数等都是编译时的常量，并使用 :ref:`surrogate.scriptable_spiking_function <scriptable_spiking_function-cn>`
+          代替 ``autograd.Function``，因此编译后一步的充电、放电、重置过程可以被融合为一个逐元素的kernel
+
+        * 不支持监视器
+
+        示例代码：
+
+        .. code-block:: python
+
+            >>> lif = torch.jit.script(neuron.ScriptableLIFNode(tau=2.0))
+            >>> spike_seq = lif.multi_step_forward(torch.rand([8, 4, 32]))
+            >>> functional.reset_net(lif)
+
+        * :ref:`中文API <ScriptableBaseNode.__init__-cn>`
+
+        .. _ScriptableBaseNode.__init__-en:
+
+        :param v_threshold: threshold voltage of neurons
+
+        :param v_reset: reset voltage of neurons. If not ``None``, voltage of neurons that just fired spikes will be set to
+            ``v_reset``. If ``None``, voltage of neurons that just fired spikes will subtract ``v_threshold``
+
+        :param surrogate_function: surrogate function for replacing gradient of spiking functions during back-propagation.
+            Only its class name and ``alpha`` are used. It must be supported by
+            :ref:`surrogate.scriptable_spiking_function <scriptable_spiking_function-en>` and ``spiking == True``
+
+        :param detach_reset: whether detach the computation graph of reset
+
+        The base class of neurons that can be compiled by ``torch.jit.script``. Different from
+        :ref:`BaseNode <BaseNode.__init__-en>`:
+
+        * the voltage ``self.v`` is always a tensor. The initial value and the value after ``reset()`` is a 0-dim tensor,
+          which is broadcast to the shape of the input at the first step
+
+        * the threshold, the reset voltage and the parameter of the surrogate function are constants when compiling, and
+          :ref:`surrogate.scriptable_spiking_function <scriptable_spiking_function-en>` is used instead of
+          ``autograd.Function``. Thus, the charge, fire and reset processes of one step can be fused into one element-wise
+          kernel after compiling
+
+        * the monitor is not supported
+
+        Examples:
+
+        .. code-block:: python
+
+            >>> lif = torch.jit.script(neuron.ScriptableLIFNode(tau=2.0))
+            >>> spike_seq = lif.multi_step_forward(torch.rand([8, 4, 32]))
+            >>> functional.reset_net(lif)
+        '''
+        super().__init__()
+        assert isinstance(surrogate_function, surrogate.SurrogateFunctionBase) and surrogate_function.spiking
+        self.v_threshold = float(v_threshold)
+        self.soft_reset = v_reset is None
+        self.v_reset = 0.0 if v_reset is None else float(v_reset)
+        self.detach_reset = detach_reset
+        self.surrogate_name = surrogate_function.__class__.__name__
+        self.alpha = surrogate_function.alpha.item()
+        self.v = torch.full([], self.v_reset)
+
+    def extra_repr(self):
+        return f'v_threshold={self.v_threshold}, v_reset={None if self.soft_reset else self.v_reset}, detach_reset={self.detach_reset}, surrogate={self.surrogate_name}(alpha={self.alpha})'
+
+    def neuronal_charge(self, dv: torch.Tensor):
+        '''
+        :param dv: 输入到神经元的电压增量
+        :type dv: torch.Tensor
+        :return: 充电后的电压
+        :rtype: torch.Tensor
+
+        根据输入的电压增量计算充电后的电压。子类需要实现这一函数，且不能原地修改 ``self.v``。
+        '''
+        raise NotImplementedError
+
+    def forward(self, dv: torch.Tensor):
+        h = self.neuronal_charge(dv)
+        spike = surrogate.scriptable_spiking_function(h - self.v_threshold, self.surrogate_name, self.alpha)
+        if self.detach_reset and self.training:
+            spike_d = spike.detach()
+        else:
+            spike_d = spike
+        if self.soft_reset:
+            self.v = h - spike_d * self.v_threshold
+        else:
+            self.v = h * (1. - spike_d) + self.v_reset * spike_d
+        return spike
+
+    @torch.jit.export
+    def multi_step_forward(self, dv_seq: torch.Tensor):
+        '''
+        :param dv_seq: ``shape = [T, *]``，``T`` 个时刻输入到神经元的电压增量
+        :type dv_seq: torch.Tensor
+        :return: ``shape = [T, *]``，``T`` 个时刻神经元的输出脉冲
+        :rtype: torch.Tensor
+        '''
+        spike_seq = []
+        for t in range(dv_seq.shape[0]):
+            spike_seq.append(self.forward(dv_seq[t]))
+        return torch.stack(spike_seq)
+
+    @torch.jit.export
+    def reset(self):
+        self.v = torch.full([], self.v_reset)
+
+
+class ScriptableIFNode(ScriptableBaseNode):
+    def __init__(self, v_threshold=1.0, v_reset=0.0, surrogate_function=surrogate.Sigmoid(), detach_reset=False):
+        '''
+        * :ref:`API in English <ScriptableIFNode.__init__-en>`
+
+        .. _ScriptableIFNode.__init__-cn:
+
+        参数的含义与 :ref:`ScriptableBaseNode <ScriptableBaseNode.__init__-cn>` 相同。
+
+        可以被 ``torch.jit.script`` 编译的 :ref:`IFNode <IFNode.__init__-cn>`。
+
+        * :ref:`中文API <ScriptableIFNode.__init__-cn>`
+
+        .. _ScriptableIFNode.__init__-en:
+
+        The params are the same as those of :ref:`ScriptableBaseNode <ScriptableBaseNode.__init__-en>`.
+
+        The :ref:`IFNode <IFNode.__init__-en>` that can be compiled by ``torch.jit.script``.
+        '''
+        super().__init__(v_threshold, v_reset, surrogate_function, detach_reset)
+
+    def neuronal_charge(self, dv: torch.Tensor):
+        return self.v + dv
+
+
+class ScriptableLIFNode(ScriptableBaseNode):
+    __constants__ = ScriptableBaseNode.__constants__ + ['tau']
+
+    def __init__(self, tau=100.0, v_threshold=1.0, v_reset=0.0, surrogate_function=surrogate.Sigmoid(), detach_reset=False):
+        '''
+        * :ref:`API in English <ScriptableLIFNode.__init__-en>`
+
+        .. _ScriptableLIFNode.__init__-cn:
+
+        :param tau: 膜电位时间常数。``tau`` 对于这一层的所有神经元都是共享的
+
+        其他参数的含义与 :ref:`ScriptableBaseNode <ScriptableBaseNode.__init__-cn>` 相同。
+
+        可以被 ``torch.jit.script`` 编译的 :ref:`LIFNode <LIFNode.__init__-cn>`。
+
+        * :ref:`中文API <ScriptableLIFNode.__init__-cn>`
+
+        .. _ScriptableLIFNode.__init__-en:
+
+        :param tau: membrane time constant. ``tau`` is shared by all neurons in this layer
+
+        Other params are the same as those of :ref:`ScriptableBaseNode <ScriptableBaseNode.__init__-en>`.
+
+        The :ref:`LIFNode <LIFNode.__init__-en>` that can be compiled by ``torch.jit.script``.
+        '''
+        super().__init__(v_threshold, v_reset, surrogate_function, detach_reset)
+        self.tau = float(tau)
+
+    def extra_repr(self):
+        return super().extra_repr() + f', tau={self.tau}'
+
+    def neuronal_charge(self, dv: torch.Tensor):
+        if self.soft_reset:
+            return self.v + (dv - self.v) / self.tau
+        else:
+            return self.v + (dv - (self.v - self.v_reset)) / self.tau
+
+
+class ScriptablePLIFNode(ScriptableBaseNode):
+    __constants__ = ScriptableBaseNode.__constants__ + ['clamp']
+
+    def __init__(self, init_tau=2.0, clamp=False, v_threshold=1.0, v_reset=0.0, surrogate_function=surrogate.Sigmoid(), detach_reset=False):
+        '''
+        * :ref:`API in English <ScriptablePLIFNode.__init__-en>`
+
+        .. _ScriptablePLIFNode.__init__-cn:
+
+        :param init_tau: 初始的 ``tau``
+
+        :param clamp: 若为 ``True``，则使用 ``self.w.sigmoid()`` 作为 ``1 / tau``，``self.w`` 的初始值为
+            ``PLIFNode.inverse_sigmoid(init_tau)``；否则直接使用 ``self.w`` 作为 ``1 / tau``。与 :ref:`PLIFNode <PLIFNode.__init__-cn>`
+            不同，由于编译的需要，不支持自定义的 ``clamp_function``
+
+        其他参数的含义与 :ref:`ScriptableBaseNode <ScriptableBaseNode.__init__-cn>` 相同。
+
+        可以被 ``torch.jit.script`` 编译的 :ref:`PLIFNode <PLIFNode.__init__-cn>`。
+
+        * :ref:`中文API <ScriptablePLIFNode.__init__-cn>`
+
+        .. _ScriptablePLIFNode.__init__-en:
+
+        :param init_tau: initial value of ``tau``
+
+        :param clamp: if ``True``, ``self.w.sigmoid()`` is used as ``1 / tau``, and the initial value of ``self.w`` is
+            ``PLIFNode.inverse_sigmoid(init_tau)``. Otherwise, ``self.w`` is used as ``1 / tau`` directly. Different from
+            :ref:`PLIFNode <PLIFNode.__init__-en>`, the custom ``clamp_function`` is not supported for compiling
+
+        Other params are the same as those of :ref:`ScriptableBaseNode <ScriptableBaseNode.__init__-en>`.
+
+        The :ref:`PLIFNode <PLIFNode.__init__-en>` that can be compiled by ``torch.jit.script``.
+        '''
+        super().__init__(v_threshold, v_reset, surrogate_function, detach_reset)
+        self.clamp = clamp
+        if self.clamp:
+            self.w = nn.Parameter(torch.tensor([PLIFNode.inverse_sigmoid(init_tau)], dtype=torch.float))
+        else:
+            self.w = nn.Parameter(1 / torch.tensor([init_tau], dtype=torch.float))
+
+    def tau(self):
+        if self.clamp:
+            return 1 / self.w.data.sigmoid().item()
+        else:
+            return 1 / self.w.data.item()
+
+    def extra_repr(self):
+        return super().extra_repr() + f', tau={self.tau()}'
+
+    def neuronal_charge(self, dv: torch.Tensor):
+        if self.clamp:
+            w = self.w.sigmoid()
+        else:
+            w = self.w
+        if self.soft_reset:
+            return self.v + (dv - self.v) * w
+        else:
+            return self.v + (dv - (self.v - self.v_reset)) * w
+
+
+def check_scriptable_node(scriptable_node: ScriptableBaseNode, node: BaseNode = None, T=8, shape=(4, 32), eps=1e-5, repeats=3):
+    '''
+    * :ref:`API in English <check_scriptable_node-en>`
+
+    .. _check_scriptable_node-cn:
+
+    :param scriptable_node: 被检查的神经元
+    :type scriptable_node: ScriptableBaseNode
+    :param node: 若不为 ``None``，则还会与这个参数相同的 :ref:`BaseNode <BaseNode.__init__-cn>` 子类神经元比较
+    :type node: BaseNode
+    :param T: 仿真时长
+    :type T: int
+    :param shape: 每一步输入的形状
+    :type shape: tuple
+    :param eps: 最大误差
+    :type eps: float
+    :param repeats: 编译后的模块的运行次数。TorchScript在前几次运行时会进行分析，之后才使用融合的kernel，因此需要多次运行
+    :type repeats: int
+    :return: None
+
+    检查 ``torch.jit.script(scriptable_node)`` 与未编译的 ``scriptable_node`` （以及 ``node``）的前向传播输出的脉冲、最终的电压，
+    以及反向传播得到的输入和参数的梯度是否一致。“一致”被定义为，两者的误差不超过eps。示例代码：
+
+    .. code-block:: python
+
+        neuron.check_scriptable_node(neuron.ScriptableLIFNode(tau=2.0), neuron.LIFNode(tau=2.0))
+
+    * :ref:`中文API <check_scriptable_node-cn>`
+
+    .. _check_scriptable_node-en:
+
+    :param scriptable_node: the checked neuron
+    :type scriptable_node: ScriptableBaseNode
+    :param node: if not ``None``, it will also be compared with this neuron, which is a subclass of
+        :ref:`BaseNode <BaseNode.__init__-en>` with the same params
+    :type node: BaseNode
+    :param T: simulating steps
+    :type T: int
+    :param shape: the shape of the input at every step
+    :type shape: tuple
+    :param eps: the maximum error
+    :type eps: float
+    :param repeats: the number of runs of the compiled module. TorchScript profiles the first runs and uses fused kernels
+        after that, so it needs to run several times
+    :type repeats: int
+    :return: None
+
+    Check whether ``torch.jit.script(scriptable_node)`` and the uncompiled ``scriptable_node`` (and ``node``) produce the
+    same spikes and final voltage in forward, and the same gradients of the input and parameters in backward. "The same"
+    is defined as the error is not greater than eps. Examples:
+
+    .. code-block:: python
+
+        neuron.check_scriptable_node(neuron.ScriptableLIFNode(tau=2.0), neuron.LIFNode(tau=2.0))
+    '''
+    def run(net, x_seq, grad_spike_seq, grad_v, multi_step):
+        net.reset()
+        x_seq = x_seq.clone().requires_grad_(True)
+        if multi_step:
+            spike_seq = net.multi_step_forward(x_seq)
+        else:
+            spike_seq = torch.stack([net(x_seq[t]) for t in range(T)])
+        ((spike_seq * grad_spike_seq).sum() + (net.v * grad_v).sum()).backward()
+        grads = [x_seq.grad.clone()]
+        for p in net.parameters():
+            grads.append(p.grad.clone())
+            p.grad = None
+        return spike_seq.detach(), net.v.detach(), grads
+
+    def compare(a, b, name):
+        spike_seq_a, v_a, grads_a = a
+        spike_seq_b, v_b, grads_b = b
+        assert (spike_seq_a - spike_seq_b).abs().max().item() <= eps, f'{name}: spikes are different!'
+        assert (v_a - v_b).abs().max().item() <= eps, f'{name}: v is different!'
+        for i in range(grads_a.__len__()):
+            assert (grads_a[i] - grads_b[i]).abs().max().item() <= eps, f'{name}: grad is wrong!'
+
+    scriptable_node.train()
+    scripted_node = torch.jit.script(copy.deepcopy(scriptable_node))
+    x_seq = torch.rand([T] + list(shape)) * 2 * scriptable_node.v_threshold
+    grad_spike_seq = torch.rand_like(x_seq)
+    grad_v = torch.rand_like(x_seq[0])
+    eager = run(scriptable_node, x_seq, grad_spike_seq, grad_v, False)
+    for _ in range(repeats):
+        compare(eager, run(scripted_node, x_seq, grad_spike_seq, grad_v, False), 'scripted forward')
+        compare(eager, run(scripted_node, x_seq, grad_spike_seq, grad_v, True), 'scripted multi_step_forward')
+    if node is not None:
+        node.train()
+        compare(eager, run(node, x_seq, grad_spike_seq, grad_v, False), type(node).__name__)
+    print('scriptable node check pass')
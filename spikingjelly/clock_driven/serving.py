@@ -0,0 +1,541 @@
+import torch
+import torch.nn as nn
+import numpy as np
+import asyncio
+import collections
+import concurrent.futures
+import json
+import struct
+import time
+from spikingjelly.clock_driven import functional
+
+
+def state_to(state: dict, device):
+    '''
+    :param state: :ref:`functional.get_state <get_state-cn>` 得到的状态
+    :type state: dict
+    :param device: 目标设备
+    :type device: str or torch.device
+    :return: 所有tensor都被移动到 ``device`` 上的状态
+    :rtype: dict
+    '''
+    return {key: value.to(device) if isinstance(value, torch.Tensor) else value for key, value in state.items()}
+
+
+def state_clone(state: dict):
+    '''
+    :param state: :ref:`functional.get_state <get_state-cn>` 得到的状态
+    :type state: dict
+    :return: 所有tensor都被复制的状态
+    :rtype: dict
+
+    :ref:`functional.scatter_state <scatter_state-cn>` 得到的状态是合并后的tensor的视图，保存前需要复制，否则每个会话都会
+    持有整个合并后的tensor。
+    '''
+    return {key: value.clone() if isinstance(value, torch.Tensor) else value for key, value in state.items()}
+
+
+class SessionStore:
+    def __init__(self, capacity: int, device='cpu', host_capacity=None):
+        '''
+        * :ref:`API in English <SessionStore.__init__-en>`
+
+        .. _SessionStore.__init__-cn:
+
+        :param capacity: 最多保存在 ``device`` 上的会话数量
+        :type capacity: int
+        :param device: 网络所在的设备
+        :type device: str or torch.device
+        :param host_capacity: 最多保存在主机内存中的会话数量。为 ``None`` 时不限制。超过后，最久未使用的会话被丢弃
+        :type host_capacity: int
+
+        按最近最少使用（LRU）的顺序保存每个会话的状态。``device`` 上的会话超过 ``capacity`` 个时，最久未使用的会话的状态被转移
+        （spill）到主机内存中；再次使用时，被转移回 ``device``。
+
+        * :ref:`中文API <SessionStore.__init__-cn>`
+
+        .. _SessionStore.__init__-en:
+
+        :param capacity: the maximum number of sessions kept on ``device``
+        :type capacity: int
+        :param device: the device of the network
+        :type device: str or torch.device
+        :param host_capacity: the maximum number of sessions kept in host memory. If ``None``, there is no limit. When
+            it is exceeded, the least recently used session is dropped
+        :type host_capacity: int
+
+        Keep the states of every session in the least recently used (LRU) order. When more than ``capacity`` sessions are
+        on ``device``, the states of the least recently used session are spilled to host memory. They are moved back to
+        ``device`` when the session is used again.
+        '''
+        self.capacity = capacity
+        self.device = device
+        self.host_capacity = host_capacity
+        self.device_states = collections.OrderedDict()
+        self.host_states = collections.OrderedDict()
+        self.num_spilled = 0
+        self.num_dropped = 0
+
+    def get(self, session):
+        '''
+        :param session: 会话的标识
+        :return: 会话的状态，位于 ``device`` 上。若会话不存在，则返回 ``None``
+        :rtype: dict or None
+        '''
+        if session in self.device_states:
+            self.device_states.move_to_end(session)
+            return self.device_states[session]
+        if session in self.host_states:
+            state = state_to(self.host_states.pop(session), self.device)
+            self.put(session, state)
+            return state
+        return None
+
+    def put(self, session, state: dict):
+        '''
+        :param session: 会话的标识
+        :param state: 会话的状态，位于 ``device`` 上
+        :type state: dict
+        :return: None
+        '''
+        # 主机内存中的旧状态已经过时
+        self.host_states.pop(session, None)
+        self.device_states[session] = state
+        self.device_states.move_to_end(session)
+        while self.device_states.__len__() > self.capacity:
+            old_session, old_state = self.device_states.popitem(last=False)
+            self.host_states[old_session] = state_to(old_state, 'cpu')
+            self.host_states.move_to_end(old_session)
+            self.num_spilled += 1
+            if self.host_capacity is not None and self.host_states.__len__() > self.host_capacity:
+                self.host_states.popitem(last=False)
+                self.num_dropped += 1
+
+    def pop(self, session):
+        '''
+        :param session: 会话的标识
+        :return: None
+
+        删除会话的状态。
+        '''
+        self.device_states.pop(session, None)
+        self.host_states.pop(session, None)
+
+    def __contains__(self, session):
+        return session in self.device_states or session in self.host_states
+
+    def __len__(self):
+        return self.device_states.__len__() + self.host_states.__len__()
+
+
+async def read_message(reader: asyncio.StreamReader):
+    '''
+    :param reader: 读取数据的流
+    :type reader: asyncio.StreamReader
+    :return: ``(header, x)``，``header`` 是字典，``x`` 是 ``numpy`` 数组（若消息不含数组则为 ``None``）
+    :rtype: tuple
+
+    读取一条消息。消息的格式为：两个大端序的 ``uint32``，分别是JSON头的字节数和数组数据的字节数；然后是UTF-8编码的JSON头；最后
+    是数组的原始数据，其 ``dtype`` 和 ``shape`` 记录在JSON头中。
+    '''
+    header_size, data_size = struct.unpack('>II', await reader.readexactly(8))
+    header = json.loads((await reader.readexactly(header_size)).decode('utf-8'))
+    x = None
+    if data_size > 0 or 'shape' in header:
+        data = await reader.readexactly(data_size)
+        x = np.frombuffer(data, dtype=header['dtype']).reshape(header['shape'])
+    return header, x
+
+
+def encode_message(header: dict, x=None):
+    '''
+    :param header: JSON头
+    :type header: dict
+    :param x: 数组数据
+    :type x: numpy.ndarray or torch.Tensor or None
+    :return: 编码后的消息，格式见 ``read_message``
+    :rtype: bytes
+    '''
+    data = b''
+    if x is not None:
+        if isinstance(x, torch.Tensor):
+            x = x.detach().cpu().numpy()
+        x = np.ascontiguousarray(x)
+        header = dict(header, dtype=str(x.dtype), shape=list(x.shape))
+        data = x.tobytes()
+    header = json.dumps(header).encode('utf-8')
+    return struct.pack('>II', header.__len__(), data.__len__()) + header + data
+
+
+class MicroBatchServer:
+    def __init__(self, net: nn.Module, device='cpu', max_batch_size=64, max_delay=0.002, session_capacity=1024,
+                 host_capacity=None, multi_step=False, stats_window=10000):
+        '''
+        * :ref:`API in English <MicroBatchServer.__init__-en>`
+
+        .. _MicroBatchServer.__init__-cn:
+
+        :param net: 有状态的SNN
+        :type net: nn.Module
+        :param device: 运行网络的设备
+        :type device: str or torch.device
+        :param max_batch_size: 一次前向传播最多合并的请求数量
+        :type max_batch_size: int
+        :param max_delay: 从一批中第一个请求到达开始，最多等待其他请求的时间（秒）
+        :type max_delay: float
+        :param session_capacity: 见 :ref:`SessionStore <SessionStore.__init__-cn>` 的 ``capacity``
+        :type session_capacity: int
+        :param host_capacity: 见 :ref:`SessionStore <SessionStore.__init__-cn>` 的 ``host_capacity``
+        :type host_capacity: int
+        :param multi_step: 若为 ``True``，则 ``net`` 以 ``shape=[T, N, *]`` 的输入一次运行整个分块；否则 ``net`` 是单步的，在
+            每个时刻被调用一次
+        :type multi_step: bool
+        :param stats_window: 统计延迟时使用的最近的请求数量
+        :type stats_window: int
+
+        有状态的SNN的流式推理服务。每个请求包含一个会话（例如一路事件相机的数据流）的一个输入分块 ``shape=[T, n, *]``，服务端保存
+        每个会话的神经元状态，使得同一会话的连续分块如同在一次不间断的仿真中运行。
+
+        在 ``max_delay`` 内到达的、属于不同会话的请求被合并为一批：各会话的状态由 :ref:`functional.gather_state <gather_state-cn>`
+        合并，输入沿第1维拼接，只运行一次前向传播，然后由 :ref:`functional.scatter_state <scatter_state-cn>` 将状态拆分回各个会话。
+        同一会话在一批中的后续请求会推迟到下一批，以保证时间顺序。前向传播在单独的线程中运行，不会阻塞事件循环。
+
+        可以在同一个进程中通过 ``await server.start()`` 和 ``await server.submit(session, x)`` 使用，也可以通过
+        ``await server.serve(host, port)`` 或 ``await server.serve(path=...)`` 以TCP或Unix socket提供服务，客户端见
+        :ref:`MicroBatchClient <MicroBatchClient.__init__-cn>`。``stats()`` 返回延迟的p50/p99和吞吐量。
+
+        * :ref:`中文API <MicroBatchServer.__init__-cn>`
+
+        .. _MicroBatchServer.__init__-en:
+
+        :param net: a stateful SNN
+        :type net: nn.Module
+        :param device: the device to run the network
+        :type device: str or torch.device
+        :param max_batch_size: the maximum number of requests merged in one forward
+        :type max_batch_size: int
+        :param max_delay: the maximum time (in seconds) to wait for other requests since the first request of a batch
+            arrives
+        :type max_delay: float
+        :param session_capacity: see ``capacity`` of :ref:`SessionStore <SessionStore.__init__-en>`
+        :type session_capacity: int
+        :param host_capacity: see ``host_capacity`` of :ref:`SessionStore <SessionStore.__init__-en>`
+        :type host_capacity: int
+        :param multi_step: if ``True``, ``net`` runs a whole chunk at once with the input of ``shape=[T, N, *]``;
+            otherwise, ``net`` is a single-step network and is called once at every time-step
+        :type multi_step: bool
+        :param stats_window: the number of the latest requests used for latency statistics
+        :type stats_window: int
+
+        A streaming inference service for stateful SNNs. Every request contains an input chunk ``shape=[T, n, *]`` of one
+        session (e.g., a stream of an event camera), and the server keeps the states of neurons of every session, so that
+        the successive chunks of a session run as if in one uninterrupted simulation.
+
+        Requests of different sessions that arrive within ``max_delay`` are merged into one batch: the states of the
+        sessions are gathered by :ref:`functional.gather_state <gather_state-en>`, the inputs are concatenated along
+        dimension 1, only one forward is run, and then the states are split back to the sessions by
+        :ref:`functional.scatter_state <scatter_state-en>`. Later requests of the same session in one batch are deferred
+        to the next batch to keep the time order. The forward runs in a separate thread and does not block the event loop.
+
+        It can be used in the same process by ``await server.start()`` and ``await server.submit(session, x)``, or serve
+        over TCP or a Unix socket by ``await server.serve(host, port)`` or ``await server.serve(path=...)``. See
+        :ref:`MicroBatchClient <MicroBatchClient.__init__-en>` for the client. ``stats()`` returns p50/p99 of latency and
+        throughput.
+        '''
+        self.net = net.to(device).eval()
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.multi_step = multi_step
+        functional.reset_net(self.net)
+        self.init_state = functional.get_state(self.net)
+        self.sessions = SessionStore(session_capacity, device, host_capacity)
+        self.executor = concurrent.futures.ThreadPoolExecutor(1)
+        self.latencies = collections.deque(maxlen=stats_window)
+        self.queue = None
+        self.batch_task = None
+        self.start_time = None
+        self.num_requests = 0
+        self.num_samples = 0
+        self.num_batches = 0
+
+    async def start(self):
+        '''
+        :return: None
+
+        启动合并请求的任务。``serve()`` 会自动调用此函数。
+        '''
+        if self.batch_task is None:
+            self.queue = asyncio.Queue()
+            self.start_time = time.perf_counter()
+            self.batch_task = asyncio.get_event_loop().create_task(self.batch_loop())
+
+    async def submit(self, session, x: torch.Tensor):
+        '''
+        :param session: 会话的标识，需要可哈希
+        :param x: 这一会话的输入分块，``shape=[T, n, *]``
+        :type x: torch.Tensor
+        :return: 这一分块的输出，``shape=[T, n, *]``，位于CPU上
+        :rtype: torch.Tensor
+        '''
+        future = asyncio.get_event_loop().create_future()
+        await self.queue.put((session, x, future, time.perf_counter()))
+        return await future
+
+    async def close_session(self, session):
+        '''
+        :param session: 会话的标识
+        :return: None
+
+        删除会话的状态。之后同一标识的请求将从重置后的状态开始。
+        '''
+        await asyncio.get_event_loop().run_in_executor(self.executor, self.sessions.pop, session)
+
+    def run_batch(self, batch: list):
+        with torch.no_grad():
+            states = []
+            for session, x, _, _ in batch:
+                state = self.sessions.get(session)
+                states.append(self.init_state if state is None else state)
+            batch_sizes = [x.shape[1] for _, x, _, _ in batch]
+            functional.set_state(self.net, functional.gather_state(states, batch_sizes))
+            x_seq = torch.cat([x.to(self.device) for _, x, _, _ in batch], 1)
+            if self.multi_step:
+                y_seq = self.net(x_seq)
+            else:
+                y_seq = torch.stack([self.net(x_seq[t]) for t in range(x_seq.shape[0])])
+            for (session, _, _, _), state in zip(batch, functional.scatter_state(functional.get_state(self.net), batch_sizes)):
+                self.sessions.put(session, state_clone(state))
+            return y_seq.cpu().split(batch_sizes, 1)
+
+    async def batch_loop(self):
+        loop = asyncio.get_event_loop()
+        pending = collections.deque()
+        while True:
+            if pending.__len__() == 0:
+                pending.append(await self.queue.get())
+            deadline = pending[0][3] + self.max_delay
+            while pending.__len__() < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    pending.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            while not self.queue.empty():
+                pending.append(self.queue.get_nowait())
+
+            # 同一会话在一批中只能出现一次，后续的请求推迟到下一批
+            batch = []
+            sessions = set()
+            deferred = collections.deque()
+            for request in pending:
+                if request[0] in sessions or batch.__len__() >= self.max_batch_size:
+                    deferred.append(request)
+                else:
+                    batch.append(request)
+                    sessions.add(request[0])
+            pending = deferred
+
+            try:
+                y_list = await loop.run_in_executor(self.executor, self.run_batch, batch)
+            except Exception as e:
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            t_end = time.perf_counter()
+            for (_, x, future, t_arrive), y in zip(batch, y_list):
+                if not future.done():
+                    future.set_result(y)
+                self.latencies.append(t_end - t_arrive)
+                self.num_samples += x.shape[1]
+            self.num_requests += batch.__len__()
+            self.num_batches += 1
+
+    def stats(self):
+        '''
+        :return: 统计结果的字典，包括最近 ``stats_window`` 个请求的延迟的p50和p99（毫秒），启动以来每秒处理的请求数和样本数，平均每批
+            的请求数，以及保存在设备上和主机内存中的会话数量
+        :rtype: dict
+        '''
+        elapsed = time.perf_counter() - self.start_time if self.start_time is not None else 0.
+        ret = {
+            'requests': self.num_requests,
+            'batches': self.num_batches,
+            'mean_batch_size': self.num_requests / self.num_batches if self.num_batches > 0 else 0.,
+            'requests_per_second': self.num_requests / elapsed if elapsed > 0 else 0.,
+            'samples_per_second': self.num_samples / elapsed if elapsed > 0 else 0.,
+            'device_sessions': self.sessions.device_states.__len__(),
+            'host_sessions': self.sessions.host_states.__len__(),
+            'spilled_sessions': self.sessions.num_spilled,
+            'dropped_sessions': self.sessions.num_dropped
+        }
+        if self.latencies.__len__() > 0:
+            latencies = np.asarray(self.latencies) * 1000.
+            ret['p50_ms'] = float(np.percentile(latencies, 50))
+            ret['p99_ms'] = float(np.percentile(latencies, 99))
+        return ret
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        lock = asyncio.Lock()
+
+        async def reply(header: dict, x=None):
+            async with lock:
+                writer.write(encode_message(header, x))
+                await writer.drain()
+
+        async def forward(header: dict, x: np.ndarray):
+            try:
+                y = await self.submit(header['session'], torch.from_numpy(x.copy()))
+                await reply({'id': header.get('id')}, y)
+            except Exception as e:
+                await reply({'id': header.get('id'), 'error': repr(e)})
+
+        tasks = set()
+        try:
+            while True:
+                header, x = await read_message(reader)
+                op = header.get('op', 'forward')
+                if op == 'forward':
+                    # 不等待结果，使同一连接上的多个请求可以被合并到一批中
+                    task = asyncio.get_event_loop().create_task(forward(header, x))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                elif op == 'close':
+                    await self.close_session(header['session'])
+                    await reply({'id': header.get('id')})
+                elif op == 'stats':
+                    await reply({'id': header.get('id'), 'stats': self.stats()})
+                else:
+                    await reply({'id': header.get('id'), 'error': f'unknown op {op}'})
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            if tasks.__len__() > 0:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8765, path=None):
+        '''
+        :param host: TCP服务的地址
+        :type host: str
+        :param port: TCP服务的端口
+        :type port: int
+        :param path: 若不为 ``None``，则使用这一路径的Unix socket而不是TCP
+        :type path: str
+        :return: None
+
+        启动服务，直到被取消。消息的格式见 ``read_message``，不使用 ``pickle``，但服务本身没有身份验证，只应当在本机或可信的网络中使用。
+        '''
+        await self.start()
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle_client, path=path)
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+class MicroBatchClient:
+    def __init__(self):
+        '''
+        * :ref:`API in English <MicroBatchClient.__init__-en>`
+
+        .. _MicroBatchClient.__init__-cn:
+
+        :ref:`MicroBatchServer <MicroBatchServer.__init__-cn>` 的客户端。一个连接上可以同时发出多个请求，响应按请求的编号分发。
+
+        示例代码：
+
+        .. code-block:: python
+
+            client = MicroBatchClient()
+            await client.connect('127.0.0.1', 8765)
+            for x in chunks:  # x.shape = [T, 1, *]
+                y = await client.forward('camera-0', x)
+            await client.close_session('camera-0')
+            print(await client.stats())
+            await client.close()
+
+        * :ref:`中文API <MicroBatchClient.__init__-cn>`
+
+        .. _MicroBatchClient.__init__-en:
+
+        The client of :ref:`MicroBatchServer <MicroBatchServer.__init__-en>`. Many requests can be sent at the same time on
+        one connection, and responses are dispatched by the ids of requests.
+
+        Examples:
+
+        .. code-block:: python
+
+            client = MicroBatchClient()
+            await client.connect('127.0.0.1', 8765)
+            for x in chunks:  # x.shape = [T, 1, *]
+                y = await client.forward('camera-0', x)
+            await client.close_session('camera-0')
+            print(await client.stats())
+            await client.close()
+        '''
+        self.reader = None
+        self.writer = None
+        self.futures = {}
+        self.next_id = 0
+        self.read_task = None
+
+    async def connect(self, host='127.0.0.1', port=8765, path=None):
+        if path is not None:
+            self.reader, self.writer = await asyncio.open_unix_connection(path)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.read_task = asyncio.get_event_loop().create_task(self.read_loop())
+
+    async def read_loop(self):
+        try:
+            while True:
+                header, x = await read_message(self.reader)
+                future = self.futures.pop(header['id'], None)
+                if future is None or future.done():
+                    continue
+                if 'error' in header:
+                    future.set_exception(RuntimeError(header['error']))
+                elif 'stats' in header:
+                    future.set_result(header['stats'])
+                else:
+                    future.set_result(None if x is None else torch.from_numpy(x.copy()))
+        except (asyncio.IncompleteReadError, ConnectionResetError) as e:
+            for future in self.futures.values():
+                if not future.done():
+                    future.set_exception(e)
+            self.futures.clear()
+
+    async def request(self, header: dict, x=None):
+        future = asyncio.get_event_loop().create_future()
+        header = dict(header, id=self.next_id)
+        self.futures[self.next_id] = future
+        self.next_id += 1
+        self.writer.write(encode_message(header, x))
+        await self.writer.drain()
+        return await future
+
+    async def forward(self, session, x):
+        '''
+        :param session: 会话的标识，需要能被JSON编码
+        :param x: 这一会话的输入分块，``shape=[T, n, *]``
+        :type x: torch.Tensor or numpy.ndarray
+        :return: 这一分块的输出
+        :rtype: torch.Tensor
+        '''
+        return await self.request({'op': 'forward', 'session': session}, x)
+
+    async def close_session(self, session):
+        await self.request({'op': 'close', 'session': session})
+
+    async def stats(self):
+        return await self.request({'op': 'stats'})
+
+    async def close(self):
+        self.writer.close()
+        if self.read_task is not None:
+            self.read_task.cancel()
@@ -2,6 +2,8 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import math
+import json
+from spikingjelly.clock_driven import accelerating
 # TODO 审查代码，优化，尽量用inplace操作
 def heaviside(x: torch.Tensor):
     '''
@@ -72,15 +74,335 @@ def check_manual_grad(primitive_function, spiking_function, eps=1e-5):
     assert (x_grad_manual - x_grad_auto).abs().max().item() <= eps, 'x.grad is wrong!'
     print('grad check pass')
 
+# 节省内存的保存方式得到的梯度与全精度梯度的最大误差，相对于梯度的最大值 max|g| 的比例
+lean_grad_rtol = 0.01
+
+class lean_surrogate(torch.autograd.Function):
+    @staticmethod
+    def forward(ctx, x: torch.Tensor, grad_function, save_mode, lut=None, boundaries=None):
+        if x.requires_grad:
+            if save_mode == 'lut':
+                # boundaries和lut是替代函数的buffer，随模块一起移动到x所在的设备上，这里的to()不会拷贝
+                index = torch.bucketize(x.detach().abs().to(boundaries.dtype), boundaries.to(x.device), right=True)
+                ctx.save_for_backward(index.to(torch.uint8), lut)
+            else:
+                ctx.save_for_backward(x.detach().to(save_mode))
+            ctx.grad_function = grad_function
+            ctx.save_mode = save_mode
+        return heaviside(x)
+
+    @staticmethod
+    def backward(ctx, grad_output):
+        grad_x = None
+        if ctx.needs_input_grad[0]:
+            if ctx.save_mode == 'lut':
+                index, lut = ctx.saved_tensors
+                grad_x = grad_output * lut.to(grad_output)[index.long()]
+            else:
+                grad_x = grad_output * ctx.grad_function(ctx.saved_tensors[0].to(grad_output.dtype))
+        return grad_x, None, None, None, None
+
+def build_grad_lut(grad_function, scale, bits=8):
+    '''
+    * :ref:`API in English <build_grad_lut-en>`
+
+    .. _build_grad_lut-cn:
+
+    :param grad_function: 替代函数的梯度 ``g(x)``，需要关于 ``x = 0`` 对称，且随 ``|x|`` 增大而不增
+    :type grad_function: callable
+    :param scale: ``x`` 的尺度，例如 ``1 / alpha``。``g(scale * 2 ** 40)`` 被视为 ``|x|`` 趋于无穷时的梯度
+    :type scale: float
+    :param bits: 索引的位数，不超过8
+    :type bits: int
+    :return: 三元组 ``(lut, boundaries, error_bound)``。``|x|`` 被 ``2 ** bits - 1`` 个升序的 ``boundaries`` 分为 ``2 ** bits``
+        个区间 ``[boundaries[i - 1], boundaries[i])``，``lut[i]`` 是第i个区间使用的梯度，``error_bound`` 是查表得到的梯度的最大误差
+    :rtype: tuple
+
+    构建替代函数梯度的非均匀查找表。区间的边界不是等间距的，而是使 ``g`` 在每个区间内的变化量相同：第i个边界是满足
+    ``g(|x|) <= g(0) - i * (g(0) - g(inf)) / 2 ** bits`` 的最小的 ``|x|``，由二分查找得到。因此梯度变化剧烈的位置有更多的区间，
+    ``g`` 的间断点恰好是区间的边界，最后一个区间延伸到无穷。由于 ``g`` 在每个区间内单调，``lut[i]`` 取区间两端梯度的中点，
+    ``error_bound`` 是区间两端梯度之差的一半的最大值，约为 ``(g(0) - g(inf)) / 2 ** (bits + 1)``。
+
+    * :ref:`中文API <build_grad_lut-cn>`
+
+    .. _build_grad_lut-en:
+
+    :param grad_function: the gradient ``g(x)`` of the surrogate function, which should be symmetric about ``x = 0`` and
+        non-increasing as ``|x|`` increases
+    :type grad_function: callable
+    :param scale: the scale of ``x``, e.g., ``1 / alpha``. ``g(scale * 2 ** 40)`` is regarded as the gradient when ``|x|``
+        tends to infinity
+    :type scale: float
+    :param bits: the number of bits of the index, which is not larger than 8
+    :type bits: int
+    :return: a tuple ``(lut, boundaries, error_bound)``. ``|x|`` is divided by ``2 ** bits - 1`` ascending
+        ``boundaries`` into ``2 ** bits`` intervals ``[boundaries[i - 1], boundaries[i])``, ``lut[i]`` is the gradient
+        used in the i-th interval, and ``error_bound`` is the maximum error of the looked-up gradient
+    :rtype: tuple
+
+    Build the non-uniform lookup table of the gradient of a surrogate function. The boundaries of the intervals are not
+    evenly spaced. Instead, ``g`` changes by the same amount in every interval: the i-th boundary is the minimum ``|x|``
+    that satisfies ``g(|x|) <= g(0) - i * (g(0) - g(inf)) / 2 ** bits``, which is found by bisection. Thus, there are
+    more intervals where the gradient changes sharply, the discontinuities of ``g`` are exactly boundaries, and the last
+    interval extends to infinity. As ``g`` is monotonic in every interval, ``lut[i]`` is the midpoint of the gradients at
+    the two ends of the interval, and ``error_bound`` is the maximum of half the difference between them, which is about
+    ``(g(0) - g(inf)) / 2 ** (bits + 1)``.
+    '''
+    assert 1 <= bits <= 8
+    n = 2 ** bits
+    x_far = scale * 2. ** 40
+    g_0 = grad_function(torch.zeros([1])).item()
+    g_inf = grad_function(torch.full([1], x_far)).nan_to_num(0.).item()
+    levels = g_0 - (g_0 - g_inf) * torch.arange(1, n, dtype=torch.float) / n
+
+    # 二分查找满足 g(x) <= levels[i] 的最小的x，直到lo和hi是相邻的浮点数
+    lo = torch.zeros([n - 1])
+    hi = torch.full([n - 1], x_far)
+    for _ in range(256):
+        mid = (lo + hi) / 2
+        below = grad_function(mid) <= levels
+        hi = torch.where(below, mid, hi)
+        lo = torch.where(below, lo, mid)
+    boundaries = torch.cummax(hi, 0)[0]
+
+    # 第i个区间是 [start[i], end[i]]，g在start处最大，在end处最小
+    start = torch.cat((torch.zeros([1]), boundaries))
+    end = torch.cat((torch.nextafter(boundaries, torch.zeros_like(boundaries)), torch.full([1], x_far)))
+    g_start = grad_function(start)
+    g_end = grad_function(end).nan_to_num(0.)
+    lut = (g_start + g_end) / 2
+    nonempty = start <= end
+    error_bound = ((g_start - g_end).abs() / 2)[nonempty].max().item()
+    error_bound += 1e-6 * abs(g_0)  # 计算梯度时的舍入误差
+    return lut, boundaries, error_bound
+
+def cast_grad_error_bound(grad_function, x_abs: torch.Tensor, dtype):
+    '''
+    :param grad_function: 替代函数的梯度 ``g(x)``，要求同 :ref:`build_grad_lut <build_grad_lut-cn>`
+    :type grad_function: callable
+    :param x_abs: 输入的绝对值
+    :type x_abs: torch.Tensor
+    :param dtype: 保存输入使用的类型，``torch.float16`` 或 ``torch.bfloat16``
+    :type dtype: torch.dtype
+    :return: 以 ``dtype`` 保存输入时，在 ``x_abs`` 的每个点上梯度误差的上界
+    :rtype: torch.Tensor
+
+    以 ``dtype`` 保存的x与原值之差不超过 ``delta = |x| * eps / 2 + tiny``。g随|x|增大而不增，因此梯度的误差不超过g在
+    ``|x| - delta`` 和 ``|x| + delta`` 处与 ``g(x)`` 之差的最大值。
+    '''
+    finfo = torch.finfo(dtype)
+    delta = x_abs * finfo.eps / 2 + finfo.tiny
+    g = grad_function(x_abs)
+    bound = torch.max(grad_function((x_abs - delta).clamp(min=0.)) - g, g - grad_function(x_abs + delta))
+    return bound + 1e-6 * g.abs().max().item()  # 计算梯度时的舍入误差
+
+def apply_save_mode(surrogate_function, save_mode, scale, bits=8):
+    '''
+    :param surrogate_function: 替代函数，例如 ``Sigmoid()``
+    :type surrogate_function: SurrogateFunctionBase or PiecewiseLeakyReLU
+    :param save_mode: 见 :ref:`SurrogateFunctionBase.set_save_mode <SurrogateFunctionBase.set_save_mode-cn>`
+    :param scale: 见 :ref:`build_grad_lut <build_grad_lut-cn>`
+    :type scale: float
+    :param bits: 见 :ref:`build_grad_lut <build_grad_lut-cn>`
+    :type bits: int
+    :return: None
+
+    ``set_save_mode`` 的实现。``save_mode == 'lut'`` 时构建查找表，误差的界超过 ``lean_grad_rtol * max|g|`` 时抛出 ``ValueError``。
+    ``save_mode`` 为 ``torch.float16`` 或 ``torch.bfloat16`` 时，在 ``[0, 16 * scale]`` 上的均匀网格和查找表的边界上计算
+    ``cast_grad_error_bound``，同样在超过 ``lean_grad_rtol * max|g|`` 时抛出 ``ValueError``。查找表
+    的边界包含了 ``g`` 的间断点，在间断点附近舍入可能使x越过间断点，误差等于间断处的跳变。
+    '''
+    if save_mode == 'lut':
+        lut, boundaries, error_bound = build_grad_lut(surrogate_function.surrogate_grad, scale, bits)
+        g_max = lut.abs().max().item()
+        if error_bound > lean_grad_rtol * g_max:
+            raise ValueError(f'The error bound {error_bound} of the {bits}-bit lookup table exceeds '
+                             f'lean_grad_rtol * max|g| = {lean_grad_rtol * g_max}. Use save_mode=torch.float16 or '
+                             f'torch.bfloat16 instead')
+        # 与已有的buffer（例如alpha）放在同一设备上
+        device = next(surrogate_function.buffers(), boundaries).device
+        surrogate_function.lut_bits = bits
+        surrogate_function.lut_error_bound = error_bound
+        surrogate_function.lut_boundaries = boundaries.to(device)
+        surrogate_function.lut = lut.to(device)
+    elif save_mode is None or save_mode in (torch.float16, torch.bfloat16):
+        if save_mode is not None:
+            _, boundaries, _ = build_grad_lut(surrogate_function.surrogate_grad, scale)
+            x_abs = torch.cat((torch.linspace(0., 16. * scale, 8192), boundaries))
+            error_bound = cast_grad_error_bound(surrogate_function.surrogate_grad, x_abs, save_mode).max().item()
+            g_max = surrogate_function.surrogate_grad(x_abs).abs().max().item()
+            if error_bound > lean_grad_rtol * g_max:
+                raise ValueError(f'The error bound {error_bound} of saving x in {save_mode} exceeds '
+                                 f'lean_grad_rtol * max|g| = {lean_grad_rtol * g_max}')
+        surrogate_function.lut_bits = None
+        surrogate_function.lut_error_bound = None
+        surrogate_function.lut_boundaries = None
+        surrogate_function.lut = None
+    else:
+        raise ValueError(f'save_mode should be None, torch.float16, torch.bfloat16 or \'lut\', but got {save_mode}')
+    surrogate_function.save_mode = save_mode
+
+def check_lean_grad(surrogate_function, save_mode, x_range=16., num=8192, rtol=None):
+    '''
+    * :ref:`API in English <check_lean_grad-en>`
+
+    .. _check_lean_grad-cn:
+
+    :param surrogate_function: 替代函数，例如 ``Sigmoid()``
+    :type surrogate_function: SurrogateFunctionBase or PiecewiseLeakyReLU
+    :param save_mode: 见 :ref:`SurrogateFunctionBase.set_save_mode <SurrogateFunctionBase.set_save_mode-cn>`
+    :param x_range: 检查的区间 ``[-x_range, x_range]``
+    :type x_range: float
+    :param num: 检查的点数
+    :type num: int
+    :param rtol: 误差相对于 ``max|g|`` 的容许比例。为 ``None`` 时使用 ``lean_grad_rtol``
+    :type rtol: float
+    :return: 梯度的最大误差
+    :rtype: float
+
+    检查使用 ``save_mode`` 保存输入时得到的梯度与全精度的梯度 ``g(x) = surrogate_function.surrogate_grad(x)`` 的误差是否不超过
+    理论界，并且不超过 ``rtol * max|g|``。后者排除了理论界本身过大的情况，例如 ``g`` 有间断点时，``torch.bfloat16`` 的舍入可能使
+    ``x`` 越过间断点，误差等于间断处的跳变；此时以 ``lean_grad_rtol`` 为容许比例的 ``set_save_mode`` 已经会抛出 ``ValueError``。
+    ``'lut'`` 的界是 ``surrogate_function.lut_error_bound``；``torch.float16`` 和 ``torch.bfloat16`` 的界是 ``g`` 在
+    ``|x| - delta`` 和 ``|x| + delta`` 处与 ``g(x)`` 之差的最大值，其中 ``delta = |x| * eps / 2 + tiny`` 是舍入误差的上界，
+    ``eps`` 和 ``tiny`` 来自 ``torch.finfo(save_mode)``。
+    ``surrogate_function`` 的保存方式在检查后会被恢复。示例代码：
+
+    .. code-block:: python
+
+        surrogate.check_lean_grad(surrogate.Sigmoid(alpha=4.), 'lut')
+
+    * :ref:`中文API <check_lean_grad-cn>`
+
+    .. _check_lean_grad-en:
+
+    :param surrogate_function: the surrogate function, e.g., ``Sigmoid()``
+    :type surrogate_function: SurrogateFunctionBase or PiecewiseLeakyReLU
+    :param save_mode: see :ref:`SurrogateFunctionBase.set_save_mode <SurrogateFunctionBase.set_save_mode-en>`
+    :param x_range: the checked range ``[-x_range, x_range]``
+    :type x_range: float
+    :param num: the number of checked points
+    :type num: int
+    :param rtol: the tolerated ratio of the error to ``max|g|``. If ``None``, ``lean_grad_rtol`` is used
+    :type rtol: float
+    :return: the maximum error of the gradient
+    :rtype: float
+
+    Check whether the error between the gradient got by saving the input with ``save_mode`` and the full-precision
+    gradient ``g(x) = surrogate_function.surrogate_grad(x)`` is not larger than the theoretical bound, and not larger
+    than ``rtol * max|g|``. The latter excludes the cases where the theoretical bound itself is too large, e.g., when
+    ``g`` has a discontinuity, rounding to ``torch.bfloat16`` may move ``x`` across it and the error equals the jump
+    there. In this case, ``set_save_mode``, whose tolerated ratio is ``lean_grad_rtol``, already raises ``ValueError``.
+    The bound of ``'lut'``
+    is ``surrogate_function.lut_error_bound``, and the bound of ``torch.float16`` and ``torch.bfloat16`` is the maximum
+    difference between ``g(x)`` and ``g`` at ``|x| - delta`` and ``|x| + delta``, where ``delta = |x| * eps / 2 + tiny``
+    is the upper bound of the rounding error, and ``eps`` and ``tiny`` are from ``torch.finfo(save_mode)``. The save mode of ``surrogate_function`` is restored after
+    checking. Examples:
+
+    .. code-block:: python
+
+        surrogate.check_lean_grad(surrogate.Sigmoid(alpha=4.), 'lut')
+    '''
+    x = torch.linspace(-x_range, x_range, num)
+    x_grad_full = surrogate_function.surrogate_grad(x)
+
+    if rtol is None:
+        rtol = lean_grad_rtol
+    training = surrogate_function.training
+    former_save_mode = surrogate_function.save_mode
+    former_bits = surrogate_function.lut_bits
+    surrogate_function.train()
+    surrogate_function.set_save_mode(save_mode, former_bits if save_mode == former_save_mode == 'lut' else 8)
+    x.requires_grad_(True)
+    surrogate_function(x).sum().backward()
+    x_grad_lean = x.grad.clone()
+    if save_mode == 'lut':
+        bound = surrogate_function.lut_error_bound
+    else:
+        bound = cast_grad_error_bound(surrogate_function.surrogate_grad, x.detach().abs(), save_mode)
+    surrogate_function.set_save_mode(former_save_mode, former_bits)
+    surrogate_function.train(training)
+
+    error = (x_grad_lean - x_grad_full).abs()
+    assert (error <= bound).all().item(), 'x.grad exceeds the error bound!'
+    tolerance = rtol * x_grad_full.abs().max().item()
+    assert error.max().item() <= tolerance, \
+        f'The max error of x.grad is {error.max().item()}, which exceeds rtol * max|g| = {tolerance}!'
+    print('grad check pass')
+    return error.max().item()
+
 class SurrogateFunctionBase(nn.Module):
     def __init__(self, alpha, spiking=True):
         super().__init__()
         self.spiking = spiking
         self.register_buffer('alpha', torch.tensor(alpha, dtype=torch.float))
+        self.save_mode = None
+        self.lut_bits = None
+        self.lut_error_bound = None
+        # 不保存在state_dict中，由set_save_mode重新构建
+        self.register_buffer('lut_boundaries', None, persistent=False)
+        self.register_buffer('lut', None, persistent=False)
 
     def set_spiking_mode(self, spiking: bool):
         self.spiking = spiking
 
+    def surrogate_grad(self, x: torch.Tensor):
+        '''
+        :param x: 输入tensor
+        :type x: torch.Tensor
+        :return: 替代函数在 ``x`` 处的梯度。默认使用 ``scriptable_surrogate_grad(x, self.__class__.__name__, alpha)``，
+            其他子类需要重写此函数才能使用 ``set_save_mode``
+        :rtype: torch.Tensor
+        '''
+        # 使用tensor的alpha，避免在每次反向传播中调用item()进行设备同步
+        return scriptable_surrogate_grad(x, self.__class__.__name__, self.alpha.to(x))
+
+    def set_save_mode(self, save_mode=None, bits=8):
+        '''
+        * :ref:`API in English <SurrogateFunctionBase.set_save_mode-en>`
+
+        .. _SurrogateFunctionBase.set_save_mode-cn:
+
+        :param save_mode: 训练时为反向传播保存输入 ``x`` 的方式。为 ``None`` 时使用 ``spiking_function``，保存全精度的 ``x``；
+            为 ``torch.float16`` 或 ``torch.bfloat16`` 时以此类型保存 ``x``；为 ``'lut'`` 时保存 ``x`` 在梯度查找表中的8位索引
+        :type save_mode: None or torch.dtype or str
+        :param bits: ``save_mode == 'lut'`` 时索引的位数，见 :ref:`build_grad_lut <build_grad_lut-cn>`
+        :type bits: int
+        :return: None
+
+        设置节省内存的保存方式。与保存 ``torch.float`` 的 ``x`` 相比，``torch.float16`` 和 ``torch.bfloat16`` 节省一半内存，
+        ``'lut'`` 节省3/4的内存。查找表在调用此函数时根据当前的 ``alpha`` 构建，``self.lut_error_bound`` 是梯度的最大误差；修改
+        ``alpha`` 后需要重新调用此函数。若 ``self.lut_error_bound`` 超过 ``lean_grad_rtol * max|g|``，则抛出 ``ValueError``，
+        此时应改用 ``torch.float16`` 或 ``torch.bfloat16``。``torch.float16`` 和 ``torch.bfloat16`` 的舍入造成的梯度误差的界
+        （见 :ref:`check_lean_grad <check_lean_grad-cn>`）超过 ``lean_grad_rtol * max|g|`` 时同样抛出 ``ValueError``，例如梯度有
+        间断点的 ``PiecewiseLeakyReLU``。查找表是不保存在 ``state_dict`` 中的buffer，会随 ``to()`` 移动。可以用 :ref:`check_lean_grad <check_lean_grad-cn>` 检查梯度的误差。
+
+        * :ref:`中文API <SurrogateFunctionBase.set_save_mode-cn>`
+
+        .. _SurrogateFunctionBase.set_save_mode-en:
+
+        :param save_mode: how to save the input ``x`` for backward in training. If ``None``, ``spiking_function`` is used
+            and the full-precision ``x`` is saved. If ``torch.float16`` or ``torch.bfloat16``, ``x`` is saved in this
+            dtype. If ``'lut'``, the 8-bit index of ``x`` in the lookup table of the gradient is saved
+        :type save_mode: None or torch.dtype or str
+        :param bits: the number of bits of the index when ``save_mode == 'lut'``, see
+            :ref:`build_grad_lut <build_grad_lut-en>`
+        :type bits: int
+        :return: None
+
+        Set the memory-efficient save mode. Compared with saving ``x`` in ``torch.float``, ``torch.float16`` and
+        ``torch.bfloat16`` save half of the memory, and ``'lut'`` saves 3/4 of the memory. The lookup table is built
+        from the current ``alpha`` when this function is called, and ``self.lut_error_bound`` is the maximum error of
+        the gradient. This function should be called again after ``alpha`` is changed. If ``self.lut_error_bound``
+        exceeds ``lean_grad_rtol * max|g|``, ``ValueError`` is raised, and ``torch.float16`` or ``torch.bfloat16``
+        should be used instead. ``ValueError`` is also raised if the bound of the error of the gradient caused by rounding
+        to ``torch.float16`` or ``torch.bfloat16`` (see :ref:`check_lean_grad <check_lean_grad-en>`) exceeds
+        ``lean_grad_rtol * max|g|``, e.g., for ``PiecewiseLeakyReLU`` whose gradient has discontinuities. The lookup table
+        is a buffer which is not saved in ``state_dict`` and is moved by ``to()``. The error of the gradient can be
+        checked by :ref:`check_lean_grad <check_lean_grad-en>`.
+        '''
+        apply_save_mode(self, save_mode, 1. / self.alpha.item(), bits)
+
     def extra_repr(self):
         return f'alpha={self.alpha}, spiking={self.spiking}'
 
@@ -95,6 +417,8 @@ class SurrogateFunctionBase(nn.Module):
     def forward(self, x: torch.Tensor):
         if self.training:
             if self.spiking:
+                if self.save_mode is not None:
+                    return lean_surrogate.apply(x, self.surrogate_grad, self.save_mode, self.lut, self.lut_boundaries)
                 return self.spiking_function(x, self.alpha)
             else:
                 return self.primitive_function(x, self.alpha)
@@ -961,8 +1285,33 @@ class PiecewiseLeakyReLU(nn.Module):
             self.f = self.spiking_function
         else:
             self.f = self.primitive_function
+        self.save_mode = None
+        self.lut_bits = None
+        self.lut_error_bound = None
+        # 不保存在state_dict中，由set_save_mode重新构建
+        self.register_buffer('lut_boundaries', None, persistent=False)
+        self.register_buffer('lut', None, persistent=False)
+
+    def surrogate_grad(self, x: torch.Tensor):
+        '''
+        :param x: 输入tensor
+        :type x: torch.Tensor
+        :return: 替代函数在 ``x`` 处的梯度，与 ``piecewise_leaky_relu`` 的反向传播相同
+        :rtype: torch.Tensor
+        '''
+        return torch.full_like(x, self.c).masked_fill_(x.abs() < self.w, 1 / self.w)
+
+    def set_save_mode(self, save_mode=None, bits=8):
+        '''
+        :param save_mode: 见 :ref:`SurrogateFunctionBase.set_save_mode <SurrogateFunctionBase.set_save_mode-cn>`
+        :param bits: 见 :ref:`SurrogateFunctionBase.set_save_mode <SurrogateFunctionBase.set_save_mode-cn>`
+        :return: None
+        '''
+        apply_save_mode(self, save_mode, self.w, bits)
 
     def forward(self, x):
+        if self.spiking and self.save_mode is not None:
+            return lean_surrogate.apply(x, self.surrogate_grad, self.save_mode, self.lut, self.lut_boundaries)
         return self.f(x, self.w, self.c)
 
     @staticmethod
@@ -1001,4 +1350,266 @@ class PiecewiseLeakyReLU(nn.Module):
     # plt.xlabel('Input')
     # plt.ylabel('Output')
     # plt.grid(linestyle='--')
-    # plt.show()
\ No newline at end of file
+    # plt.show()
+# 以下函数可以被TorchScript编译。它们不使用autograd.Function，而是将替代梯度写为逐元素的运算，因此可以与神经元的充电、放电、重置过程
+# 融合为一个kernel。它们不在导入时编译，而是在调用它们的模块（例如neuron.ScriptableBaseNode）被torch.jit.script编译时，作为被调用的
+# 函数一起编译；直接调用时以普通的Python函数运行
+def scriptable_surrogate_grad(x: torch.Tensor, name: str, alpha: float):
+    '''
+    :param x: 输入tensor
+    :type x: torch.Tensor
+    :param name: 替代函数的类名，例如 ``'Sigmoid'``
+    :type name: str
+    :param alpha: 替代函数的参数
+    :type alpha: float
+    :return: 替代函数在 ``x`` 处的梯度，与对应的 ``autograd.Function`` 的反向传播相同
+    :rtype: torch.Tensor
+    '''
+    if name == 'Sigmoid':
+        sgax = (x * alpha).sigmoid()
+        return (1. - sgax) * sgax * alpha
+    elif name == 'PiecewiseQuadratic':
+        x_abs = x.abs()
+        return torch.where(x_abs > 1. / alpha, torch.zeros_like(x), - alpha * alpha * x_abs + alpha)
+    elif name == 'PiecewiseExp':
+        return alpha / 2. * (- alpha * x.abs()).exp()
+    elif name == 'SoftSign':
+        return 1. / (2. * alpha * (1. / alpha + x.abs()).pow(2))
+    elif name == 'ATan':
+        return alpha / 2. / (1. + (math.pi / 2. * alpha * x).pow(2))
+    elif name == 'NonzeroSignLogAbs':
+        return 1. / (1. / alpha + x.abs())
+    elif name == 'Erf':
+        return (- (x * alpha).pow(2)).exp() * (alpha / math.sqrt(math.pi))
+    else:
+        raise ValueError('surrogate function ' + name + ' is not scriptable')
+
+def scriptable_spiking_function(x: torch.Tensor, name: str, alpha: float):
+    '''
+    * :ref:`API in English <scriptable_spiking_function-en>`
+
+    .. _scriptable_spiking_function-cn:
+
+    :param x: 输入tensor
+    :type x: torch.Tensor
+    :param name: 替代函数的类名，可以为 ``'Sigmoid'``, ``'PiecewiseQuadratic'``, ``'PiecewiseExp'``, ``'SoftSign'``,
+        ``'ATan'``, ``'NonzeroSignLogAbs'``, ``'Erf'``
+    :type name: str
+    :param alpha: 替代函数的参数
+    :type alpha: float
+    :return: ``heaviside(x)``
+    :rtype: torch.Tensor
+
+    可以被TorchScript编译的脉冲发放函数。计算方式为
+
+    ``heaviside(x) + (x - x.detach()) * scriptable_surrogate_grad(x.detach(), name, alpha)``
+
+    前向传播的结果严格等于 ``heaviside(x)``，反向传播的梯度与替代函数 ``name`` 对应的 ``autograd.Function`` 相同。由于全部是
+    逐元素的运算，编译后可以与神经元的充电、放电、重置过程融合为一个kernel。可以使用 ``check_manual_grad``
+    检查梯度，例如：
+
+    .. code-block:: python
+
+        surrogate.check_manual_grad(surrogate.Sigmoid.primitive_function,
+                                    lambda x, alpha: surrogate.scriptable_spiking_function(x, 'Sigmoid', alpha.item()))
+
+    * :ref:`中文API <scriptable_spiking_function-cn>`
+
+    .. _scriptable_spiking_function-en:
+
+    :param x: the input tensor
+    :type x: torch.Tensor
+    :param name: the class name of the surrogate function, which can be ``'Sigmoid'``, ``'PiecewiseQuadratic'``,
+        ``'PiecewiseExp'``, ``'SoftSign'``, ``'ATan'``, ``'NonzeroSignLogAbs'``, ``'Erf'``
+    :type name: str
+    :param alpha: the parameter of the surrogate function
+    :type alpha: float
+    :return: ``heaviside(x)``
+    :rtype: torch.Tensor
+
+    The spiking function that can be compiled by TorchScript. It is computed by
+
+    ``heaviside(x) + (x - x.detach()) * scriptable_surrogate_grad(x.detach(), name, alpha)``
+
+    The forward output is exactly ``heaviside(x)``, and the gradient in backward is the same as that of the
+    ``autograd.Function`` of the surrogate function ``name``. As all operations are element-wise, it can be fused with the
+    charge, fire and reset processes of neurons into one kernel after compiling. The gradient can be checked by
+    ``check_manual_grad``, e.g.:
+
+    .. code-block:: python
+
+        surrogate.check_manual_grad(surrogate.Sigmoid.primitive_function,
+                                    lambda x, alpha: surrogate.scriptable_spiking_function(x, 'Sigmoid', alpha.item()))
+    '''
+    x_d = x.detach()
+    return heaviside(x_d) + (x - x_d) * scriptable_surrogate_grad(x_d, name, alpha)
+
+def surrogate_function_classes():
+    '''
+    :return: ``SurrogateFunctionBase`` 和 ``MultiArgsSurrogateFunctionBase`` 的所有子类（包括用户定义的子类），以及
+        ``PiecewiseLeakyReLU``
+    :rtype: list
+    '''
+    classes = []
+    bases = [SurrogateFunctionBase, MultiArgsSurrogateFunctionBase]
+    while bases.__len__() > 0:
+        for sub_class in bases.pop(0).__subclasses__():
+            if sub_class not in classes:
+                classes.append(sub_class)
+                bases.append(sub_class)
+    classes.append(PiecewiseLeakyReLU)
+    return classes
+
+def benchmark_surrogate_functions(classes=None, sizes=(2 ** 10, 2 ** 16, 2 ** 20), dtypes=(torch.float, torch.half),
+                                  device='cpu', repeats=10, path=None, verbose=False):
+    '''
+    * :ref:`API in English <benchmark_surrogate_functions-en>`
+
+    .. _benchmark_surrogate_functions-cn:
+
+    :param classes: 被测试的替代函数的类，使用默认参数构造。为 ``None`` 时使用 ``surrogate_function_classes()``
+    :type classes: list
+    :param sizes: 输入的元素数量
+    :type sizes: tuple
+    :param dtypes: 输入的数据类型
+    :type dtypes: tuple
+    :param device: 运行的设备
+    :type device: str
+    :param repeats: 计时的重复次数
+    :type repeats: int
+    :param path: 保存JSON格式报告的路径。为 ``None`` 时不保存
+    :type path: str
+    :param verbose: 是否打印每条测试结果
+    :type verbose: bool
+    :return: 测试结果的列表，每个元素是一个字典
+    :rtype: list
+
+    对每个替代函数、``spiking=True`` 和 ``spiking=False``、每种输入大小和数据类型，测试训练模式下：
+
+    ``forward_time``，``backward_time``：前向和反向传播的平均耗时（秒）
+
+    ``saved_bytes``：为反向传播保存的tensor的字节数，使用 ``torch.autograd.graph.saved_tensors_hooks`` 统计，PyTorch不支持时为 ``None``
+
+    ``peak_memory``：一次前向和反向传播中显存的峰值增量（字节），仅CUDA设备，否则为 ``None``
+
+    ``max_grad_error``：``spiking=True`` 时，替代梯度与 ``spiking=False`` 的原函数通过自动微分得到的梯度的最大误差，与
+    ``check_manual_grad`` 相同；``spiking=False`` 时为 ``None``
+
+    ``error``：运行出错时的异常信息（例如某些运算不支持 ``torch.half``），否则为 ``None``
+
+    每条结果还包括 ``name``、``spiking``、``dtype``、``size`` 和 ``device``。报告的格式为
+    ``{'device': ..., 'torch_version': ..., 'results': [...]}``，可用于选择满足精度要求的最快的替代函数，或检测性能的退化。
+
+    * :ref:`中文API <benchmark_surrogate_functions-cn>`
+
+    .. _benchmark_surrogate_functions-en:
+
+    :param classes: classes of the tested surrogate functions, which are constructed with default arguments. If
+        ``None``, ``surrogate_function_classes()`` is used
+    :type classes: list
+    :param sizes: the numbers of elements of the input
+    :type sizes: tuple
+    :param dtypes: the dtypes of the input
+    :type dtypes: tuple
+    :param device: the running device
+    :type device: str
+    :param repeats: the number of repeats for timing
+    :type repeats: int
+    :param path: the path to save the report in JSON. If ``None``, the report will not be saved
+    :type path: str
+    :param verbose: whether to print every result
+    :type verbose: bool
+    :return: a list of results, whose elements are dictionaries
+    :rtype: list
+
+    For every surrogate function, ``spiking=True`` and ``spiking=False``, every size and dtype of the input, benchmark
+    in the training mode:
+
+    ``forward_time``, ``backward_time``: the average time (in seconds) of forward and backward
+
+    ``saved_bytes``: the bytes of tensors saved for backward, which are counted by
+    ``torch.autograd.graph.saved_tensors_hooks``, or ``None`` if it is not supported by PyTorch
+
+    ``peak_memory``: the peak increment of the GPU memory (in bytes) in one forward and backward, only for CUDA devices,
+    otherwise ``None``
+
+    ``max_grad_error``: when ``spiking=True``, the maximum error between the surrogate gradient and the gradient of the
+    primitive function with ``spiking=False`` by autograd, which is the same as ``check_manual_grad``. It is ``None``
+    when ``spiking=False``
+
+    ``error``: the exception message if running fails (e.g., some operations do not support ``torch.half``), otherwise
+    ``None``
+
+    Every result also includes ``name``, ``spiking``, ``dtype``, ``size`` and ``device``. The format of the report is
+    ``{'device': ..., 'torch_version': ..., 'results': [...]}``, which can be used to pick the fastest surrogate
+    function that meets the accuracy requirement, or to detect performance regressions.
+    '''
+    if classes is None:
+        classes = surrogate_function_classes()
+    cuda = torch.device(device).type == 'cuda'
+    has_hooks = hasattr(torch.autograd, 'graph') and hasattr(torch.autograd.graph, 'saved_tensors_hooks')
+
+    results = []
+    for surrogate_class in classes:
+        for spiking in (True, False):
+            for dtype in dtypes:
+                for size in sizes:
+                    result = {
+                        'name': surrogate_class.__name__,
+                        'spiking': spiking,
+                        'dtype': str(dtype),
+                        'size': size,
+                        'device': str(device),
+                        'forward_time': None,
+                        'backward_time': None,
+                        'saved_bytes': None,
+                        'peak_memory': None,
+                        'max_grad_error': None,
+                        'error': None
+                    }
+                    try:
+                        surrogate_function = surrogate_class(spiking=spiking).to(device)
+                        x = torch.randn([size], device=device, dtype=dtype, requires_grad=True)
+                        grad_y = torch.ones_like(x)
+                        # 每项计时之前先运行一次预热，避免第一次运行的额外开销被计入
+                        surrogate_function(x)
+                        result['forward_time'] = accelerating.measure_time(lambda: surrogate_function(x), repeats, device)
+                        y = surrogate_function(x)
+                        torch.autograd.grad(y, x, grad_y, retain_graph=True)
+                        result['backward_time'] = accelerating.measure_time(
+                            lambda: torch.autograd.grad(y, x, grad_y, retain_graph=True), repeats, device)
+                        del y
+
+                        if has_hooks:
+                            saved = {}
+                            def pack_hook(t: torch.Tensor):
+                                saved[(t.data_ptr(), t.shape, t.dtype)] = t.numel() * t.element_size()
+                                return t
+                            with torch.autograd.graph.saved_tensors_hooks(pack_hook, lambda t: t):
+                                y = surrogate_function(x)
+                            result['saved_bytes'] = sum(saved.values())
+                            del y
+
+                        if cuda:
+                            torch.cuda.synchronize(device)
+                            torch.cuda.reset_peak_memory_stats(device)
+                            memory_base = torch.cuda.memory_allocated(device)
+                            torch.autograd.grad(surrogate_function(x), x, grad_y)
+                            torch.cuda.synchronize(device)
+                            result['peak_memory'] = torch.cuda.max_memory_allocated(device) - memory_base
+
+                        if spiking:
+                            primitive_function = surrogate_class(spiking=False).to(device)
+                            grad_manual = torch.autograd.grad(surrogate_function(x), x, grad_y)[0]
+                            grad_auto = torch.autograd.grad(primitive_function(x), x, grad_y)[0]
+                            result['max_grad_error'] = (grad_manual - grad_auto).abs().max().item()
+                    except Exception as e:
+                        result['error'] = f'{e.__class__.__name__}: {e}'
+                    if verbose:
+                        print(', '.join(f'{k}={v}' for k, v in result.items()))
+                    results.append(result)
+
+    if path is not None:
+        with open(path, 'w') as f:
+            json.dump({'device': str(device), 'torch_version': torch.__version__, 'results': results}, f, indent=2)
+    return results
@@ -282,7 +282,7 @@ def plot_2d_spiking_feature_map(spikes: np.asarray, nrows, ncols, space, title:
     return fig, maps
 
 def plot_one_neuron_v_s(v: list, s: list, v_threshold=1.0, v_reset=0.0,
-                        title='$V_{t}$ and $S_{t}$ of the neuron', dpi=200):
+                        title='$V_{t}$ and $S_{t}$ of the neuron', dpi=200, t_offset=0):
     '''
     :param v: 一个 ``list``，存放神经元不同时刻的电压
     :param s: 一个 ``list``，存放神经元不同时刻释放的脉冲
@@ -290,6 +290,7 @@ def plot_one_neuron_v_s(v: list, s: list, v_threshold=1.0, v_reset=0.0,
     :param v_reset: 神经元的重置电压。也可以为 ``None``
     :param title: 图的标题
     :param dpi: 绘图的dpi
+    :param t_offset: 横轴的起始时刻。只画出一段记录时，例如 ``v[t0: t1]``，设置 ``t_offset = t0`` 可以使横轴显示真实的时刻
     :return: 一个figure
 
     绘制单个神经元的电压、脉冲随着时间的变化情况。常见的用法是，使用神经元的 ``monitor`` 记录的输入作为输入。示例代码：
@@ -308,25 +309,33 @@ def plot_one_neuron_v_s(v: list, s: list, v_threshold=1.0, v_reset=0.0,
 
     .. image:: ./_static/API/visualizing/plot_one_neuron_v_s.*
         :width: 100%
+
+    ``v`` 和 ``s`` 也可以是 ``monitor.MemmapRecords`` 的切片，从而只加载需要画出的时间段：
+
+    .. code-block:: python
+
+        lif.set_monitor(True, root='./lif_records')
+        ...
+        plot_one_neuron_v_s(lif.monitor['v'][50000: 50200], lif.monitor['s'][50000: 50200], t_offset=50000)
     '''
     fig = plt.figure(dpi=dpi)
     ax0 = plt.subplot2grid((3, 1), (0, 0), rowspan=2)
     ax0.set_title(title)
     T = s.__len__()
-    ax0.plot(np.linspace(0, T, v.__len__()), v)
-    ax0.set_xlim(-0.5, T - 0.5)
+    ax0.plot(np.linspace(t_offset, t_offset + T, v.__len__()), v)
+    ax0.set_xlim(t_offset - 0.5, t_offset + T - 0.5)
     ax0.set_ylabel('voltage')
     ax0.axhline(v_threshold, label='$V_{threshold}$', linestyle='-.', c='r')
     if v_reset is not None:
         ax0.axhline(v_reset, label='$V_{reset}$', linestyle='-.', c='g')
     ax0.legend()
-    t = np.arange(0, T)
-    s_np = np.asarray(s).squeeze(1)
+    t = np.arange(t_offset, t_offset + T)
+    s_np = np.asarray(s).reshape(T)
     t_spike = s_np * t
     mask = (s_np == 1)  # eventplot中的数值是时间发生的时刻，因此需要用mask筛选出
     ax1 = plt.subplot2grid((3, 1), (2, 0))
     ax1.eventplot(t_spike[mask], lineoffsets=0, colors='r')
-    ax1.set_xlim(-0.5, T - 0.5)
+    ax1.set_xlim(t_offset - 0.5, t_offset + T - 0.5)
 
     ax1.set_xlabel('simulating step')
     ax1.set_ylabel('spike')